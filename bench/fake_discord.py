@@ -0,0 +1,328 @@
+"""Local stand-ins for the parts of the Discord gateway/HTTP layer the cogs touch.
+
+Every call that would hit Discord's REST API goes through FakeHTTP, which
+records it per route, optionally sleeps to simulate network latency and can
+inject 429 responses. Objects are plain Python classes except where the cogs
+do isinstance checks against py-cord types.
+"""
+import asyncio
+import datetime
+import itertools
+import random
+from collections import Counter
+
+import discord
+
+_ids = itertools.count(1_300_000_000_000_000_000)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class FakeResponse:
+    """Minimal aiohttp-like response for building discord.HTTPException."""
+
+    def __init__(self, status: int, reason: str = ""):
+        self.status = status
+        self.reason = reason
+
+
+class FakeHTTP:
+    def __init__(self, latency: float = 0.0, rate_limit_probability: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.random = random.Random(seed)
+        self.calls = Counter()
+
+    async def request(self, route: str):
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limit_probability and self.random.random() < self.rate_limit_probability:
+            self.calls["429"] += 1
+            error = discord.HTTPException(FakeResponse(429, "Too Many Requests"), "You are being rate limited.")
+            error.retry_after = 0.01
+            raise error
+
+    @property
+    def total(self) -> int:
+        return sum(count for route, count in self.calls.items() if route != "429")
+
+
+class FakeRole:
+    def __init__(self, guild, name: str, administrator: bool = False, role_id: int = None):
+        self.id = role_id or next_id()
+        self.guild = guild
+        self.name = name
+        self.permissions = discord.Permissions(administrator=administrator)
+        self.mention = f"<@&{self.id}>"
+
+
+class FakeUser:
+    def __init__(self, guild, name: str, roles=(), bot: bool = False):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.bot = bot
+        self._role_ids = {role.id for role in roles}
+        self.mention = f"<@{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def roles(self):
+        return [role for role in self.guild.roles if role.id in self._role_ids]
+
+    @property
+    def guild_permissions(self):
+        return discord.Permissions(administrator=any(role.permissions.administrator for role in self.roles))
+
+    def get_role(self, role_id):
+        return self.guild.get_role(role_id) if role_id in self._role_ids else None
+
+    async def add_roles(self, *roles, reason=None):
+        await self.guild.http.request("PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+        self._role_ids.update(role.id for role in roles)
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content="", embeds=(), attachments=()):
+        self.id = next_id()
+        self.channel = channel
+        self.author = author
+        self.content = content or ""
+        self.embeds = list(embeds)
+        self.attachments = list(attachments)
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+
+
+class FakeTextChannel:
+    def __init__(self, guild, name: str, category=None):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.category_id = category.id if category else None
+        self.mention = f"<#{self.id}>"
+        self.messages = []
+
+    async def send(self, content=None, *, embed=None, embeds=None, view=None, file=None, **kwargs):
+        await self.guild.http.request("POST /channels/{channel_id}/messages")
+        message = FakeMessage(self, self.guild.me, content, embeds or ([embed] if embed else []))
+        self.messages.append(message)
+        return message
+
+    async def _history(self, oldest_first):
+        messages = self.messages if oldest_first else list(reversed(self.messages))
+        for start in range(0, len(messages), 100):
+            # Discord pages history 100 messages per request
+            await self.guild.http.request("GET /channels/{channel_id}/messages")
+            for message in messages[start:start + 100]:
+                yield message
+
+    def history(self, limit=None, oldest_first=False):
+        return self._history(oldest_first)
+
+    async def delete(self, reason=None):
+        await self.guild.http.request("DELETE /channels/{channel_id}")
+        self.guild.remove_channel(self)
+
+    async def create_thread(self, name, type=None, auto_archive_duration=None, invitable=True, **kwargs):
+        await self.guild.http.request("POST /channels/{channel_id}/threads")
+        thread = FakeThread(self, name)
+        # Threads are reachable through get_channel but are not guild channels
+        self.guild.gateway.channels[thread.id] = thread
+        return thread
+
+
+class FakeThread(discord.Thread):
+    # Subclassed so isinstance(channel, discord.Thread) checks see a real thread
+    def __init__(self, parent, name: str):
+        self.id = next_id()
+        self.guild = parent.guild
+        self.name = name
+        self.parent_id = parent.id
+        self.archived = False
+        self.locked = False
+        self.messages = []
+
+    send = FakeTextChannel.send
+    _history = FakeTextChannel._history
+    history = FakeTextChannel.history
+
+    async def edit(self, archived=None, locked=None, **kwargs):
+        await self.guild.http.request("PATCH /channels/{channel_id}")
+        if archived is not None:
+            self.archived = archived
+        if locked is not None:
+            self.locked = locked
+        return self
+
+    async def add_user(self, user):
+        await self.guild.http.request("PUT /channels/{channel_id}/thread-members/{user_id}")
+
+    async def remove_user(self, user):
+        await self.guild.http.request("DELETE /channels/{channel_id}/thread-members/{user_id}")
+
+
+class FakeCategory(discord.CategoryChannel):
+    # Subclassed so ChannelIndex's isinstance checks see a real category
+    def __init__(self, guild, name: str):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.category_id = None
+
+    async def create_text_channel(self, name, overwrites=None, **kwargs):
+        return await self.guild.create_text_channel(name=name, category=self, overwrites=overwrites)
+
+
+class FakeGuild:
+    def __init__(self, gateway, name: str = "bench-guild", channel_count: int = 0):
+        self.id = next_id()
+        self.name = name
+        self.gateway = gateway
+        self.http = gateway.http
+        self._roles = {}
+        self._channels = {}
+        self.default_role = self._add_role(FakeRole(self, "@everyone"))
+        self.me = FakeUser(self, "SwiftaBookBot", bot=True)
+        self.owner_id = next_id()
+        for index in range(channel_count):
+            self._add_channel(FakeTextChannel(self, f"filler-{index}"))
+
+    def __str__(self):
+        return self.name
+
+    def _add_role(self, role):
+        self._roles[role.id] = role
+        return role
+
+    def add_role(self, name: str, administrator: bool = False, role_id: int = None):
+        return self._add_role(FakeRole(self, name, administrator, role_id))
+
+    def _add_channel(self, channel):
+        self._channels[channel.id] = channel
+        self.gateway.channels[channel.id] = channel
+        return channel
+
+    def remove_channel(self, channel):
+        self._channels.pop(channel.id, None)
+        self.gateway.channels.pop(channel.id, None)
+        self.gateway.dispatch("guild_channel_delete", channel)
+
+    @property
+    def roles(self):
+        return list(self._roles.values())
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    @property
+    def categories(self):
+        return [channel for channel in self._channels.values() if isinstance(channel, FakeCategory)]
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    async def create_category(self, name, **kwargs):
+        await self.http.request("POST /guilds/{guild_id}/channels")
+        category = self._add_channel(FakeCategory(self, name))
+        self.gateway.dispatch("guild_channel_create", category)
+        return category
+
+    async def create_text_channel(self, name, category=None, overwrites=None, **kwargs):
+        await self.http.request("POST /guilds/{guild_id}/channels")
+        channel = self._add_channel(FakeTextChannel(self, name, category))
+        self.gateway.dispatch("guild_channel_create", channel)
+        return channel
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self):
+        if self._done:
+            raise RuntimeError("Interaction has already been responded to")
+        self._done = True
+        await self.interaction.http.request("POST /interactions/{interaction_id}/{token}/callback")
+        self.interaction.acked_at = asyncio.get_running_loop().time()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond()
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await self.interaction.http.request("POST /webhooks/{application_id}/{token}")
+
+
+class FakeInteraction:
+    def __init__(self, guild, user, channel, custom_id: str, values=None):
+        self.id = next_id()
+        self.type = discord.InteractionType.component
+        self.guild = guild
+        self.user = user
+        self.channel = channel
+        self.custom_id = custom_id
+        self.data = {"custom_id": custom_id, "values": list(values or [])}
+        self.http = guild.http
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.acked_at = None
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+
+
+class FakeContext:
+    """Enough of commands.Context for prefix commands such as !task, and of
+    ApplicationContext for slash commands. Slash replies are kept in ``responses``."""
+
+    def __init__(self, guild, author, channel):
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.responses = []
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def defer(self, **kwargs):
+        await self.guild.http.request("POST /interactions/{interaction_id}/{token}/callback")
+
+    async def respond(self, content=None, **kwargs):
+        await self.guild.http.request("POST /webhooks/{application_id}/{token}")
+        self.responses.append(FakeMessage(self.channel, self.guild.me, content, [kwargs["embed"]] if kwargs.get("embed") else []))
+
+
+class FakeGateway:
+    """Owns the fake guilds and routes gateway events into the bot's listeners."""
+
+    def __init__(self, bot, http: FakeHTTP):
+        self.bot = bot
+        self.http = http
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def dispatch(self, event: str, *args):
+        self.bot.dispatch(event, *args)
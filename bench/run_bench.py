@@ -0,0 +1,340 @@
+"""Offline load test for the bot's cogs.
+
+Loads the extensions listed in main.py into a bot that never connects to
+Discord, wires it to the fakes in bench/fake_discord.py and replays synthetic
+event streams: mass member joins, ticket open/close bursts and task creation
+followed by thousands of button clicks. Reports per-handler p50/p99 latency,
+event-loop lag, API calls by route and memory.
+
+    python -m bench.run_bench --joins 2000 --tickets 300 --tasks 200 --clicks 5
+
+Everything runs in a temporary working directory, so tasks.db, tickets.json
+and transcripts never touch the real ones.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import discord
+from discord.ext import commands
+
+from bench.fake_discord import FakeContext, FakeGateway, FakeGuild, FakeHTTP, FakeInteraction, FakeTextChannel, FakeThread, FakeUser
+from utils.config import get_config
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import event_handlers
+from utils.outbox import Outbox
+
+TICKET_REASONS = ("billing", "account_issues", "payment_issues")
+
+
+class Recorder:
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def timed(self, name, coro):
+        started = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            self.errors[name] += 1
+            print(f"[{name}] {type(e).__name__}: {e}")
+        finally:
+            self.durations[name].append(time.perf_counter() - started)
+
+    def summary(self):
+        rows = {}
+        for name, samples in sorted(self.durations.items()):
+            ordered = sorted(samples)
+            rows[name] = {
+                "count": len(ordered),
+                "errors": self.errors.get(name, 0),
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return rows
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.recorder = Recorder()
+        self.phases = {}
+        self.ticket_stats = None
+
+    def build_bot(self):
+        from main import INITIAL_EXTENSIONS
+
+        intents = discord.Intents.default()
+        intents.members = True
+        bot = commands.Bot(command_prefix="!", intents=intents)
+        self.http = FakeHTTP(latency=self.args.latency / 1000, rate_limit_probability=self.args.rate_limit)
+        self.gateway = FakeGateway(bot, self.http)
+        bot.get_channel = self.gateway.get_channel
+        if not self.args.real_rate_limits:
+            # The outbox would otherwise pace each channel at 5 msgs/5s and the
+            # run would measure Discord's limits instead of our handlers
+            bot.outbox = Outbox(channel_rate=(10_000, 1.0), global_rate=(10_000, 1.0))
+        for extension in INITIAL_EXTENSIONS:
+            bot.load_extension(extension)
+        self.bot = bot
+        self.extensions = INITIAL_EXTENSIONS
+
+    def build_guild(self):
+        config = get_config()
+        guild = FakeGuild(self.gateway, channel_count=self.args.filler_channels)
+        self.staff_role = guild.add_role("Staff", role_id=config.staff_role)
+        self.member_role = guild.add_role("Member", role_id=config.user_role)
+        for channel_id in (config.transcript_channel, config.completion_channel):
+            if channel_id:
+                channel = FakeTextChannel(guild, f"log-{channel_id}")
+                channel.id = channel_id
+                guild._add_channel(channel)
+        self.staff = FakeUser(guild, "staff", roles=[self.staff_role])
+        self.lobby = guild._add_channel(FakeTextChannel(guild, "lobby"))
+        self.guild = guild
+
+    async def fire(self, event, *args, label=None):
+        """Invoke every listener for ``event`` the way the gateway dispatch would, timing each."""
+        for listener in event_handlers(self.bot).get(f"on_{event}", []):
+            await self.recorder.timed(label or f"{event}:{listener.__qualname__}", listener(*args))
+
+    async def settle_interactions(self):
+        """Wait for deferred interaction handlers still running in the background."""
+        router = getattr(self.bot, "interaction_router", None)
+        if router is not None:
+            await router.join()
+
+    async def phase(self, name, coro):
+        started = time.perf_counter()
+        calls_before = self.http.total
+        await coro
+        self.phases[name] = {
+            "wall_s": time.perf_counter() - started,
+            "api_calls": self.http.total - calls_before,
+        }
+
+    def open_channels(self, prefixes):
+        """Channels (or, with --threads, unarchived threads) whose name starts with ``prefixes``."""
+        return [
+            channel for channel in list(self.gateway.channels.values())
+            if isinstance(channel, (FakeTextChannel, FakeThread))
+            and not getattr(channel, "archived", False)
+            and channel.name.startswith(prefixes)
+        ]
+
+    # --- scenarios -----------------------------------------------------------
+
+    async def mass_joins(self):
+        members = [FakeUser(self.guild, f"member-{index}") for index in range(self.args.joins)]
+        # Gateways replay some joins after reconnects; those must be de-duplicated
+        replayed = members[: len(members) // 10]
+        await asyncio.gather(*(self.fire("member_join", member) for member in members + replayed))
+        welcome = self.bot.get_cog("Welcome")
+        if welcome is not None:
+            await welcome.join_queue.join()
+
+    async def ticket_burst(self):
+        users = [FakeUser(self.guild, f"customer-{index}") for index in range(self.args.tickets)]
+        # Every tenth customer keeps clicking; only their first click may open a ticket
+        clicks = [
+            (user, TICKET_REASONS[index % 3])
+            for index, user in enumerate(users)
+            for _ in range(self.args.repeat_clicks if index % 10 == 0 else 1)
+        ]
+        await asyncio.gather(*(
+            self.fire(
+                "interaction",
+                FakeInteraction(self.guild, user, self.lobby, "ticket:open", [reason]),
+                label="interaction:ticket:open"
+            )
+            for user, reason in clicks
+        ))
+        await self.settle_interactions()
+        tickets = self.open_channels(TICKET_REASONS)
+        for ticket in tickets:
+            for index in range(self.args.ticket_messages):
+                await ticket.send(f"message {index}")
+        await asyncio.gather(*(
+            self.fire(
+                "interaction",
+                FakeInteraction(self.guild, self.staff, ticket, f"ticket:close:{ticket.id}"),
+                label="interaction:ticket:close"
+            )
+            for ticket in tickets
+        ))
+        await self.settle_interactions()
+        cog = self.bot.get_cog("TicketSystem")
+        if cog is not None:
+            # Taken now: cold_start reloads the cog
+            self.ticket_stats = {"throttled": cog.throttled, "duplicates": cog.duplicates}
+            for query in ("billing message", "payment issues", "nothing matches this"):
+                await self.recorder.timed("ticket_search", self.search_transcripts(cog, query))
+
+    async def search_transcripts(self, cog, query):
+        cog.transcripts.search(query, guild_id=self.guild.id)
+
+    async def task_clicks(self):
+        cog = self.bot.get_cog("TaskManagement")
+        if cog is None:
+            return
+        assignees = [FakeUser(self.guild, f"assignee-{index}") for index in range(max(1, self.args.tasks // 10))]
+        ctx = FakeContext(self.guild, self.staff, self.lobby)
+        for index in range(self.args.tasks):
+            await self.recorder.timed(
+                "command:task",
+                cog.task(ctx, f"Task {index}", "Synthetic benchmark task", assignees[index % len(assignees)], "23:59:59")
+            )
+        task_channels = self.open_channels("staff-")
+        clicks = [
+            FakeInteraction(self.guild, self.staff, channel, "task:review")
+            for channel in task_channels
+            for _ in range(self.args.clicks)
+        ]
+        await asyncio.gather(*(self.fire("interaction", click, label="interaction:task:review") for click in clicks))
+        await self.settle_interactions()
+        await asyncio.gather(*(
+            self.fire("interaction", FakeInteraction(self.guild, self.staff, channel, "task:complete"), label="interaction:task:complete")
+            for channel in task_channels
+        ))
+        await self.settle_interactions()
+
+    async def cold_start(self):
+        """Reload the stateful extensions as a restart would, then reconcile
+        them against the fake gateway's channels like on_ready does."""
+        stateful = [extension for extension in ("cogs.ticket_system", "cogs.task_management") if extension in self.extensions]
+        for extension in stateful:
+            self.bot.unload_extension(extension)
+        started = time.perf_counter()
+        for extension in stateful:
+            self.bot.load_extension(extension)
+        self.recorder.durations["cold_start:load"].append(time.perf_counter() - started)
+        channel_ids = set(self.gateway.channels)
+        for cog in list(self.bot.cogs.values()):
+            reconcile = getattr(cog, "reconcile", None)
+            if reconcile is not None:
+                await self.recorder.timed("cold_start:reconcile", reconcile(channel_ids, {self.guild.id}))
+
+    async def drain_outbox(self):
+        outbox = getattr(self.bot, "outbox", None)
+        while outbox is not None and outbox.queue_depth():
+            await asyncio.sleep(0.01)
+
+    # --- driver --------------------------------------------------------------
+
+    async def run(self):
+        tracemalloc.start()
+        lag = LoopLagMonitor(interval=0.01)
+        lag.start()
+
+        self.build_bot()
+        self.build_guild()
+        await self.phase("mass_joins", self.mass_joins())
+        await self.phase("ticket_burst", self.ticket_burst())
+        await self.phase("task_clicks", self.task_clicks())
+        await self.phase("cold_start", self.cold_start())
+        await self.phase("drain_outbox", self.drain_outbox())
+
+        lag.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report = {
+            "handlers": self.recorder.summary(),
+            "phases": self.phases,
+            "loop_lag_ms": {
+                "p50": lag.percentile(0.50) * 1000,
+                "p99": lag.percentile(0.99) * 1000,
+                "max": lag.max_lag * 1000,
+            },
+            "api_calls": dict(self.http.calls.most_common()),
+            "memory_mb": {"current": current / 2 ** 20, "peak": peak / 2 ** 20},
+        }
+        if getattr(self.bot, "outbox", None) is not None:
+            report["outbox"] = self.bot.outbox.stats()
+        welcome = self.bot.get_cog("Welcome")
+        if welcome is not None:
+            report["join_queue"] = welcome.join_queue.stats()
+        if getattr(self.bot, "interaction_router", None) is not None:
+            report["interactions"] = self.bot.interaction_router.stats()
+        if self.ticket_stats is not None:
+            report["tickets"] = self.ticket_stats
+
+        for extension in self.extensions:
+            self.bot.unload_extension(extension)
+        return report
+
+
+def print_report(report):
+    print(f"\n{'handler':<48}{'count':>8}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in report["handlers"].items():
+        print(f"{name:<48}{row['count']:>8}{row['errors']:>6}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+
+    print(f"\n{'phase':<48}{'wall s':>10}{'api calls':>12}")
+    for name, row in report["phases"].items():
+        print(f"{name:<48}{row['wall_s']:>10.3f}{row['api_calls']:>12}")
+
+    lag = report["loop_lag_ms"]
+    print(f"\nevent loop lag: p50 {lag['p50']:.2f} ms, p99 {lag['p99']:.2f} ms, max {lag['max']:.2f} ms")
+    memory = report["memory_mb"]
+    print(f"memory: {memory['current']:.1f} MB current, {memory['peak']:.1f} MB peak")
+    print("\napi calls by route:")
+    for route, count in report["api_calls"].items():
+        print(f"  {count:>8}  {route}")
+    for section in ("outbox", "join_queue", "interactions", "tickets"):
+        if section in report:
+            print(f"\n{section}: " + ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in report[section].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the bot's cogs.")
+    parser.add_argument("--joins", type=int, default=1000, help="members joining in one burst")
+    parser.add_argument("--tickets", type=int, default=200, help="tickets opened and then closed")
+    parser.add_argument("--repeat-clicks", type=int, default=5, help="ticket:open clicks sent by every tenth customer")
+    parser.add_argument("--ticket-messages", type=int, default=50, help="messages posted in each ticket before closing")
+    parser.add_argument("--tasks", type=int, default=100, help="tasks created with !task")
+    parser.add_argument("--clicks", type=int, default=10, help="review clicks per task channel")
+    parser.add_argument("--filler-channels", type=int, default=400, help="unrelated channels already in the guild")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated REST latency in ms")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of a simulated 429 per request")
+    parser.add_argument("--real-rate-limits", action="store_true", help="keep the outbox's Discord rate limits")
+    parser.add_argument("--threads", action="store_true", help="open tickets and tasks as private threads")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="swiftabook-bench-")
+    with open(os.path.join(REPO_ROOT, "config.json"), "r", encoding="utf-8") as file:
+        config = json.load(file)
+    # The whole burst comes from one guild; its limit would otherwise cap what is measured
+    config.update(ticket_guild_limit=max(args.tickets, config.get("ticket_guild_limit", 20)))
+    if args.threads:
+        config.update(ticket_mode="thread", task_mode="thread")
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as file:
+        json.dump(config, file)
+    os.chdir(workdir)
+    try:
+        report = asyncio.run(Bench(args).run())
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Offline smoke test for launcher.py's multi-process sharding.
+
+Spawns the same worker processes the launcher would, but every worker runs
+against the fake gateway from bench/fake_discord.py instead of connecting to
+Discord. Each worker opens tickets and creates tasks in a guild that belongs
+to one of its shards, then the run checks that every cluster wrote only to
+its own data directory.
+
+    python -m bench.shard_smoke --shards 6 --processes 3
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from launcher import launch
+from utils.sharding import DATA_ROOT, cluster_env, plan_clusters, shard_for_guild
+
+
+def guild_id_for_shard(shard_id: int, shard_count: int, seed: int = 1) -> int:
+    """A snowflake-shaped guild id that Discord would route to ``shard_id``."""
+    guild_id = (seed << 22) * shard_count + (shard_id << 22)
+    assert shard_for_guild(guild_id, shard_count) == shard_id
+    return guild_id
+
+
+async def _exercise(cluster_id, shard_ids, shard_count, tasks):
+    from bench.fake_discord import FakeContext, FakeGateway, FakeGuild, FakeHTTP, FakeInteraction, FakeTextChannel, FakeUser
+    from main import INITIAL_EXTENSIONS, create_bot
+    from utils.config import get_config
+    from utils.metrics import event_handlers
+
+    bot = create_bot(shard_ids, shard_count)
+    gateway = FakeGateway(bot, FakeHTTP())
+    bot.get_channel = gateway.get_channel
+    for extension in INITIAL_EXTENSIONS:
+        bot.load_extension(extension)
+
+    for shard_id in shard_ids:
+        guild = FakeGuild(gateway, name=f"shard-{shard_id}")
+        guild.id = guild_id_for_shard(shard_id, shard_count, seed=cluster_id + 1)
+        staff = FakeUser(guild, "staff", roles=[guild.add_role("Staff", role_id=get_config().staff_role)])
+        lobby = guild._add_channel(FakeTextChannel(guild, "lobby"))
+        interaction = FakeInteraction(guild, FakeUser(guild, "customer"), lobby, "ticket:open", ["billing"])
+        for listener in event_handlers(bot).get("on_interaction", []):
+            await listener(interaction)
+        await bot.interaction_router.join()  # Ticket creation runs after the click is acknowledged
+        cog = bot.get_cog("TaskManagement")
+        ctx = FakeContext(guild, staff, lobby)
+        for index in range(tasks):
+            await cog.task(ctx, f"Task {index}", "Sharding smoke test", staff, "23:59:59")
+        print(f"[cluster {cluster_id}] shard {shard_id}: guild {guild.id} ok")
+
+    for extension in INITIAL_EXTENSIONS:
+        bot.unload_extension(extension)
+
+
+def run_offline_cluster(cluster_id, shard_ids, shard_count, tasks=3):
+    os.environ.update(cluster_env(cluster_id, shard_ids, shard_count))
+    asyncio.run(_exercise(cluster_id, shard_ids, shard_count, tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline smoke test for sharded multi-process mode.")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="swiftabook-shards-")
+    shutil.copy(os.path.join(REPO_ROOT, "config.json"), workdir)
+    os.chdir(workdir)
+    try:
+        plan = plan_clusters(args.shards, args.processes)
+        launch(plan, args.shards, target=run_offline_cluster, restart=False)
+        for cluster_id in range(len(plan)):
+            files = sorted(os.listdir(os.path.join(DATA_ROOT, f"cluster-{cluster_id}")))
+            print(f"cluster {cluster_id}: {files}")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import discord
+from discord.ext import commands
+
+
+class Stats(commands.Cog):
+    def __init__(self, bot_: discord.Bot):
+        self.bot = bot_
+
+    @commands.slash_command(name='stats', description='Shows handler, API and event loop metrics.')
+    @commands.has_permissions(administrator=True)
+    async def stats(self, ctx: discord.ApplicationContext):
+        metrics = getattr(self.bot, "metrics", None)
+        if metrics is None:
+            await ctx.respond("Metrics are disabled. Set \"metrics_enabled\" to true in config.json.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="Bot Stats", color=discord.Color.blurple())
+
+        # Busiest handlers with their approximate p99 from the histogram buckets
+        handlers = sorted(
+            (
+                (dict(labels)["handler"], histogram)
+                for (name, labels), histogram in metrics.histograms.items()
+                if name == "bot_handler_duration_seconds"
+            ),
+            key=lambda item: item[1].count,
+            reverse=True
+        )[:10]
+        if handlers:
+            embed.add_field(
+                name="Handlers (calls, avg, p99 ≤)",
+                value="\n".join(
+                    f"`{handler[:40]}` {histogram.count}, {histogram.total / histogram.count * 1000:.1f}ms, {histogram.quantile(0.99) * 1000:g}ms"
+                    for handler, histogram in handlers
+                )[:1024],
+                inline=False
+            )
+
+        exceptions = sum(value for (name, _), value in metrics.counters.items() if name == "bot_handler_exceptions_total")
+        api_calls = sum(value for (name, _), value in metrics.counters.items() if name == "bot_api_calls_total")
+        rate_limited = sum(
+            value for (name, labels), value in metrics.counters.items()
+            if name == "bot_api_calls_total" and dict(labels).get("status") == "429"
+        )
+        embed.add_field(name="Exceptions", value=str(int(exceptions)))
+        embed.add_field(name="API calls", value=f"{int(api_calls)} ({int(rate_limited)} × 429)")
+
+        lag = getattr(self.bot, "loop_lag", None)
+        if lag is not None:
+            embed.add_field(
+                name="Event loop lag",
+                value=f"p50 {lag.percentile(0.5) * 1000:.1f}ms, p99 {lag.percentile(0.99) * 1000:.1f}ms, max {lag.max_lag * 1000:.1f}ms"
+            )
+
+        outbox = getattr(self.bot, "outbox", None)
+        if outbox is not None:
+            outbox_stats = outbox.stats()
+            embed.add_field(
+                name="Outbox",
+                value=f"{outbox_stats['queue_depth']} queued, p99 {outbox_stats['latency_p99'] * 1000:.0f}ms"
+            )
+
+        embed.set_footer(text=f"Gateway latency: {self.bot.latency * 1000:.0f}ms")
+        await ctx.respond(embed=embed, ephemeral=True)
+
+def setup(bot):
+    bot.add_cog(Stats(bot))
@@ -1,195 +1,544 @@
 import discord
-from discord.ext import commands, tasks
-from discord.ui import Button, View, Modal, InputText
+from discord.commands import SlashCommandGroup, option
+from discord.ext import commands
+from discord.ui import Button, Modal, InputText
+import asyncio
+import time
 from datetime import datetime
-import json
-import os
+from utils.bulk_tasks import parse_ids, parse_task_rows
+from utils.channel_index import get_channel_index
+from utils.config import get_config
+from utils.deadlines import DeadlineScheduler
+from utils.interactions import get_router, persistent_view
+from utils.outbox import get_outbox
+from utils.permissions import get_permissions
+from utils.schedule import DUE_FORMATS, get_timezone, parse_due, parse_rule
+from utils.sharding import data_path, is_primary
+from utils.startup import cached_channel_ids
+from utils.task_store import TaskStore
+from utils.threads import close_channel, create_private_thread, invite_mentions, resolve_channel, thread_parent, uses_threads
 
 # Constants
-TASKS_FILE_PATH = '../tasks.json'
-COMPLETION_CHANNEL_ID = 1280127344245346367  # Replace with your actual completion channel ID
-
-# Helper functions
-def load_tasks():
-    if not os.path.exists(TASKS_FILE_PATH):
-        return {"tasks": []}
-    with open(TASKS_FILE_PATH, 'r') as file:
-        return json.load(file)
-
-def save_tasks(data):
-    with open(TASKS_FILE_PATH, 'w') as file:
-        json.dump(data, file, indent=4)
+TASKS_DB_PATH = 'tasks.db'
+TASKS_FILE_PATH = 'tasks.json'  # Legacy file, imported into the database on first run
+COMPLETION_CHANNEL_ID = 1280127344245346367  # Fallback when "completion_channel" is not set in config.json
+BUTTON_IDS = {
+    "task:review": "review_task",
+    "task:reassign": "reassign_task",
+    "task:complete": "complete_task",
+    "task:reason": "reason_overdue",
+    "task:delete": "delete_task",
+}
+# Handlers that open a modal have to answer the interaction themselves, the
+# others are acknowledged right away and run in the background
+BUTTON_ROUTING = {
+    "review_task": {"defer": True, "retries": 2},
+    "reassign_task": {},
+    "complete_task": {"defer": True},
+    "reason_overdue": {},
+    "delete_task": {"defer": True},
+}
+# Buttons posted before custom ids were namespaced, e.g. "review_task" for "task:review"
+LEGACY_BUTTON_IDS = ("review_task", "reassign_task", "complete_task", "reason_overdue", "delete_task")
+BULK_CONCURRENCY = 5  # Channels /task bulk creates or deletes at the same time
+
+def format_due(task):
+    """Discord renders <t:...> in each reader's own time zone."""
+    if task.get("due_at") is None:
+        return task.get("due_time") or "-"
+    due = f"<t:{int(task['due_at'])}:F>"
+    if task.get("recurrence"):
+        due += f"\nRepeats `{task['recurrence']}`" + (f" ({task['timezone']})" if task.get("timezone") else "")
+    return due
 
 # Task Management Cog
 class TaskManagement(commands.Cog):
+    task_commands = SlashCommandGroup("task", "Create and manage tasks", contexts={discord.InteractionContextType.guild})
+    bulk = task_commands.create_subgroup("bulk", "Create, complete or reassign many tasks at once")
+
     def __init__(self, bot):
         self.bot = bot
-        self.check_overdue_tasks.start()
+        # Each shard cluster keeps its own database, only the primary imports the legacy file
+        self.store = TaskStore(data_path(TASKS_DB_PATH), legacy_json=TASKS_FILE_PATH if is_primary() else None)
+        self.outbox = get_outbox(bot)
+        self.permissions = get_permissions(bot)
+        self.channel_index = get_channel_index(bot)
+        self.router = get_router(bot)
+        for key, handler in BUTTON_IDS.items():
+            self.router.register(key, getattr(self, handler), **BUTTON_ROUTING[handler])
+        for legacy_id in LEGACY_BUTTON_IDS:
+            key = "task:" + legacy_id.split("_")[0]
+            handler = BUTTON_IDS[key]
+            self.router.register(legacy_id, getattr(self, handler), **BUTTON_ROUTING[handler])
+        self.deadlines = DeadlineScheduler(self.notify_overdue)
+        self.deadlines_loaded = False
+        if bot.is_ready():
+            # Reloaded at runtime, so there won't be another on_ready
+            self.bot.loop.create_task(self.reconcile(*cached_channel_ids(bot)))
+
+    def cog_unload(self):
+        self.router.unregister(*BUTTON_IDS, *LEGACY_BUTTON_IDS)
+        self.deadlines.stop()
+        self.store.close()
+
+    async def reconcile(self, channel_ids, guild_ids):
+        """Called once the gateway cache is ready: build the deadline heap from
+        the store in one query and one heapify, leaving out tasks whose channel
+        was deleted while the bot was offline. Then let it sleep until the next due time."""
+        if self.deadlines_loaded:
+            return
+        self.deadlines_loaded = True
+        started = time.perf_counter()
+        pending = await self.store.pending_deadlines()
+        if uses_threads(get_config().task_mode):
+            missing = set()  # Archived threads aren't cached
+        else:
+            missing = {
+                channel_id for channel_id, _, guild_id in pending
+                if guild_id in guild_ids and channel_id not in channel_ids
+            }
+        self.deadlines.schedule_many((channel_id, due_at) for channel_id, due_at, _ in pending if channel_id not in missing)
+        self.deadlines.start()
+        print(
+            f"[TASKS] {len(pending) - len(missing)} deadlines scheduled in {(time.perf_counter() - started) * 1000:.1f} ms, "
+            f"{len(missing)} skipped because their channels are gone"
+        )
 
     @commands.command()
-    async def task(self, ctx, title: str, description: str, assignee: discord.Member, due: str):
-        if not ctx.author.guild_permissions.administrator and "Staff" not in [role.name for role in ctx.author.roles]:
+    @commands.guild_only()
+    async def task(self, ctx, title: str, description: str, assignee: discord.Member, due: str, timezone: str = None):
+        """due is HH:MM[:SS], a full date and time, or a cron rule for recurring tasks
+        (quote anything with spaces). timezone defaults to "timezone" in config.json."""
+        if not self.permissions.is_staff(ctx.author):
             await ctx.send("You do not have permission to use this command.")
             return
 
+        timezone = timezone or get_config().timezone
+        try:
+            tz = get_timezone(timezone)
+        except ValueError as e:
+            await ctx.send(f"{e}. Use a zone name such as Europe/Berlin, UTC or an offset such as +02:00.")
+            return
         try:
-            due_time = datetime.strptime(due, "%H:%M:%S")
-        except ValueError:
-            await ctx.send("Invalid time format. Please use HH:MM:SS.")
+            due_at, recurrence = parse_due(due, tz)
+        except ValueError as e:
+            await ctx.send(f"{e}. Use {DUE_FORMATS}.")
             return
 
         # Create the task
-        tasks_data = load_tasks()
-        task_number = len(tasks_data['tasks']) + 1
-        channel_name = f"{ctx.author.name}-{task_number}"
+        task_number = await self.store.count() + 1
+        task_channel = await self._create_task_channel(ctx, assignee, f"{ctx.author.name}-{task_number}")
+        embed, view = self._task_message(title, description, assignee, due_at, recurrence, timezone)
+
+        await self.store.add({
+            "title": title,
+            "description": description,
+            "assignee_id": assignee.id,
+            "created_by": ctx.author.id,
+            "channel_id": task_channel.id,
+            "guild_id": ctx.guild.id,
+            "due_time": due,
+            "due_at": due_at,
+            "recurrence": recurrence,
+            "timezone": timezone,
+        })
+        self.deadlines.schedule(task_channel.id, due_at)
+
+        await task_channel.send(content=invite_mentions(task_channel, assignee, ctx.author), embed=embed, view=view)
+        await ctx.send(f"Task '{title}' created and assigned to {assignee.mention}.")
 
-        category = discord.utils.get(ctx.guild.categories, name="Tasks")
-        if not category:
-            category = await ctx.guild.create_category("Tasks")
+    async def _create_task_channel(self, ctx, assignee, channel_name):
+        """A text channel in the Tasks categories, or a private thread when
+        "task_mode" is "thread". Thread members are added by the first message."""
+        config = get_config()
+        if uses_threads(config.task_mode):
+            parent = thread_parent(self.bot, config.task_thread_parent, ctx.channel)
+            return await create_private_thread(parent, channel_name)
 
+        guild, author = ctx.guild, ctx.author
         overwrites = {
-            ctx.guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            ctx.author: discord.PermissionOverwrite(view_channel=True),
+            guild.default_role: discord.PermissionOverwrite(view_channel=False),
+            author: discord.PermissionOverwrite(view_channel=True),
             assignee: discord.PermissionOverwrite(view_channel=True)
         }
 
-        task_channel = await category.create_text_channel(channel_name, overwrites=overwrites)
+        async with self.channel_index.slot(guild, "Tasks") as category:
+            task_channel = await category.create_text_channel(channel_name, overwrites=overwrites)
+            self.channel_index.add(task_channel)
+        return task_channel
 
+    @staticmethod
+    def _task_message(title, description, assignee, due_at, recurrence=None, timezone=None):
         embed = discord.Embed(
             title=title,
             description=description,
             color=discord.Color.blue()
         )
         embed.add_field(name="Assigned to", value=assignee.mention)
-        embed.add_field(name="Due", value=due)
-        
-        view = View()
-        delete_button = Button(label="Delete", style=discord.ButtonStyle.danger, custom_id="delete_task")
-        review_button = Button(label="Review", style=discord.ButtonStyle.primary, custom_id="review_task")
-        view.add_item(delete_button)
-        view.add_item(review_button)
-
-        await task_channel.send(embed=embed, view=view)
-        await ctx.send(f"Task '{title}' created and assigned to {assignee.mention}.")
+        embed.add_field(name="Due", value=format_due({"due_at": due_at, "recurrence": recurrence, "timezone": timezone}))
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.Interaction):
-        if interaction.custom_id == "review_task":
-            task_channel = interaction.channel
+        view = persistent_view(
+            Button(label="Delete", style=discord.ButtonStyle.danger, custom_id="task:delete"),
+            Button(label="Review", style=discord.ButtonStyle.primary, custom_id="task:review")
+        )
+        return embed, view
+
+    @staticmethod
+    def _plan_task(guild, row, default_timezone):
+        """Validate one bulk row and resolve its assignee and deadline. Raises ValueError."""
+        if not row["title"]:
+            raise ValueError("missing title")
+        if not row["assignee"]:
+            raise ValueError("missing assignee")
+        ids = parse_ids(row["assignee"])
+        assignee = guild.get_member(ids[0]) if ids else guild.get_member_named(row["assignee"])
+        if assignee is None:
+            raise ValueError(f"unknown member '{row['assignee']}'")
+        if not row["due"]:
+            raise ValueError("missing due")
+        timezone = row["timezone"] or default_timezone
+        due_at, recurrence = parse_due(row["due"], get_timezone(timezone))
+        return {
+            "title": row["title"],
+            "description": row["description"] or row["title"],
+            "assignee": assignee,
+            "due": row["due"],
+            "due_at": due_at,
+            "recurrence": recurrence,
+            "timezone": timezone,
+        }
+
+    async def _bounded(self, coros):
+        """Run coroutines at most BULK_CONCURRENCY at a time; exceptions are returned, not raised."""
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+    @staticmethod
+    def _bulk_summary(title, lines, errors, started):
+        embed = discord.Embed(title=title, description="\n".join(lines)[:4096], color=discord.Color.blue())
+        if errors:
+            shown = "\n".join(errors[:15])
+            if len(errors) > 15:
+                shown += f"\n... and {len(errors) - 15} more"
+            embed.add_field(name=f"Problems ({len(errors)})", value=shown[:1024], inline=False)
+        embed.set_footer(text=f"Took {time.perf_counter() - started:.2f}s")
+        return embed
+
+    @bulk.command(name="create", description="Create tasks from a CSV/JSON file, or one task for several members.")
+    @option("file", discord.Attachment, description="CSV or JSON with title, description, assignee, due and timezone", required=False)
+    @option("title", str, description="Task title when not uploading a file", required=False)
+    @option("description", str, description="Task description when not uploading a file", required=False)
+    @option("due", str, description="HH:MM, YYYY-MM-DD HH:MM or a cron rule", required=False)
+    @option("assignees", str, description="Members to give the task to, as mentions or ids", required=False)
+    @option("timezone", str, description="Time zone for the deadlines, e.g. Europe/Berlin", required=False)
+    async def bulk_create(self, ctx: discord.ApplicationContext, file: discord.Attachment = None, title: str = None,
+                          description: str = None, due: str = None, assignees: str = None, timezone: str = None):
+        if not self.permissions.is_staff(ctx.author):
+            await ctx.respond("You do not have permission to use this command.", ephemeral=True)
+            return
+        started = time.perf_counter()
+        await ctx.defer(ephemeral=True)
+
+        if file is not None:
+            try:
+                rows = parse_task_rows(await file.read(), file.filename)
+            except (ValueError, UnicodeDecodeError) as e:
+                await ctx.respond(f"Could not read {file.filename}: {e}", ephemeral=True)
+                return
+        elif title and due and assignees:
+            rows = [
+                {"title": title, "description": description, "assignee": str(member_id), "due": due, "timezone": None}
+                for member_id in parse_ids(assignees)
+            ]
+        else:
+            await ctx.respond("Upload a CSV/JSON file, or give a title, due and assignees.", ephemeral=True)
+            return
+
+        # Validate every row before creating anything
+        default_timezone = timezone or get_config().timezone
+        planned, errors = [], []
+        for number, row in enumerate(rows, start=1):
+            try:
+                planned.append(self._plan_task(ctx.guild, row, default_timezone))
+            except ValueError as e:
+                errors.append(f"Row {number}: {e}")
+
+        first_number = await self.store.count() + 1
+        channels = await self._bounded(
+            self._create_task_channel(ctx, plan["assignee"], f"{ctx.author.name}-{first_number + index}")
+            for index, plan in enumerate(planned)
+        )
+
+        created = []
+        for plan, channel in zip(planned, channels):
+            if isinstance(channel, Exception):
+                errors.append(f"{plan['title']}: could not create channel ({channel})")
+            else:
+                created.append((plan, channel))
+
+        # One transaction for the whole batch
+        await self.store.add_many({
+            "title": plan["title"],
+            "description": plan["description"],
+            "assignee_id": plan["assignee"].id,
+            "created_by": ctx.author.id,
+            "channel_id": channel.id,
+            "guild_id": ctx.guild.id,
+            "due_time": plan["due"],
+            "due_at": plan["due_at"],
+            "recurrence": plan["recurrence"],
+            "timezone": plan["timezone"],
+        } for plan, channel in created)
+        self.deadlines.schedule_many((channel.id, plan["due_at"]) for plan, channel in created)
+
+        for plan, channel in created:
+            embed, view = self._task_message(
+                plan["title"], plan["description"], plan["assignee"], plan["due_at"], plan["recurrence"], plan["timezone"]
+            )
+            self.outbox.enqueue(channel, content=invite_mentions(channel, plan["assignee"], ctx.author), embed=embed, view=view)
+
+        summary = self._bulk_summary(
+            f"Created {len(created)} of {len(rows)} tasks",
+            [f"{channel.mention} {plan['title']} → {plan['assignee'].mention}" for plan, channel in created],
+            errors,
+            started
+        )
+        print(f"[TASKS] bulk created {len(created)} tasks in {time.perf_counter() - started:.2f}s")
+        await ctx.respond(embed=summary, ephemeral=True)
+
+    @bulk.command(name="complete", description="Complete several tasks and post a single summary.")
+    @option("channels", str, description="Task channels, as mentions or ids", required=False)
+    @option("assignee", discord.Member, description="Complete every open task of this member", required=False)
+    async def bulk_complete(self, ctx: discord.ApplicationContext, channels: str = None, assignee: discord.Member = None):
+        if not self.permissions.is_staff(ctx.author):
+            await ctx.respond("You do not have permission to use this command.", ephemeral=True)
+            return
+        started = time.perf_counter()
+        await ctx.defer(ephemeral=True)
+
+        channel_ids = parse_ids(channels)
+        if assignee is not None:
+            for task in await self.store.by_assignee(assignee.id):
+                if (task["status"] in ("Pending", "Overdue") and task["channel_id"]
+                        and task["guild_id"] in (ctx.guild.id, None) and task["channel_id"] not in channel_ids):
+                    channel_ids.append(task["channel_id"])
+        if not channel_ids:
+            await ctx.respond("No open tasks to complete.", ephemeral=True)
+            return
+
+        # Only this guild's tasks; ids pasted from another server match nothing.
+        # Rows from before guild_id was stored are checked against the guild's channels
+        legacy_ids = [channel_id for channel_id in channel_ids if ctx.guild.get_channel(channel_id) is not None]
+        completed = await self.store.complete_many(channel_ids, guild_id=ctx.guild.id, legacy_channel_ids=legacy_ids)
+        for task in completed:
+            self.deadlines.cancel(task["channel_id"])
+
+        # One summary instead of an embed per task
+        completion_channel = self.bot.get_channel(get_config().completion_channel or COMPLETION_CHANNEL_ID)
+        lines = [f"**{task['title']}** (<@{task['assignee_id']}>)" for task in completed]
+        if completion_channel and completed:
             embed = discord.Embed(
-                title="Task Review Requested",
-                description=f"{interaction.user.mention} has requested a review for this task.",
-                color=discord.Color.yellow()
+                title=f"{len(completed)} Tasks Completed",
+                description="\n".join(lines)[:4096],
+                color=discord.Color.green()
             )
+            embed.add_field(name="Completed by", value=f"<@{ctx.author.id}>")
+            embed.add_field(name="Completion Time", value=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            self.outbox.enqueue(completion_channel, embed=embed)
+
+        async def close(task):
+            channel = await resolve_channel(self.bot, task["channel_id"])
+            if channel is not None:
+                await close_channel(channel)
+
+        results = await self._bounded(close(task) for task in completed)
+        errors = [f"Could not close a channel: {result}" for result in results if isinstance(result, Exception)]
+        skipped = len(channel_ids) - len(completed)
+        if skipped:
+            errors.append(f"{skipped} channel(s) had no open task in this server")
+
+        summary = self._bulk_summary(f"Completed {len(completed)} tasks", lines, errors, started)
+        print(f"[TASKS] bulk completed {len(completed)} tasks in {time.perf_counter() - started:.2f}s")
+        await ctx.respond(embed=summary, ephemeral=True)
+
+    @bulk.command(name="reassign", description="Move every open task of one member to another.")
+    @option("from_member", discord.Member, description="Current assignee")
+    @option("to_member", discord.Member, description="New assignee")
+    @option("reason", str, description="Why the tasks are moving", required=False)
+    async def bulk_reassign(self, ctx: discord.ApplicationContext, from_member: discord.Member,
+                            to_member: discord.Member, reason: str = None):
+        if not self.permissions.is_staff(ctx.author):
+            await ctx.respond("You do not have permission to use this command.", ephemeral=True)
+            return
+        started = time.perf_counter()
+        await ctx.defer(ephemeral=True)
+
+        tasks = await self.store.reassign_all(from_member.id, to_member.id, ctx.guild.id)
+
+        async def move(task):
+            channel = await resolve_channel(self.bot, task["channel_id"])
+            if channel is None:
+                return
+            keep_old = task["created_by"] == from_member.id
+            if isinstance(channel, discord.Thread):
+                await channel.add_user(to_member)
+                if not keep_old:
+                    await channel.remove_user(from_member)
+                return
+            await channel.set_permissions(to_member, view_channel=True)
+            if not keep_old:
+                await channel.set_permissions(from_member, overwrite=None)
+
+        results = await self._bounded(move(task) for task in tasks)
+        errors = [f"Could not update a channel: {result}" for result in results if isinstance(result, Exception)]
+        lines = [f"<#{task['channel_id']}> {task['title']}" for task in tasks]
+        if reason:
+            lines.insert(0, f"Reason: {reason}\n")
+
+        summary = self._bulk_summary(
+            f"Moved {len(tasks)} tasks from {from_member.display_name} to {to_member.display_name}",
+            lines,
+            errors,
+            started
+        )
+        print(f"[TASKS] bulk reassigned {len(tasks)} tasks in {time.perf_counter() - started:.2f}s")
+        await ctx.respond(embed=summary, ephemeral=True)
 
-            view = View()
-            reassign_button = Button(label="Re-Assign", style=discord.ButtonStyle.secondary, custom_id="reassign_task")
-            complete_button = Button(label="Complete", style=discord.ButtonStyle.success, custom_id="complete_task")
-            view.add_item(reassign_button)
-            view.add_item(complete_button)
+    async def review_task(self, interaction: discord.Interaction, argument=None):
+        task_channel = interaction.channel
+        embed = discord.Embed(
+            title="Task Review Requested",
+            description=f"{interaction.user.mention} has requested a review for this task.",
+            color=discord.Color.yellow()
+        )
 
-            await task_channel.send(embed=embed, view=view)
+        view = persistent_view(
+            Button(label="Re-Assign", style=discord.ButtonStyle.secondary, custom_id="task:reassign"),
+            Button(label="Complete", style=discord.ButtonStyle.success, custom_id="task:complete")
+        )
 
-        elif interaction.custom_id == "reason_overdue":
-            modal = Modal(title="Overdue Reason")
-            modal.add_item(InputText(label="Reason", style=discord.InputTextStyle.long))
+        await self.outbox.send(task_channel, embed=embed, view=view)
+        return "Review requested."
 
-            async def modal_callback(modal_interaction: discord.Interaction):
-                reason = modal.children[0].value
-                task_channel = interaction.channel
+    async def reason_overdue(self, interaction: discord.Interaction, argument=None):
+        modal = Modal(title="Overdue Reason")
+        modal.add_item(InputText(label="Reason", style=discord.InputTextStyle.long))
 
-                embed = discord.Embed(
-                    title="Reason for Overdue Task",
-                    description=f"Reason provided: {reason}",
-                    color=discord.Color.orange()
-                )
-                embed.add_field(name="Provided by", value=modal_interaction.user.mention)
-                await task_channel.send(embed=embed)
+        async def modal_callback(modal_interaction: discord.Interaction):
+            reason = modal.children[0].value
+            task_channel = interaction.channel
 
-                await modal_interaction.response.send_message(f"Reason submitted: {reason}", ephemeral=True)
+            embed = discord.Embed(
+                title="Reason for Overdue Task",
+                description=f"Reason provided: {reason}",
+                color=discord.Color.orange()
+            )
+            embed.add_field(name="Provided by", value=modal_interaction.user.mention)
+            await self.outbox.send(task_channel, embed=embed)
 
-            modal.callback = modal_callback
-            await interaction.response.send_modal(modal)
+            await modal_interaction.response.send_message(f"Reason submitted: {reason}", ephemeral=True)
 
-        elif interaction.custom_id == "reassign_task":
-            modal = Modal(title="Re-Assign Task")
-            modal.add_item(InputText(label="Reason", style=discord.InputTextStyle.long))
+        modal.callback = modal_callback
+        await interaction.response.send_modal(modal)
 
-            async def modal_callback(modal_interaction: discord.Interaction):
-                reason = modal.children[0].value
-                task_channel = interaction.channel
+    async def reassign_task(self, interaction: discord.Interaction, argument=None):
+        modal = Modal(title="Re-Assign Task")
+        modal.add_item(InputText(label="Reason", style=discord.InputTextStyle.long))
 
-                embed = discord.Embed(
-                    title="Task Re-Assigned",
-                    description=f"Reason for reassigning the task: {reason}",
-                    color=discord.Color.orange()
-                )
-                embed.add_field(name="Reassigned by", value=modal_interaction.user.mention)
-                await task_channel.send(embed=embed)
-
-                await modal_interaction.response.send_message(f"Task has been re-assigned for the following reason: {reason}", ephemeral=True)
-
-            modal.callback = modal_callback
-            await interaction.response.send_modal(modal)
-
-        elif interaction.custom_id == "complete_task":
-            tasks_data = load_tasks()
-            for task in tasks_data['tasks']:
-                if task['channel_id'] == interaction.channel.id:
-                    task['status'] = "Completed"
-                    completed_task = task
-                    break
-            save_tasks(tasks_data)
-
-            completion_channel = self.bot.get_channel(COMPLETION_CHANNEL_ID)
-            if completion_channel:
-                embed = discord.Embed(
-                    title="Task Completed",
-                    description=f"The task '{completed_task['title']}' has been completed.",
-                    color=discord.Color.green()
-                )
-                embed.add_field(name="Description", value=completed_task['description'])
-                embed.add_field(name="Assigned to", value=f"<@{completed_task['assignee_id']}>")
-                embed.add_field(name="Completed by", value=f"<@{interaction.user.id}>")
-                embed.add_field(name="Completion Time", value=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                await completion_channel.send(embed=embed)
-
-            await interaction.response.send_message("Task marked as completed.", ephemeral=True)
-            await interaction.channel.delete()
-
-    @tasks.loop(minutes=1)
-    async def check_overdue_tasks(self):
-        tasks_data = load_tasks()
-        now = datetime.now()
-
-        for task in tasks_data.get('tasks', []):
-            if task.get('status') == 'Completed':
-                continue
-            
+        async def modal_callback(modal_interaction: discord.Interaction):
+            reason = modal.children[0].value
+            task_channel = interaction.channel
+
+            embed = discord.Embed(
+                title="Task Re-Assigned",
+                description=f"Reason for reassigning the task: {reason}",
+                color=discord.Color.orange()
+            )
+            embed.add_field(name="Reassigned by", value=modal_interaction.user.mention)
+            await self.outbox.send(task_channel, embed=embed)
+
+            await modal_interaction.response.send_message(f"Task has been re-assigned for the following reason: {reason}", ephemeral=True)
+
+        modal.callback = modal_callback
+        await interaction.response.send_modal(modal)
+
+    async def complete_task(self, interaction: discord.Interaction, argument=None):
+        if await self.store.get_by_channel(interaction.channel.id) is None:
+            return "This channel has no task."
+        completed_task = await self.store.set_status(interaction.channel.id, "Completed")
+        self.deadlines.cancel(interaction.channel.id)
+
+        completion_channel = self.bot.get_channel(get_config().completion_channel or COMPLETION_CHANNEL_ID)
+        if completion_channel:
+            embed = discord.Embed(
+                title="Task Completed",
+                description=f"The task '{completed_task['title']}' has been completed.",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="Description", value=completed_task['description'])
+            embed.add_field(name="Assigned to", value=f"<@{completed_task['assignee_id']}>")
+            embed.add_field(name="Completed by", value=f"<@{interaction.user.id}>")
+            embed.add_field(name="Completion Time", value=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            self.outbox.enqueue(completion_channel, embed=embed)
+
+        # Sent before the channel goes away, so not left to the router
+        await interaction.followup.send("Task marked as completed.", ephemeral=True)
+        await close_channel(interaction.channel)
+
+    async def delete_task(self, interaction: discord.Interaction, argument=None):
+        if not self.permissions.is_staff(interaction.user):
+            return "You do not have permission to delete this task."
+        if await self.store.get_by_channel(interaction.channel.id) is None:
+            return "This channel has no task."
+        await self.store.set_status(interaction.channel.id, "Deleted")
+        self.deadlines.cancel(interaction.channel.id)
+
+        # Sent before the channel goes away, so not left to the router
+        await interaction.followup.send("Task deleted.", ephemeral=True)
+        await close_channel(interaction.channel)
+
+    async def notify_overdue(self, channel_id: int):
+        """Called by the deadline scheduler when a task passes its due time.
+
+        One-off tasks become Overdue. Recurring tasks stay Pending and move on
+        to their next firing, so each occurrence is announced once."""
+        task = await self.store.get_by_channel(channel_id)
+        if task is None or task["status"] != "Pending":
+            return  # Completed before it became due
+        if task.get("recurrence"):
             try:
-                due_time = datetime.strptime(task['due'], "%H:%M:%S").time()
-                due_datetime = datetime.combine(now.date(), due_time)
-            except ValueError:
-                continue
-
-            if now > due_datetime:
-                task_channel = self.bot.get_channel(task['channel_id'])
-                if task_channel:
-                    embed = discord.Embed(
-                        title="Task Overdue",
-                        description=f"The task '{task['title']}' is overdue!",
-                        color=discord.Color.red()
-                    )
-                    embed.add_field(name="Description", value=task['description'])
-                    embed.add_field(name="Assigned to", value=f"<@{task['assignee_id']}>")
-                    embed.add_field(name="Due", value=task['due'])
-
-                    reason_button = Button(label="Submit Reason", style=discord.ButtonStyle.secondary, custom_id="reason_overdue")
-                    await task_channel.send(embed=embed, view=View().add_item(reason_button))
-
-    @check_overdue_tasks.before_loop
-    async def before_check_overdue_tasks(self):
-        await self.bot.wait_until_ready()
+                # Occurrences missed while the bot was offline collapse into this one
+                next_due_at = parse_rule(task["recurrence"]).next_after(
+                    max(time.time(), task["due_at"]), get_timezone(task.get("timezone"))
+                )
+            except ValueError as e:
+                print(f"Task in channel {channel_id} has an unusable schedule: {e}")
+                next_due_at = None
+            if next_due_at is not None and await self.store.reschedule(channel_id, next_due_at):
+                self.deadlines.schedule(channel_id, next_due_at)
+        else:
+            task = await self.store.mark_overdue(channel_id)
+            if task is None:
+                return  # Completed before it became due
+
+        task_channel = await resolve_channel(self.bot, channel_id)
+        if task_channel:
+            embed = discord.Embed(
+                title="Task Overdue",
+                description=f"The task '{task['title']}' is overdue!",
+                color=discord.Color.red()
+            )
+            embed.add_field(name="Description", value=task['description'])
+            embed.add_field(name="Assigned to", value=f"<@{task['assignee_id']}>")
+            embed.add_field(name="Due", value=format_due(task))
+
+            reason_button = Button(label="Submit Reason", style=discord.ButtonStyle.secondary, custom_id="task:reason")
+            self.outbox.enqueue(task_channel, embed=embed, view=persistent_view(reason_button))
 
 def setup(bot):
     bot.add_cog(TaskManagement(bot))
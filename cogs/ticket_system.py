@@ -1,39 +1,98 @@
 import discord
+from discord.commands import option
 from discord.ext import commands
-from discord.ui import View, Button, Select
+from discord.ui import Button, Select
 import random
 import time
-import json
 import os
-
-# Load config file
-with open("config.json", "r", encoding="utf-8") as file:
-    configData = json.load(file)
+from collections import Counter
+from utils.channel_index import get_channel_index
+from utils.config import get_config
+from utils.interactions import get_router, persistent_view
+from utils.outbox import get_outbox
+from utils.permissions import get_permissions
+from utils.ratelimit import KeyedRateLimiter
+from utils.sharding import data_path, is_primary
+from utils.ticket_analytics import TicketAnalytics, format_duration
+from utils.threads import close_channel, create_private_thread, invite_mentions, resolve_channel, thread_parent, uses_threads
+from utils.ticket_store import Ticket, TicketStore
+from utils.transcript_index import TranscriptDoc, TranscriptIndex, tokenize
+from utils.transcripts import transcript_path, write_transcript
 
 class TicketSystem(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.tickets_file = "tickets.json"
-        self.existing_tickets = {}  # Initialize the existing_tickets attribute
-
-    async def cog_load(self):
-        """Load existing tickets from the file on bot start."""
-        if os.path.exists(self.tickets_file):
-            with open(self.tickets_file, "r", encoding="utf-8") as file:
-                self.existing_tickets = json.load(file)
+        self.tickets_file = data_path("tickets.json")
+        # Loaded here rather than in cog_load, which py-cord never calls for
+        # synchronously loaded extensions. tickets.json is only read the first
+        # time, to seed the snapshot. Only the primary picks up the
+        # pre-sharding file, so its tickets are never duplicated
+        legacy_path = "tickets.json" if is_primary() and self.tickets_file != "tickets.json" else None
+        self.tickets = TicketStore(data_path("tickets.snap"), json_path=self.tickets_file, legacy_path=legacy_path)
+        self.analytics = TicketAnalytics(data_path("ticket_stats.json"))
+        self.transcripts = TranscriptIndex(data_path("transcript_index"))
+        self.outbox = get_outbox(bot)
+        self.permissions = get_permissions(bot)
+        self.channel_index = get_channel_index(bot)
+        self.router = get_router(bot)
+        config = get_config()
+        self.user_limiter = KeyedRateLimiter(config.ticket_user_limit, config.ticket_user_period)
+        self.guild_limiter = KeyedRateLimiter(config.ticket_guild_limit, config.ticket_guild_period)
+        self._opening = set()  # (guild_id, opener_id, reason) while the channel is being created
+        self.throttled = 0
+        self.duplicates = 0
+        # Both acknowledge first and run in the background: creating or deleting
+        # a channel under load can take longer than Discord's 3 second limit
+        self.router.register("ticket:open", self.open_ticket, defer=True)
+        self.router.register("ticket:close", self.close_ticket, defer=True, retries=1)
+
+    def cog_unload(self):
+        """Write any pending ticket changes before the bot shuts down."""
+        self.router.unregister("ticket:open", "ticket:close")
+        self.tickets.close()
+        self.analytics.close()
+        self.transcripts.close()
+
+    async def reconcile(self, channel_ids, guild_ids):
+        """Called once the gateway cache is ready: fill in the guild of tickets
+        imported from an old tickets.json, then drop tickets whose channel was
+        deleted while the bot was offline."""
+        for ticket in self.tickets:
+            if ticket.guild_id is None:
+                channel = self.bot.get_channel(ticket.channel_id)
+                if channel is not None:
+                    self.tickets.update(ticket.channel_id, guild_id=channel.guild.id)
+        if uses_threads(get_config().ticket_mode):
+            stale = []  # Archived threads aren't cached, so a missing id proves nothing
         else:
-            self.existing_tickets = {}
+            stale = [
+                ticket.channel_id for ticket in self.tickets
+                if ticket.guild_id in guild_ids and ticket.channel_id not in channel_ids
+            ]
+        self.tickets.remove_many(stale)
+        restored = self.tickets.restored
+        print(
+            f"[TICKETS] {len(self.tickets)} open tickets restored from "
+            f"{restored.get('records', 0)} snapshot records and {restored.get('log_entries', 0)} log entries "
+            f"in {restored.get('seconds', 0.0) * 1000:.1f} ms, {len(stale)} with deleted channels dropped"
+        )
 
-    async def cog_unload(self):
-        """Save tickets to file before the bot shuts down."""
-        with open(self.tickets_file, "w", encoding="utf-8") as file:
-            json.dump(self.existing_tickets, file, indent=4)
+    def collect_metrics(self):
+        values = {f"tickets_{key}": value for key, value in self.tickets.stats().items()}
+        values.update((f"transcripts_{key}", value) for key, value in self.transcripts.stats().items())
+        values.update(
+            tickets_throttled=self.throttled,
+            tickets_duplicate=self.duplicates,
+            tickets_rate_limited_keys=len(self.user_limiter) + len(self.guild_limiter),
+        )
+        return values
 
     @commands.slash_command(name='setup_ticket', description='Sets up the ticket system with a dropdown menu.')
     @commands.has_permissions(administrator=True)
     async def setup_ticket(self, ctx: discord.ApplicationContext):
         """Sets up the ticket system with a dropdown menu."""
         select = Select(
+            custom_id='ticket:open',
             placeholder='Select a reason for your ticket',
             options=[
                 discord.SelectOption(label='Billing', value='billing'),
@@ -42,168 +101,295 @@ class TicketSystem(commands.Cog):
             ]
         )
 
-        async def select_callback(interaction: discord.Interaction):
-            reason = select.values[0]
-            await self.create_ticket_channel(interaction, reason)
-
-        select.callback = select_callback
-
         embed = discord.Embed(
             title="Create a Ticket",
             description="Please select the reason for your ticket from the dropdown menu below."
         )
 
-        view = View()
-        view.add_item(select)
+        await ctx.respond(embed=embed, view=persistent_view(select))
 
-        await ctx.respond(embed=embed, view=view)
+    async def open_ticket(self, interaction: discord.Interaction, argument=None):
+        """Routed from the setup_ticket dropdown (custom_id ticket:open)."""
+        reason = interaction.data["values"][0]
+        return await self.create_ticket_channel(interaction, reason)
 
     async def create_ticket_channel(self, interaction: discord.Interaction, reason: str):
-        """Create a ticket channel and send a welcome message."""
+        """Create a ticket channel (or private thread) and send a welcome message.
+        Returns the message for the member who opened it."""
+        guild = interaction.guild
+        user = interaction.user
+
+        # Both checks are in memory and run before any API call, so repeated
+        # clicks cost nothing once a member is over the limit
+        key = (guild.id, user.id, reason)
+        existing = self.tickets.open_ticket(*key)
+        if existing is not None or key in self._opening:
+            self.duplicates += 1
+            where = f": <#{existing.channel_id}>" if existing is not None else " being created."
+            return f"You already have an open ticket for '{reason}'{where}"
+        wait = max(self.user_limiter.retry_after(user.id), self.guild_limiter.retry_after(guild.id))
+        if wait > 0:
+            self.throttled += 1
+            return f"You are opening tickets too quickly, please try again <t:{int(time.time() + wait) + 1}:R>."
+        self.user_limiter.take(user.id)
+        self.guild_limiter.take(guild.id)
+
+        self._opening.add(key)
+        try:
+            return await self._create_ticket_channel(interaction, reason)
+        finally:
+            self._opening.discard(key)
+
+    async def _create_ticket_channel(self, interaction: discord.Interaction, reason: str):
         guild = interaction.guild
-        category = discord.utils.get(guild.categories, name="Tickets")
-        if not category:
-            category = await guild.create_category("Tickets")
 
         # Generate a unique identifier (timestamp + random number)
         unique_id = int(time.time()) + random.randint(100000, 999999)
         channel_name = f"{reason}-{unique_id}"
 
-        if discord.utils.get(guild.channels, name=channel_name):
-            await interaction.response.send_message(f"A ticket with the reason '{reason}' already exists.", ephemeral=True)
-            return
-
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(read_messages=False, send_messages=False, attach_files=False),
-            interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True, attach_files=True),
-            guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, attach_files=True),
-        }
-
-        ticket_channel = await guild.create_text_channel(
-            name=channel_name,
-            category=category,
-            overwrites=overwrites
-        )
+        config = get_config()
+        if uses_threads(config.ticket_mode):
+            # A private thread under the ticket panel's channel; mentioning the
+            # member in the first message adds them to it
+            parent = thread_parent(self.bot, config.ticket_thread_parent, interaction.channel)
+            ticket_channel = await create_private_thread(parent, channel_name)
+        else:
+            overwrites = {
+                guild.default_role: discord.PermissionOverwrite(read_messages=False, send_messages=False, attach_files=False),
+                interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True, attach_files=True),
+                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, attach_files=True),
+            }
+
+            # "Tickets" overflows into "Tickets 2", "Tickets 3", ... at 50 channels each
+            async with self.channel_index.slot(guild, "Tickets") as category:
+                ticket_channel = await guild.create_text_channel(
+                    name=channel_name,
+                    category=category,
+                    overwrites=overwrites
+                )
+                self.channel_index.add(ticket_channel)
 
         embed = discord.Embed(
             title="Ticket Created",
             description=f"**Member:** {interaction.user.mention}\n**Reason for opening:** {reason}"
         )
-        view = View()
-        close_button = Button(style=discord.ButtonStyle.danger, label="Close Ticket")
-        view.add_item(close_button)
-
-        # Define the ID of the role that can close tickets
-        allowed_role_id = int(configData["staff_role"])  # Ensure this is an integer
-
-        async def close_ticket_callback(interaction: discord.Interaction):
-            # Check if the user has the allowed role by ID
-            has_permission = any(role.id == allowed_role_id for role in interaction.user.roles)
-            if not has_permission:
-                # Send a debug message with role IDs and user's roles
-                role_ids = [role.id for role in interaction.user.roles]
-                await interaction.response.send_message(
-                    f"You do not have permission to close this ticket. Your roles: {role_ids}, Required role ID: {allowed_role_id}",
-                    ephemeral=True
-                )
-                return
-
-            # Acknowledge the user's request to close the ticket
-            await interaction.response.defer(ephemeral=True)
-
-            # Generate and send the transcript before deleting the channel
-            transcript_embed = await self.generate_transcript(ticket_channel)
-            transcript_channel = self.bot.get_channel(int(configData["transcript_channel"]))
-            if transcript_channel:
-                await transcript_channel.send(embed=transcript_embed)
-
-            # Delete the channel after sending the transcript
-            await ticket_channel.delete()
-            del self.existing_tickets[ticket_channel.id]
-            with open(self.tickets_file, "w", encoding="utf-8") as file:
-                json.dump(self.existing_tickets, file, indent=4)
+        close_button = Button(
+            style=discord.ButtonStyle.danger,
+            label="Close Ticket",
+            custom_id=f"ticket:close:{ticket_channel.id}"
+        )
 
-            # Follow up with the user after the channel has been deleted
-            await interaction.followup.send("Ticket closed and channel deleted.", ephemeral=True)
+        # Written to tickets.json in the background with other pending changes
+        self.tickets.add(Ticket(
+            channel_id=ticket_channel.id,
+            guild_id=guild.id,
+            reason=reason,
+            channel_name=channel_name,
+            opener_id=interaction.user.id,
+            opened_at=time.time()
+        ))
+        self.analytics.opened(guild.id, reason)
+
+        content = invite_mentions(ticket_channel, interaction.user)
+        await ticket_channel.send(content=content, embed=embed, view=persistent_view(close_button))
+        return f"Your ticket has been created: {ticket_channel.mention}"
+
+    async def close_ticket(self, interaction: discord.Interaction, argument: str):
+        """Routed from a ticket's close button (custom_id ticket:close:<channel_id>)."""
+        # Only staff (configured staff role, "Staff" roles or admins) may close tickets
+        if not self.permissions.is_staff(interaction.user):
+            return f"You do not have permission to close this ticket. Required role ID: {get_config().staff_role}"
+
+        channel_id = int(argument)
+        channel = await resolve_channel(self.bot, channel_id)
+        if not channel:
+            self.tickets.remove(channel_id)
+            return "This ticket no longer exists."
+
+        # Generate and send the transcript before deleting the channel
+        transcript_embed, transcript_file, summary = await self.generate_transcript(channel)
+        transcript_channel = self.bot.get_channel(get_config().transcript_channel)
+        if transcript_channel:
+            self.outbox.enqueue(transcript_channel, embed=transcript_embed, file=transcript_file)
+
+        # Delete the channel (or archive and lock the thread) after sending the transcript.
+        # Looked up first: the channel delete event may remove the ticket before close_channel returns
+        ticket = self.tickets.get(channel_id)
+        await close_channel(channel)
+        self.tickets.remove(channel_id)
+        if ticket is not None:
+            duration = time.time() - ticket.opened_at if ticket.opened_at else None
+            self.analytics.closed(ticket.guild_id or channel.guild.id, ticket.reason, interaction.user.id, duration)
+        # Indexed only once the close went through, so a retried close adds it once
+        self.index_transcript(channel, ticket, summary, interaction.user.id)
+
+        # The router follows up with the user after the channel has been deleted
+        closed = "thread archived" if isinstance(channel, discord.Thread) else "channel deleted"
+        return f"Ticket closed and {closed}."
 
-        close_button.callback = close_ticket_callback
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        """A ticket channel deleted by hand is closed, so its opener can open a new one."""
+        self._forget(channel.id)
 
-        # Save the ticket channel ID to the file
-        self.existing_tickets[ticket_channel.id] = {
-            'reason': reason,
-            'channel_name': channel_name
-        }
-        with open(self.tickets_file, "w", encoding="utf-8") as file:
-            json.dump(self.existing_tickets, file, indent=4)
+    @commands.Cog.listener()
+    async def on_raw_thread_delete(self, payload: discord.RawThreadDeleteEvent):
+        # The raw event, since archived ticket threads are not in the cache
+        self._forget(payload.thread_id)
 
-        await ticket_channel.send(embed=embed, view=view)
-        await interaction.response.send_message(f"Your ticket has been created: {ticket_channel.mention}", ephemeral=True)
+    def _forget(self, channel_id: int):
+        ticket = self.tickets.remove(channel_id)
+        if ticket is not None:
+            print(f"[TICKETS] Ticket channel {ticket.channel_name} was deleted, dropped its ticket")
 
-    async def generate_transcript(self, channel: discord.TextChannel) -> discord.Embed:
-        """Generate a transcript of the chat messages in a channel."""
-        messages = await channel.history(limit=200).flatten()  # Adjust the limit as needed
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Record the first staff reply in a ticket for the response-time stats."""
+        if message.author.bot or message.guild is None:
+            return
+        ticket = self.tickets.get(message.channel.id)
+        if ticket is None or ticket.first_response_at is not None or message.author.id == ticket.opener_id:
+            return
+        if not self.permissions.is_staff(message.author):
+            return
+        responded_at = message.created_at.timestamp()
+        self.tickets.update(ticket.channel_id, first_response_at=responded_at)
+        if ticket.opened_at:
+            self.analytics.first_response(ticket.guild_id or message.guild.id, ticket.reason, message.author.id, responded_at - ticket.opened_at)
+
+    @commands.slash_command(name='ticket_stats', description='Shows ticket response and resolution times.')
+    @discord.guild_only()
+    async def ticket_stats(self, ctx: discord.ApplicationContext):
+        """Answers from this guild's running aggregates; no channel history is read."""
+        if not self.permissions.is_staff(ctx.author):
+            await ctx.respond("You do not have permission to view ticket stats.", ephemeral=True)
+            return
 
-        transcript_content = "\n".join([f"{msg.author}: {msg.content}" for msg in messages if msg.content])
+        def describe(aggregate):
+            lines = [f"{aggregate.closed} closed"]
+            if aggregate.response.count:
+                response = aggregate.response
+                lines.append(
+                    f"first response avg {format_duration(response.total / response.count)}, "
+                    f"p50 ≤ {format_duration(response.quantile(0.5))}, p90 ≤ {format_duration(response.quantile(0.9))}"
+                )
+            if aggregate.resolution.count:
+                resolution = aggregate.resolution
+                lines.append(
+                    f"close avg {format_duration(resolution.total / resolution.count)}, "
+                    f"p50 ≤ {format_duration(resolution.quantile(0.5))}, p90 ≤ {format_duration(resolution.quantile(0.9))}"
+                )
+            return "\n".join(lines)
+
+        stats = self.analytics.guild(ctx.guild.id)
+        embed = discord.Embed(title="Ticket Stats", color=discord.Color.blurple())
+        for reason, aggregate in sorted(stats.reasons.items()):
+            embed.add_field(
+                name=f"{reason} ({aggregate.opened} opened)",
+                value=describe(aggregate)[:1024],
+                inline=False
+            )
+        busiest = sorted(stats.staff.items(), key=lambda item: item[1].closed, reverse=True)[:10]
+        if busiest:
+            embed.add_field(
+                name="Staff",
+                value="\n\n".join(f"<@{staff_id}>: {describe(aggregate)}" for staff_id, aggregate in busiest)[:1024],
+                inline=False
+            )
+        if not embed.fields:
+            embed.description = "No tickets yet."
+        embed.set_footer(text=f"{self.tickets.count(ctx.guild.id)} open")
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    async def generate_transcript(self, channel: discord.TextChannel):
+        """Stream the full channel history into a compressed transcript file.
+
+        Returns a summary embed, the discord.File to attach alongside it and
+        the TranscriptSummary."""
+        fmt = get_config().transcript_format
+        path = transcript_path(channel.name, channel.id, fmt)
+        summary = await write_transcript(
+            channel.history(limit=None, oldest_first=True),
+            path,
+            fmt,
+            title=f"Transcript for #{channel.name}"
+        )
 
+        top_participants = sorted(summary.participants.items(), key=lambda item: item[1], reverse=True)[:10]
         transcript_embed = discord.Embed(
             title="Ticket Transcript",
-            description=transcript_content[:4096]  # Ensure the description doesn't exceed embed length limit
+            description=f"Full transcript of **#{channel.name}** is attached."
         )
-        return transcript_embed
-
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """Check and restore state for existing tickets when the bot is ready."""
-        for channel_id, ticket_info in self.existing_tickets.items():
-            channel = self.bot.get_channel(channel_id)
-            if channel and isinstance(channel, discord.TextChannel):
-                # Re-create ticket embed and view if the channel still exists
-                embed = discord.Embed(
-                    title="Ticket Recovered",
-                    description=f"**Reason for opening:** {ticket_info['reason']}"
-                )
-                view = View()
-                close_button = Button(style=discord.ButtonStyle.danger, label="Close Ticket")
-                view.add_item(close_button)
-                close_button.callback = self.get_close_ticket_callback(channel_id, ticket_info['reason'])
-
-                await channel.send(embed=embed, view=view)
-
-    def get_close_ticket_callback(self, channel_id: int, reason: str):
-        async def close_ticket_callback(interaction: discord.Interaction):
-            # Check if the user has the allowed role by ID
-            allowed_role_id = int(configData["staff_role"])  # Ensure this is an integer
-            has_permission = any(role.id == allowed_role_id for role in interaction.user.roles)
-            if not has_permission:
-                # Send a debug message with role IDs and user's roles
-                role_ids = [role.id for role in interaction.user.roles]
-                await interaction.response.send_message(
-                    f"You do not have permission to close this ticket. Your roles: {role_ids}, Required role ID: {allowed_role_id}",
-                    ephemeral=True
-                )
-                return
-
-            channel = self.bot.get_channel(channel_id)
-            if channel and isinstance(channel, discord.TextChannel):
-                # Acknowledge the user's request to close the ticket
-                await interaction.response.defer(ephemeral=True)
-
-                # Generate and send the transcript before deleting the channel
-                transcript_embed = await self.generate_transcript(channel)
-                transcript_channel = self.bot.get_channel(int(configData["transcript_channel"]))
-                if transcript_channel:
-                    await transcript_channel.send(embed=transcript_embed)
-
-                # Delete the channel after sending the transcript
-                await channel.delete()
-                del self.existing_tickets[channel_id]
-                with open(self.tickets_file, "w", encoding="utf-8") as file:
-                    json.dump(self.existing_tickets, file, indent=4)
-
-                # Follow up with the user after the channel has been deleted
-                await interaction.followup.send("Ticket closed and channel deleted.", ephemeral=True)
+        transcript_embed.add_field(name="Messages", value=str(summary.messages))
+        transcript_embed.add_field(name="Attachments", value=str(summary.attachments))
+        transcript_embed.add_field(name="Embeds", value=str(summary.embeds))
+        if top_participants:
+            transcript_embed.add_field(
+                name="Participants",
+                value="\n".join(f"{name}: {count}" for name, count in top_participants)[:1024],
+                inline=False
+            )
+        if summary.first_at:
+            transcript_embed.set_footer(text=f"{summary.first_at} - {summary.last_at}")
+        return transcript_embed, discord.File(path, filename=os.path.basename(path)), summary
+
+    def index_transcript(self, channel, ticket, summary, closer_id: int):
+        """Make a closed ticket findable with /ticket_search."""
+        terms = Counter(summary.terms)
+        terms.update(tokenize(channel.name))
+        self.transcripts.add(TranscriptDoc(
+            channel_id=channel.id,
+            guild_id=channel.guild.id,
+            closed_at=time.time(),
+            terms=terms,
+            meta={
+                "channel_name": channel.name,
+                "reason": ticket.reason if ticket else None,
+                "opener_id": ticket.opener_id if ticket else None,
+                "closer_id": closer_id,
+                "messages": summary.messages,
+                "path": summary.path,
+                "preview": summary.preview,
+            }
+        ))
+
+    @commands.slash_command(name='ticket_search', description='Searches the transcripts of closed tickets.')
+    @discord.guild_only()
+    @option("query", str, description="Words to look for, e.g. billing refund")
+    @option("days", int, description="Only tickets closed in the last N days", required=False, min_value=1)
+    @option("attach", bool, description="Attach the best match's transcript", required=False)
+    async def ticket_search(self, ctx: discord.ApplicationContext, query: str, days: int = None, attach: bool = False):
+        """Ranked hits from the local transcript index, limited to this server."""
+        if not self.permissions.is_staff(ctx.author):
+            await ctx.respond("You do not have permission to search ticket transcripts.", ephemeral=True)
+            return
 
-        return close_ticket_callback
+        started = time.perf_counter()
+        since = time.time() - days * 86400 if days else None
+        hits = self.transcripts.search(query, guild_id=ctx.guild.id, since=since, limit=10)
+        elapsed = time.perf_counter() - started
+
+        embed = discord.Embed(title=f"Transcripts matching \"{query}\""[:256], color=discord.Color.blurple())
+        for hit in hits:
+            meta = hit.meta
+            details = [f"closed <t:{int(hit.closed_at)}:R>"]
+            if meta.get("opener_id"):
+                details.append(f"opened by <@{meta['opener_id']}>")
+            if meta.get("closer_id"):
+                details.append(f"closed by <@{meta['closer_id']}>")
+            value = ", ".join(details)
+            if meta.get("preview"):
+                value += f"\n> {meta['preview']}"
+            embed.add_field(name=f"#{meta.get('channel_name', hit.channel_id)}", value=value[:1024], inline=False)
+        if not hits:
+            embed.description = "No closed tickets match."
+        embed.set_footer(text=f"{len(hits)} of {len(self.transcripts)} transcripts in {elapsed * 1000:.1f} ms")
+
+        path = hits[0].meta.get("path") if hits and attach else None
+        if path and os.path.exists(path):
+            await ctx.respond(embed=embed, file=discord.File(path, filename=os.path.basename(path)), ephemeral=True)
+        else:
+            await ctx.respond(embed=embed, ephemeral=True)
 
 def setup(bot: commands.Bot):
     bot.add_cog(TicketSystem(bot))
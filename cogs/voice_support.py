@@ -1,60 +1,58 @@
 import discord
 from discord.ext import commands
-import os
-import asyncio
-import speech_recognition as sr
-from pydub import AudioSegment
-from pydub.playback import play
+from utils.audio_cache import AudioCache
+from utils.config import get_config
+from utils.voice_pipeline import VoicePipeline, play_and_wait
+from utils.voice_sessions import VoiceSessionManager
 
 class VoiceSupport(commands.Cog):
     def __init__(self, bot: discord.Bot):
         self.bot = bot
         self.audio_file = "voices/welcome.mp3"
-        self.support_channels = {1279780845250416700, 987654321098765432}  # Replace with your actual channel IDs
+        # Explicitly specify the path to the FFmpeg executable
+        self.ffmpeg_executable = "C:/ffmpeg-master-latest-win64-gpl/bin/ffmpeg.exe"  # Update this path
+        self.listen_seconds = 10
+        # Use "sphinx" for fully offline recognition or "stub" when testing locally
+        self.pipeline = VoicePipeline(backend="google", workers=2)
+        # Prompts are decoded once and played from memory afterwards
+        self.audio_cache = AudioCache(max_bytes=64 * 1024 * 1024, ffmpeg=self.ffmpeg_executable)
+        self.bot.loop.create_task(self.audio_cache.preload([self.audio_file]))
+        # Callers are queued per support channel and served one at a time per guild
+        self.sessions = VoiceSessionManager(self.serve_caller)
+
+    def cog_unload(self):
+        self.sessions.close()
+        self.pipeline.close()
+
+    def collect_metrics(self):
+        return {f"voice_{key}": value for key, value in self.sessions.stats().items()}
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
-        if after.channel is None:
-            return  # User left a channel, do nothing
+        self.sessions.update(member, before.channel, after.channel, get_config().voice_channels)
 
-        if after.channel.id in self.support_channels and not member.bot:
-            if self.bot.voice_clients:
-                for vc in self.bot.voice_clients:
-                    if vc.guild == member.guild:
-                        await vc.move_to(after.channel)
-                        await self.play_audio_and_listen(vc)
-                        return
-            
-            vc = await after.channel.connect()
-            await self.play_audio_and_listen(vc)
+    async def serve_caller(self, vc, member: discord.Member):
+        await self.play_audio_and_listen(vc)
 
     async def play_audio_and_listen(self, vc):
-        # Explicitly specify the path to the FFmpeg executable
-        ffmpeg_executable = "C:/ffmpeg-master-latest-win64-gpl/bin/ffmpeg.exe"  # Update this path
-        audio_source = discord.FFmpegPCMAudio(self.audio_file, executable=ffmpeg_executable)
-        vc.play(audio_source, after=lambda e: print(f'Player error: {e}') if e else None)
+        audio_source = await self.audio_cache.source(self.audio_file)
 
         # Wait for the audio to finish playing
-        while vc.is_playing():
-            await asyncio.sleep(1)
+        await play_and_wait(vc, audio_source)
 
         # Start listening to user input
         await self.listen_for_speech(vc)
 
     async def listen_for_speech(self, vc):
-        recognizer = sr.Recognizer()
+        """Record the channel and process recognized speech chunk by chunk.
+        Recognition runs in a process pool so the bot keeps responding meanwhile."""
+        print("Listening...")
+
+        async def on_text(user_id, text):
+            print(f"Recognized from {user_id}: {text}")
+            await self.process_command(vc, text)
 
-        with sr.AudioFile(self.audio_file) as source:  # Replace with actual audio input from Discord
-            print("Listening...")
-            audio_data = recognizer.record(source)
-            try:
-                text = recognizer.recognize_google(audio_data)
-                print(f"Recognized: {text}")
-                await self.process_command(vc, text)
-            except sr.UnknownValueError:
-                print("Google Speech Recognition could not understand audio")
-            except sr.RequestError as e:
-                print(f"Could not request results from Google Speech Recognition service; {e}")
+        await self.pipeline.listen(vc, self.listen_seconds, on_text)
 
     async def process_command(self, vc, text):
         # Process the recognized text and respond accordingly
@@ -78,7 +76,10 @@ class VoiceSupport(commands.Cog):
     @commands.command()
     async def leave(self, ctx: commands.Context):
         if ctx.voice_client:
-            await ctx.voice_client.disconnect()
+            # Also drops anyone still waiting in the guild's support queue
+            await self.sessions.disconnect(ctx.guild.id)
+            if ctx.voice_client:
+                await ctx.voice_client.disconnect()
             await ctx.send('Disconnected from the voice channel.')
         else:
             await ctx.send('I am not connected to any voice channel.')
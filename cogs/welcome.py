@@ -1,28 +1,46 @@
 import discord
 from discord.ext import commands
-import json
+from utils.config import get_config, on_config_reload, remove_config_reload
+from utils.join_queue import JoinQueue
 
-file = open("config.json", "r", encoding="utf-8")
-configData = json.load(file)
 class Welcome(commands.Cog):
     def __init__(self, bot_: discord.Bot):
         self.bot = bot_
+        # The role given to every new member is "user_role" in config.json
+        self.join_queue = JoinQueue(lambda guild: get_config().user_role, workers=4)
+        on_config_reload(self._on_config_reload)
+
+    def cog_unload(self):
+        remove_config_reload(self._on_config_reload)
+        self.join_queue.stop()
+
+    def _on_config_reload(self, config):
+        self.join_queue.invalidate()
+
+    def collect_metrics(self):
+        return {f"join_queue_{key}": value for key, value in self.join_queue.stats().items()}
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        # Replace ROLE_ID with the actual ID of the role you want to assign
-        role_id = 1278665831093370882  # Replace with the ID of your desired role
-        role = member.guild.get_role(role_id)
-        await member.add_roles(role)
-        
-        if role:
-            try:
-                await member.add_roles(role)
-                print(f"Assigned role {role.name} to {member.name}")
-            except Exception as e:
-                print(f"Failed to assign role: {e}")
-        else:
-            print(f"Role with ID {role_id} not found.")
+        # Role assignment happens in the background so mass joins don't pile up here
+        self.join_queue.submit(member)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.join_queue.invalidate(role.guild.id)
+
+    @commands.slash_command(name='onboarding_stats', description='Shows the new member onboarding queue.')
+    @commands.has_permissions(administrator=True)
+    async def onboarding_stats(self, ctx: discord.ApplicationContext):
+        stats = self.join_queue.stats()
+        embed = discord.Embed(title="Onboarding Queue", color=discord.Color.blurple())
+        embed.add_field(name="Backlog", value=str(stats["backlog"]))
+        embed.add_field(name="Throughput", value=f"{stats['throughput_per_sec']:.2f}/s")
+        embed.add_field(name="Assigned", value=str(stats["assigned"]))
+        embed.add_field(name="Duplicates", value=str(stats["duplicates"]))
+        embed.add_field(name="Retries", value=str(stats["retries"]))
+        embed.add_field(name="Failed", value=str(stats["failed"]))
+        await ctx.respond(embed=embed, ephemeral=True)
 
 def setup(bot):
     bot.add_cog(Welcome(bot))
@@ -0,0 +1,109 @@
+"""Runs the bot as several worker processes, each owning a range of shards.
+
+    python launcher.py --shards 8 --processes 2
+    python launcher.py --shards auto --processes 4
+    python launcher.py --shards 8 --processes 3 --dry-run
+
+Every worker runs main.py's bot as an AutoShardedBot for its shard range,
+with BOT_CLUSTER_ID/BOT_SHARD_IDS/BOT_SHARD_COUNT set in its environment.
+Stores are written under data/cluster-<id>/ so no two workers share a file.
+Crashed workers are restarted with exponential backoff.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+from utils.config import get_config
+from utils.sharding import cluster_env, plan_clusters
+
+RESTART_BACKOFF = (1, 60)  # Initial and maximum seconds between restarts
+
+
+def run_cluster(cluster_id: int, shard_ids, shard_count: int):
+    os.environ.update(cluster_env(cluster_id, shard_ids, shard_count))
+    import main  # Imported after the environment is set up
+
+    asyncio.run(main.main())
+
+
+async def recommended_shard_count() -> int:
+    """Ask Discord how many shards the bot should run."""
+    import discord
+
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(get_config().token)
+        shard_count, _ = await http.get_bot_gateway()
+        return shard_count
+    finally:
+        await http.close()
+
+
+def launch(plan, shard_count: int, target=run_cluster, restart=True):
+    processes = {}
+    backoff = {}
+
+    def start(cluster_id):
+        process = multiprocessing.Process(
+            target=target,
+            args=(cluster_id, plan[cluster_id], shard_count),
+            name=f"cluster-{cluster_id}"
+        )
+        process.start()
+        processes[cluster_id] = (process, time.monotonic())
+        print(f"[LAUNCHER] cluster {cluster_id} (shards {list(plan[cluster_id])}) started as pid {process.pid}")
+
+    for cluster_id in range(len(plan)):
+        start(cluster_id)
+
+    try:
+        while processes:
+            time.sleep(1)
+            for cluster_id, (process, started) in list(processes.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == 0 or not restart:
+                    print(f"[LAUNCHER] cluster {cluster_id} exited with code {process.exitcode}")
+                    del processes[cluster_id]
+                    continue
+                # Reset the backoff if the worker had been healthy for a while
+                delay = backoff.get(cluster_id, RESTART_BACKOFF[0])
+                if time.monotonic() - started > RESTART_BACKOFF[1]:
+                    delay = RESTART_BACKOFF[0]
+                print(f"[LAUNCHER] cluster {cluster_id} died with code {process.exitcode}, restarting in {delay}s")
+                time.sleep(delay)
+                backoff[cluster_id] = min(delay * 2, RESTART_BACKOFF[1])
+                start(cluster_id)
+    except KeyboardInterrupt:
+        print("[LAUNCHER] shutting down")
+        for process, _ in processes.values():
+            process.terminate()
+        for process, _ in processes.values():
+            process.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as multiple sharded worker processes.")
+    parser.add_argument("--shards", default="auto", help="total shard count, or 'auto' to ask Discord")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="print the shard plan and exit")
+    args = parser.parse_args()
+
+    if args.shards == "auto":
+        shard_count = asyncio.run(recommended_shard_count())
+    else:
+        shard_count = int(args.shards)
+
+    plan = plan_clusters(shard_count, args.processes)
+    for cluster_id, shard_ids in enumerate(plan):
+        print(f"cluster {cluster_id}: shards {list(shard_ids)} -> data/cluster-{cluster_id}/")
+    if args.dry_run:
+        return
+
+    launch(plan, shard_count)
+
+
+if __name__ == "__main__":
+    main()
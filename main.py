@@ -1,50 +1,130 @@
+import time
+_STARTED = time.perf_counter()
+
 import discord
 from discord.ext import commands
-import json
 import traceback
 import asyncio
+from utils.config import get_config
+from utils.metrics import enable_metrics
+from utils.sharding import current_cluster, is_primary
+from utils.startup import StartupTimer, reconcile_cogs, sync_commands_if_changed
+
+INITIAL_EXTENSIONS = [
+    "cogs.testcommandone",
+    "cogs.welcome",
+    "cogs.ticket_system",
+    "cogs.task_management",
+    "cogs.stats"
+]
 
-# Load configuration data
-with open("config.json", "r", encoding="utf-8") as file:
-    configData = json.load(file)
+# Extensions that are only loaded when their config flag is set, so their
+# dependencies are never imported on bots that don't use them
+OPTIONAL_EXTENSIONS = {
+    "cogs.voice_support": "voice_enabled",
+}
 
-intents = discord.Intents.default()
-intents.members = True
-intents.voice_states = True  # Ensure voice state updates are enabled
+def create_bot(shard_ids=None, shard_count=None, timer=None):
+    """Build the bot. With a shard_count the bot runs the given shard ids of an
+    AutoShardedBot (one worker process of launcher.py), otherwise it is a
+    single-connection bot as before."""
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.voice_states = True  # Ensure voice state updates are enabled
 
-bot = commands.Bot(command_prefix=commands.when_mentioned, sync_commands_debug=True, intents=intents)
+    # Commands are synced from on_connect, only when they changed and only by
+    # the primary cluster; the others just pick up the command ids
+    if shard_count:
+        bot = commands.AutoShardedBot(
+            command_prefix=commands.when_mentioned,
+            auto_sync_commands=False,
+            intents=intents,
+            shard_ids=list(shard_ids),
+            shard_count=shard_count
+        )
+    else:
+        bot = commands.Bot(command_prefix=commands.when_mentioned, auto_sync_commands=False, intents=intents)
+    bot.startup_timer = timer or StartupTimer()
+    commands_synced = False
 
-def load_extensions():
-    initial_extensions = [
-        "cogs.testcommandone",
-        "cogs.welcome",
-        "cogs.ticket_system",
-        "cogs.task_management"
+    @bot.event
+    async def on_connect():
+        nonlocal commands_synced
+        if commands_synced:
+            return  # on_connect fires again on every reconnect
+        commands_synced = True
+        try:
+            started = time.perf_counter()
+            primary = is_primary()
+            synced = await sync_commands_if_changed(bot, sync=primary)
+            if synced:
+                action = "synced"
+            elif primary:
+                action = "unchanged, skipped sync"
+            else:
+                action = "ids restored, sync left to cluster 0"
+            print(f"[COMMANDS] {action} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        except Exception as e:
+            commands_synced = False
+            print(f"Failed to sync application commands: {e}")
+            traceback.print_exc()
 
-    ]
+    @bot.event
+    async def on_ready():
+        print(f'Logged in as {bot.user}')
+        timer = bot.startup_timer
+        if not timer.reported:
+            timer.mark("gateway ready")
+            # Restored tickets and tasks are checked against the channel cache once
+            with timer.phase("reconcile"):
+                await reconcile_cogs(bot)
+            print(timer.report())
 
-    for extension in initial_extensions:
+    return bot
+
+def enabled_extensions(config=None):
+    config = config or get_config()
+    optional = [extension for extension, flag in OPTIONAL_EXTENSIONS.items() if getattr(config, flag, False)]
+    return INITIAL_EXTENSIONS + optional
+
+def load_extensions(bot):
+    for extension in enabled_extensions():
         if extension in bot.extensions:
-            print(f"Extension '{extension}' is already loaded.")
             continue
+        started = time.perf_counter()
         try:
             bot.load_extension(extension)
-            print(f"[LOADED] {extension}")
+            print(f"[LOADED] {extension} ({(time.perf_counter() - started) * 1000:.1f} ms)")
         except Exception as e:
             print(f"Failed to load extension {extension}: {e}")
             traceback.print_exc()
 
-@bot.event
-async def on_ready():
-    print(f'Logged in as {bot.user}')
-    # Load extensions after the bot is ready
-    load_extensions()
-
 # Run the bot with the token
 async def main():
+    timer = StartupTimer(started=_STARTED)
+    timer.mark("imports")
+    with timer.phase("config"):
+        config = get_config()
+        cluster = current_cluster()
+    if cluster is not None:
+        print(f"Cluster {cluster.cluster_id}: shards {list(cluster.shard_ids)} of {cluster.shard_count}")
+    with timer.phase("create bot"):
+        if cluster is not None:
+            bot = create_bot(cluster.shard_ids, cluster.shard_count, timer=timer)
+        else:
+            bot = create_bot(timer=timer)
+
     async with bot:
-        load_extensions()
-        await bot.start(configData["token"])
+        with timer.phase("extensions"):
+            load_extensions(bot)
+        if config.metrics_enabled:
+            with timer.phase("metrics"):
+                # Each cluster serves its own metrics on consecutive ports
+                port = config.metrics_port + cluster.cluster_id if cluster and config.metrics_port else config.metrics_port
+                await enable_metrics(bot, config.metrics_host, port)
+        with timer.phase("login"):
+            await bot.login(config.token)
+        await bot.connect()
 
 # Run the bot using asyncio.run
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""Shared fixtures. Cogs run against the fakes in bench/fake_discord.py, in a
+scratch directory, so no test touches the real tasks.db or tickets files."""
+import os
+import shutil
+
+import discord
+import pytest
+from discord.ext import commands
+
+from bench.fake_discord import FakeContext, FakeGateway, FakeGuild, FakeHTTP, FakeTextChannel, FakeUser
+from utils.outbox import Outbox
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(REPO_ROOT, "config.json"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class FakeWorld:
+    """A bot that never connects, with the given extensions loaded. Build it
+    inside a running event loop, since some cogs schedule work on load."""
+
+    def __init__(self, extensions=()):
+        self.http = FakeHTTP()
+        self.bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+        self.gateway = FakeGateway(self.bot, self.http)
+        self.bot.get_channel = self.gateway.get_channel
+        self.bot.outbox = Outbox(channel_rate=(10_000, 1.0), global_rate=(10_000, 1.0))
+        self.extensions = list(extensions)
+        for extension in self.extensions:
+            self.bot.load_extension(extension)
+
+    def guild(self, name="guild"):
+        guild = FakeGuild(self.gateway, name=name)
+        guild.staff = FakeUser(guild, "staff", roles=[guild.add_role("Staff")])
+        guild.lobby = guild._add_channel(FakeTextChannel(guild, "lobby"))
+        return guild
+
+    def context(self, guild, author=None):
+        return FakeContext(guild, author or guild.staff, guild.lobby)
+
+    def close(self):
+        for extension in self.extensions:
+            self.bot.unload_extension(extension)
+
+
+@pytest.fixture
+def world_factory():
+    return FakeWorld
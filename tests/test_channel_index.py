@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+
+import discord
+
+from utils.channel_index import MAX_CHANNELS_PER_CATEGORY, ChannelIndex
+
+_ids = itertools.count(1)
+
+
+class Bot:
+    def add_listener(self, listener, name):
+        pass
+
+
+class Category(discord.CategoryChannel):
+    # Subclassed so ChannelIndex's isinstance checks see a real category
+    def __init__(self, guild, name):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = name
+        self.category_id = None
+
+
+class TextChannel:
+    def __init__(self, guild, name, category=None):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = name
+        self.category_id = category.id if category else None
+
+
+class Guild:
+    def __init__(self):
+        self.id = next(_ids)
+        self._channels = {}
+        self.created_categories = 0
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def add(self, channel):
+        self._channels[channel.id] = channel
+        return channel
+
+    async def create_category(self, name):
+        await asyncio.sleep(0)
+        self.created_categories += 1
+        return self.add(Category(self, name))
+
+    async def create_text_channel(self, name, category=None):
+        await asyncio.sleep(0)
+        return self.add(TextChannel(self, name, category))
+
+
+async def _open(index, guild, name):
+    async with index.slot(guild, "Tickets") as category:
+        channel = await guild.create_text_channel(name, category=category)
+        index.add(channel)
+        return channel
+
+
+def test_full_category_overflows_into_the_next():
+    async def scenario():
+        guild = Guild()
+        tickets = guild.add(Category(guild, "Tickets"))
+        for number in range(MAX_CHANNELS_PER_CATEGORY - 1):
+            guild.add(TextChannel(guild, f"old-{number}", tickets))
+        index = ChannelIndex(Bot())
+
+        last = await _open(index, guild, "last")
+        assert last.category_id == tickets.id
+        overflow = await _open(index, guild, "overflow")
+        overflow_category = guild.get_channel(overflow.category_id)
+        assert overflow_category.name == "Tickets 2"
+        assert guild.created_categories == 1
+        # "Tickets 2" is reused rather than created again
+        assert (await _open(index, guild, "more")).category_id == overflow_category.id
+        assert guild.created_categories == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_creations_never_overfill_a_category():
+    async def scenario():
+        guild = Guild()
+        tickets = guild.add(Category(guild, "Tickets"))
+        for number in range(MAX_CHANNELS_PER_CATEGORY - 3):
+            guild.add(TextChannel(guild, f"old-{number}", tickets))
+        index = ChannelIndex(Bot())
+
+        channels = await asyncio.gather(*(_open(index, guild, f"new-{number}") for number in range(10)))
+        per_category = {}
+        for channel in channels:
+            name = guild.get_channel(channel.category_id).name
+            per_category[name] = per_category.get(name, 0) + 1
+        assert per_category == {"Tickets": 3, "Tickets 2": 7}
+        assert guild.created_categories == 1
+
+    asyncio.run(scenario())
+
+
+def test_deleted_channel_frees_its_slot():
+    async def scenario():
+        guild = Guild()
+        tickets = guild.add(Category(guild, "Tickets"))
+        old = [guild.add(TextChannel(guild, f"old-{number}", tickets)) for number in range(MAX_CHANNELS_PER_CATEGORY)]
+        index = ChannelIndex(Bot())
+        index._index(guild)
+
+        await index._on_channel_delete(old[0])
+        # Recording a channel twice (event after add()) doesn't count it twice
+        await index._on_channel_create(old[1])
+        assert (await _open(index, guild, "new")).category_id == tickets.id
+        assert guild.created_categories == 0
+
+    asyncio.run(scenario())
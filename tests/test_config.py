@@ -0,0 +1,13 @@
+from utils.config import BotConfig
+from utils.threads import uses_threads
+
+
+def test_unknown_mode_is_reported_once_and_falls_back_to_channels(capsys):
+    config = BotConfig.from_dict({"token": "x", "ticket_mode": "forum", "task_mode": "thread"})
+    assert capsys.readouterr().out.count("Unknown ticket_mode 'forum'") == 1
+    assert config.ticket_mode == "channel"
+    assert config.task_mode == "thread"
+    for _ in range(3):
+        assert not uses_threads(config.ticket_mode)
+        assert uses_threads(config.task_mode)
+    assert capsys.readouterr().out == ""
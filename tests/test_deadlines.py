@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from utils.deadlines import DeadlineScheduler
+
+
+class Recorder:
+    def __init__(self):
+        self.fired = []
+        self.event = asyncio.Event()
+
+    async def __call__(self, key):
+        self.fired.append(key)
+        self.event.set()
+
+
+def test_due_keys_fire_in_deadline_order():
+    async def scenario():
+        recorder = Recorder()
+        scheduler = DeadlineScheduler(recorder, clock=lambda: 100.0)
+        scheduler.schedule("c", 30.0)
+        scheduler.schedule("a", 10.0)
+        scheduler.schedule_many([("d", 40.0), ("b", 20.0), ("later", 500.0)])
+        assert scheduler.next_due() == 10.0
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        scheduler.stop()
+        assert recorder.fired == ["a", "b", "c", "d"]
+        assert list(scheduler._entries) == ["later"]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_and_moved_keys_fire_at_most_once():
+    async def scenario():
+        recorder = Recorder()
+        scheduler = DeadlineScheduler(recorder, clock=lambda: 100.0)
+        scheduler.schedule("cancelled", 10.0)
+        scheduler.schedule("moved", 20.0)
+        scheduler.schedule("moved", 5.0)
+        scheduler.schedule("moved", 50.0)  # Twice, leaving two stale heap entries behind
+        scheduler.schedule("postponed", 30.0)
+        scheduler.schedule("postponed", 200.0)
+        scheduler.cancel("cancelled")
+        assert len(scheduler) == 2 and "cancelled" not in scheduler
+        # Stale entries stay in the heap until they reach the top
+        assert len(scheduler._heap) == 6
+        assert scheduler.next_due() == 50.0
+
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        scheduler.stop()
+        assert recorder.fired == ["moved"]
+        assert "postponed" in scheduler
+
+    asyncio.run(scenario())
+
+
+def test_stale_entries_are_compacted():
+    scheduler = DeadlineScheduler(Recorder(), clock=lambda: 0.0)
+    for due_at in range(200):
+        scheduler.schedule("key", float(due_at))
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 64
+    assert scheduler.next_due() == 199.0
+
+
+def test_earlier_deadline_wakes_the_sleeping_loop():
+    async def scenario():
+        recorder = Recorder()
+        scheduler = DeadlineScheduler(recorder, clock=time.monotonic)
+        scheduler.schedule("late", time.monotonic() + 60)
+        scheduler.start()
+        await asyncio.sleep(0.05)  # Now sleeping until "late"
+
+        started = time.monotonic()
+        scheduler.schedule("early", started + 0.1)
+        await asyncio.wait_for(recorder.event.wait(), 5)
+        assert recorder.fired == ["early"]
+        assert time.monotonic() - started < 1
+        scheduler.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failing_callback_does_not_stop_the_loop(capsys):
+    async def scenario():
+        fired = []
+
+        async def callback(key):
+            fired.append(key)
+            if key == "broken":
+                raise RuntimeError("boom")
+
+        scheduler = DeadlineScheduler(callback, clock=lambda: 100.0)
+        scheduler.schedule_many([("broken", 1.0), ("fine", 2.0)])
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        scheduler.stop()
+        assert fired == ["broken", "fine"]
+
+    asyncio.run(scenario())
+    assert "Deadline callback failed for broken: boom" in capsys.readouterr().out
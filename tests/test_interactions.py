@@ -0,0 +1,196 @@
+import asyncio
+
+import discord
+import pytest
+
+from utils import interactions
+from utils.interactions import FAILURE_MESSAGE, InteractionRouter
+
+
+class Interaction:
+    def __init__(self, custom_id, type=discord.InteractionType.component):
+        self.custom_id = custom_id
+        self.type = type
+
+
+@pytest.mark.parametrize("custom_id, expected", [
+    ("ticket:close:1280120621036212285", ("ticket:close", "1280120621036212285")),
+    ("ticket:open", ("ticket:open", None)),
+    ("task:review:a:b", ("task:review", "a:b")),
+    ("task:review:", ("task:review", "")),
+    ("review_task", ("review_task", None)),
+])
+def test_parse(custom_id, expected):
+    assert InteractionRouter.parse(custom_id) == expected
+
+
+def test_dispatch_routes_by_key():
+    async def scenario():
+        router = InteractionRouter()
+        calls = []
+
+        async def close(interaction, argument):
+            calls.append(("close", interaction.custom_id, argument))
+
+        async def review(interaction, argument):
+            calls.append(("review", interaction.custom_id, argument))
+
+        router.register("ticket:close", close)
+        router.register("review_task", review)
+        await router.dispatch(Interaction("ticket:close:42"))
+        await router.dispatch(Interaction("review_task"))
+        await router.dispatch(Interaction("ticket:unknown:42"))
+        await router.dispatch(Interaction(None))
+        await router.dispatch(Interaction("ticket:close:7", type=discord.InteractionType.application_command))
+        assert calls == [("close", "ticket:close:42", "42"), ("review", "review_task", None)]
+
+        router.unregister("ticket:close")
+        await router.dispatch(Interaction("ticket:close:42"))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_register_twice_is_refused():
+    router = InteractionRouter()
+
+    async def handler(interaction, argument):
+        pass
+
+    router.register("ticket:open", handler)
+    with pytest.raises(ValueError):
+        router.register("ticket:open", handler)
+
+
+class Response:
+    def __init__(self, log, fail_with=None):
+        self.log = log
+        self.fail_with = fail_with
+
+    async def defer(self, **kwargs):
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.log.append("ack")
+
+
+class Followup:
+    def __init__(self, log):
+        self.log = log
+
+    async def send(self, content=None, **kwargs):
+        self.log.append(("followup", content, kwargs.get("ephemeral")))
+
+
+class DeferredInteraction(Interaction):
+    def __init__(self, custom_id, fail_ack_with=None):
+        super().__init__(custom_id)
+        self.id = discord.utils.time_snowflake(discord.utils.utcnow())
+        self.log = []
+        self.response = Response(self.log, fail_ack_with)
+        self.followup = Followup(self.log)
+
+
+class NotFoundResponse:
+    status = 404
+    reason = "Not Found"
+
+
+def _run_deferred(handler, interaction=None, **options):
+    async def scenario():
+        router = InteractionRouter()
+        router.register("task:review", handler, defer=True, **options)
+        target = interaction or DeferredInteraction("task:review:1")
+        await router.dispatch(target)
+        await router.join()
+        return router, target
+
+    return asyncio.run(scenario())
+
+
+def test_deferred_handler_is_acknowledged_before_it_runs():
+    async def handler(interaction, argument):
+        interaction.log.append(("handler", argument))
+        return "Review requested."
+
+    router, interaction = _run_deferred(handler)
+    assert interaction.log == ["ack", ("handler", "1"), ("followup", "Review requested.", True)]
+    assert (router.acked, router.jobs_ok, router.jobs_failed) == (1, 1, 0)
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(interactions, "RETRY_BACKOFF", 0.0)
+    attempts = []
+
+    async def handler(interaction, argument):
+        attempts.append(argument)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return {"content": "done", "ephemeral": False}
+
+    router, interaction = _run_deferred(handler, retries=2)
+    assert len(attempts) == 3
+    assert interaction.log[-1] == ("followup", "done", False)
+    assert (router.retries, router.jobs_ok) == (2, 1)
+
+
+def test_failures_get_a_followup(monkeypatch, capsys):
+    monkeypatch.setattr(interactions, "RETRY_BACKOFF", 0.0)
+    attempts = []
+
+    async def flaky(interaction, argument):
+        attempts.append(argument)
+        raise ConnectionError("reset")
+
+    router, interaction = _run_deferred(flaky, retries=1)
+    assert len(attempts) == 2
+    assert interaction.log == ["ack", ("followup", FAILURE_MESSAGE, True)]
+
+    async def broken(interaction, argument):
+        raise RuntimeError("boom")
+
+    router, interaction = _run_deferred(broken, retries=3)
+    assert interaction.log == ["ack", ("followup", FAILURE_MESSAGE, True)]
+    assert (router.retries, router.jobs_failed) == (0, 1)  # Only transient errors are retried
+    assert "Ignoring exception in interaction job task:review" in capsys.readouterr().out
+
+
+def test_slow_handler_times_out():
+    async def slow(interaction, argument):
+        await asyncio.sleep(5)
+
+    router, interaction = _run_deferred(slow, timeout=0.05)
+    assert interaction.log == ["ack", ("followup", FAILURE_MESSAGE, True)]
+    assert router.jobs_failed == 1
+
+
+def test_handler_does_not_run_when_the_ack_fails():
+    ran = []
+
+    async def handler(interaction, argument):
+        ran.append(argument)
+
+    interaction = DeferredInteraction("task:review:1", discord.NotFound(NotFoundResponse(), "Unknown interaction"))
+    router, _ = _run_deferred(handler, interaction)
+    assert ran == [] and interaction.log == []
+    assert (router.acked, router.ack_failed) == (0, 1)
+
+
+def test_unregister_cancels_running_jobs():
+    async def scenario():
+        router = InteractionRouter()
+        started = asyncio.Event()
+
+        async def slow(interaction, argument):
+            started.set()
+            await asyncio.sleep(5)
+
+        router.register("task:review", slow, defer=True)
+        interaction = DeferredInteraction("task:review")
+        await router.dispatch(interaction)
+        await started.wait()
+        router.unregister("task:review")
+        await router.join()
+        assert router.cancelled == 1
+        assert interaction.log == ["ack"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+import asyncio
+
+from bench.fake_discord import FakeUser
+from utils import config, join_queue
+from utils.join_queue import JoinQueue
+
+
+def test_worker_survives_unexpected_errors(world_factory, capsys):
+    async def scenario():
+        world = world_factory()
+        guild = world.guild()
+        role = guild.add_role("Member")
+        queue = JoinQueue(lambda guild: role.id, workers=1, rate=(1000, 1.0))
+        broken = FakeUser(guild, "broken")
+
+        async def add_roles(*roles, reason=None):
+            raise RuntimeError("boom")
+
+        broken.add_roles = add_roles
+        members = [broken] + [FakeUser(guild, f"member-{index}") for index in range(3)]
+        for member in members:
+            queue.submit(member)
+        await asyncio.wait_for(queue.join(), 5)
+        assert queue.failed == 1
+        assert queue.assigned == 3
+        assert all(task.done() is False for task in queue._tasks)
+        queue.stop()
+
+    asyncio.run(scenario())
+    assert "Ignoring exception while onboarding broken" in capsys.readouterr().out
+
+
+def test_completion_times_are_trimmed_without_reading_stats(world_factory, monkeypatch):
+    monkeypatch.setattr(join_queue, "THROUGHPUT_WINDOW", 0.05)
+
+    async def scenario():
+        world = world_factory()
+        guild = world.guild()
+        role = guild.add_role("Member")
+        queue = JoinQueue(lambda guild: role.id, workers=1, rate=(1000, 1.0))
+        for index in range(5):
+            queue.submit(FakeUser(guild, f"early-{index}"))
+        await queue.join()
+        await asyncio.sleep(0.1)
+        queue.submit(FakeUser(guild, "late"))
+        await queue.join()
+        assert len(queue._completed_at) == 1
+        queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_reloading_welcome_does_not_pile_up_config_callbacks(world_factory):
+    async def scenario():
+        before = len(config._loader._callbacks)
+        for _ in range(3):
+            world = world_factory(["cogs.welcome"])
+            assert len(config._loader._callbacks) == before + 1
+            world.close()
+        assert len(config._loader._callbacks) == before
+
+    asyncio.run(scenario())
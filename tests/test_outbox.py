@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import discord
+import pytest
+
+from bench.fake_discord import FakeResponse
+from utils.outbox import Outbox
+
+
+class Channel:
+    def __init__(self, channel_id=1, fail_with=None):
+        self.id = channel_id
+        self.fail_with = fail_with
+        self.sent = []
+
+    async def send(self, **kwargs):
+        if self.fail_with is not None:
+            error, self.fail_with = self.fail_with, None
+            raise error
+        self.sent.append(kwargs)
+        return kwargs
+
+
+def _too_many_requests(retry_after):
+    error = discord.HTTPException(FakeResponse(429, "Too Many Requests"), "You are being rate limited.")
+    error.retry_after = retry_after
+    return error
+
+
+def test_channel_limit_holds_across_sequential_sends():
+    async def scenario():
+        outbox = Outbox(channel_rate=(2, 0.2), global_rate=(1000, 1.0))
+        channel = Channel()
+        started = time.monotonic()
+        for index in range(6):
+            await outbox.send(channel, content=str(index))
+        # 2 sends are free, the other 4 wait 0.1 s each for a token
+        assert time.monotonic() - started >= 0.35
+        assert [message["content"] for message in channel.sent] == [str(index) for index in range(6)]
+
+    asyncio.run(scenario())
+
+
+def test_block_after_429_survives_an_empty_queue():
+    async def scenario():
+        outbox = Outbox(channel_rate=(100, 1.0), global_rate=(1000, 1.0))
+        channel = Channel(fail_with=_too_many_requests(0.3))
+        await outbox.send(channel, content="first")  # Retried after the block
+        started = time.monotonic()
+        await outbox.send(channel, content="second")
+        assert outbox.rate_limited == 1
+        assert len(channel.sent) == 2
+        assert time.monotonic() - started < 0.3  # The block had already been waited out
+
+        blocked = Channel(2)
+        await outbox.send(blocked, content="warm up")
+        outbox._buckets[blocked.id].block(0.3)
+        started = time.monotonic()
+        await outbox.send(blocked, content="after block")
+        assert time.monotonic() - started >= 0.25
+
+    asyncio.run(scenario())
+
+
+def test_idle_buckets_are_dropped():
+    async def scenario():
+        outbox = Outbox(channel_rate=(2, 0.1), global_rate=(1000, 1.0))
+        channels = [Channel(channel_id) for channel_id in range(20)]
+        await asyncio.gather(*(outbox.send(channel, content="hi") for channel in channels))
+        assert outbox.stats()["tracked_channels"] == 20
+        await asyncio.sleep(0.2)
+        assert outbox.stats()["tracked_channels"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_sends_are_counted_and_raised():
+    async def scenario():
+        outbox = Outbox(channel_rate=(100, 1.0), global_rate=(1000, 1.0))
+        channel = Channel(fail_with=RuntimeError("boom"))
+        outbox.enqueue(channel, content="fire and forget")
+        with pytest.raises(RuntimeError):
+            await outbox.send(Channel(2, fail_with=RuntimeError("boom")), content="awaited")
+        await asyncio.sleep(0)
+        assert outbox.failed == 2
+
+    asyncio.run(scenario())
+
+
+def test_embeds_are_coalesced():
+    async def scenario():
+        outbox = Outbox(channel_rate=(1, 0.05), global_rate=(1000, 1.0))
+        channel = Channel()
+        await asyncio.gather(*(outbox.send(channel, embed=discord.Embed(title=str(index))) for index in range(12)))
+        # All 12 are queued before the worker runs: 10 per message at most
+        assert [len(message["embeds"]) for message in channel.sent] == [10, 2]
+        assert outbox.coalesced == 10
+
+    asyncio.run(scenario())
+
+
+def test_latency_is_measured_on_the_outbox_clock():
+    async def scenario():
+        now = [1000.0]
+        outbox = Outbox(channel_rate=(100, 1.0), global_rate=(1000, 1.0), clock=lambda: now[0])
+        channel = Channel()
+        original_send = channel.send
+
+        async def slow_send(**kwargs):
+            now[0] += 2.5
+            return await original_send(**kwargs)
+
+        channel.send = slow_send
+        await outbox.send(channel, content="hi")
+        assert outbox.stats()["latency_p50"] == 2.5
+
+    asyncio.run(scenario())
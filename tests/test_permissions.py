@@ -0,0 +1,18 @@
+import asyncio
+from types import SimpleNamespace
+
+from bench.fake_discord import FakeUser
+from utils.permissions import get_permissions
+
+
+def test_staff_check_refuses_users_outside_a_guild(world_factory):
+    async def scenario():
+        world = world_factory()
+        guild = world.guild()
+        permissions = get_permissions(world.bot)
+        assert permissions.is_staff(guild.staff)
+        assert not permissions.is_staff(FakeUser(guild, "member"))
+        # What ctx.author is in a DM: a discord.User without a guild
+        assert not permissions.is_staff(SimpleNamespace(id=guild.staff.id, name="staff"))
+
+    asyncio.run(scenario())
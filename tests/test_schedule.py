@@ -0,0 +1,159 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.schedule import get_timezone, parse_due, parse_rule
+
+try:
+    from zoneinfo import ZoneInfo
+    BERLIN = ZoneInfo("Europe/Berlin")
+except Exception:  # No zoneinfo module or no tz database
+    BERLIN = None
+
+needs_zoneinfo = pytest.mark.skipif(BERLIN is None, reason="needs the Europe/Berlin zone")
+
+
+def utc(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def berlin(*args) -> float:
+    return datetime(*args, tzinfo=BERLIN).timestamp()
+
+
+@pytest.mark.parametrize("expression, field, expected", [
+    ("*/15 * * * *", "minutes", (0, 15, 30, 45)),
+    ("0 9-17/4 * * *", "hours", (9, 13, 17)),
+    ("0 0 1,15 * *", "days", (1, 15)),
+    ("0 0 * * 1-5", "weekdays", (1, 2, 3, 4, 5)),
+    ("0 0 * * 7", "weekdays", (0,)),
+    ("0 0 * * 0,7", "weekdays", (0,)),
+    ("0 0 * * 5-7", "weekdays", (0, 5, 6)),
+    ("@weekly", "weekdays", (0,)),
+    ("@monthly", "days", (1,)),
+])
+def test_parse_rule_fields(expression, field, expected):
+    assert getattr(parse_rule(expression), field) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "* * * *",
+    "60 * * * *",
+    "0 24 * * *",
+    "0 0 0 * *",
+    "0 0 * 13 *",
+    "0 0 * * 8",
+    "*/0 * * * *",
+    "0 5-1 * * *",
+    "a * * * *",
+])
+def test_parse_rule_rejects(expression):
+    with pytest.raises(ValueError):
+        parse_rule(expression)
+
+
+def test_parse_rule_normalizes_whitespace():
+    assert parse_rule("0  9 *  * 1-5").expression == "0 9 * * 1-5"
+
+
+NOW = utc(2024, 1, 10, 11, 0)  # Wednesday, 12:00 in Berlin (CET, +01:00)
+
+
+@needs_zoneinfo
+@pytest.mark.parametrize("expression, after, expected", [
+    # Weekdays at 09:00: already past today, so Thursday
+    ("0 9 * * 1-5", NOW, berlin(2024, 1, 11, 9, 0)),
+    ("*/15 * * * *", NOW, berlin(2024, 1, 10, 12, 15)),
+    ("@daily", NOW, berlin(2024, 1, 11, 0, 0)),
+    # 7 and 0 both mean Sunday
+    ("30 8 * * 7", NOW, berlin(2024, 1, 14, 8, 30)),
+    ("30 8 * * 0", NOW, berlin(2024, 1, 14, 8, 30)),
+    # Day-of-month and day-of-week both restricted: either one fires (the 13th or a Friday)
+    ("0 12 13 * 5", NOW, berlin(2024, 1, 12, 12, 0)),
+    ("0 12 13 * 5", berlin(2024, 1, 12, 12, 0), berlin(2024, 1, 13, 12, 0)),
+    ("0 12 13 * 5", berlin(2024, 1, 13, 12, 0), berlin(2024, 1, 19, 12, 0)),
+    # Only one restricted: both have to match (any Friday in February)
+    ("0 12 * 2 5", NOW, berlin(2024, 2, 2, 12, 0)),
+    # The next 29 February after 2024's has passed
+    ("0 0 29 2 *", berlin(2024, 3, 1, 0, 0), berlin(2028, 2, 29, 0, 0)),
+    ("0 0 29 2 *", NOW, berlin(2024, 2, 29, 0, 0)),
+    # 02:30 doesn't exist on 2024-03-31 (02:00 CET -> 03:00 CEST); it fires an hour later
+    ("30 2 * * *", berlin(2024, 3, 30, 12, 0), utc(2024, 3, 31, 1, 30)),
+    ("30 2 * * *", utc(2024, 3, 31, 1, 30), berlin(2024, 4, 1, 2, 30)),
+    # 02:30 happens twice on 2024-10-27 (03:00 CEST -> 02:00 CET); it fires once, at the first one
+    ("30 2 * * *", berlin(2024, 10, 27, 0, 0), utc(2024, 10, 27, 0, 30)),
+    ("30 2 * * *", utc(2024, 10, 27, 0, 30), berlin(2024, 10, 28, 2, 30)),
+])
+def test_next_after(expression, after, expected):
+    fire_at = parse_rule(expression).next_after(after, BERLIN)
+    assert fire_at == expected, datetime.fromtimestamp(fire_at, BERLIN)
+
+
+def test_next_after_is_strictly_later():
+    rule = parse_rule("0 * * * *")
+    on_the_hour = utc(2024, 1, 10, 12, 0)
+    assert rule.next_after(on_the_hour, timezone.utc) == utc(2024, 1, 10, 13, 0)
+    assert rule.next_after(on_the_hour - 0.5, timezone.utc) == on_the_hour
+
+
+def test_rule_that_never_fires():
+    with pytest.raises(ValueError):
+        parse_rule("0 0 31 2 *").next_after(NOW, timezone.utc)
+
+
+@needs_zoneinfo
+@pytest.mark.parametrize("text, expected, recurrence", [
+    # HH:MM is the next time the wall clock shows it: later today, otherwise tomorrow
+    ("17:30", berlin(2024, 1, 10, 17, 30), None),
+    ("17:30:15", berlin(2024, 1, 10, 17, 30, 15), None),
+    ("09:00", berlin(2024, 1, 11, 9, 0), None),
+    ("12:00", berlin(2024, 1, 11, 12, 0), None),
+    ("2024-05-01 10:00", berlin(2024, 5, 1, 10, 0), None),
+    ("2024-05-01T10:00:30", berlin(2024, 5, 1, 10, 0, 30), None),
+    # An explicit offset wins over the task's zone
+    ("2024-05-01 10:00+02:00", utc(2024, 5, 1, 8, 0), None),
+    ("2024-05-01 10:00Z", utc(2024, 5, 1, 10, 0), None),
+    ("0 9 * * 1-5", berlin(2024, 1, 11, 9, 0), "0 9 * * 1-5"),
+    ("@Daily", berlin(2024, 1, 11, 0, 0), "@Daily"),
+])
+def test_parse_due(text, expected, recurrence):
+    assert parse_due(text, BERLIN, now=NOW) == (expected, recurrence)
+
+
+@needs_zoneinfo
+def test_parse_due_rolls_over_into_the_dst_change():
+    # 02:30 on 2024-03-31 doesn't exist; asked for the evening before, it lands an hour later
+    assert parse_due("02:30", BERLIN, now=berlin(2024, 3, 30, 22, 0)) == (utc(2024, 3, 31, 1, 30), None)
+
+
+@pytest.mark.parametrize("name, offset_hours", [
+    ("+02:00", 2),
+    ("-0530", -5.5),
+    ("UTC+1", 1),
+    ("gmt-3", -3),
+    ("UTC", 0),
+    ("z", 0),
+])
+def test_offsets(name, offset_hours):
+    tz = get_timezone(name)
+    assert tz.utcoffset(None).total_seconds() == offset_hours * 3600
+    assert parse_due("2024-05-01 10:00", tz, now=NOW)[0] == utc(2024, 5, 1, 10, 0) - offset_hours * 3600
+
+
+def test_parse_due_in_a_fixed_offset_rolls_over_to_tomorrow():
+    tz = get_timezone("+02:00")
+    now = utc(2024, 1, 10, 20, 0)  # 22:00 at +02:00
+    assert parse_due("21:00", tz, now=now) == (utc(2024, 1, 11, 19, 0), None)
+    assert parse_due("23:00", tz, now=now) == (utc(2024, 1, 10, 21, 0), None)
+
+
+@pytest.mark.parametrize("text", ["tomorrow", "25:00", "2024-13-01 10:00", "0 9 * *"])
+def test_parse_due_rejects(text):
+    with pytest.raises(ValueError):
+        parse_due(text, timezone.utc, now=NOW)
+
+
+def test_unknown_zone():
+    assert get_timezone(None) is None
+    with pytest.raises(ValueError):
+        get_timezone("Mars/Olympus_Mons")
@@ -0,0 +1,144 @@
+import asyncio
+import shutil
+
+import pytest
+
+from utils.snapshot import SnapshotLog
+
+
+def _log(path="state.snap", record_version=1, state=None, compact_every=1000):
+    state = state if state is not None else {}
+    log = SnapshotLog(
+        path,
+        record_version,
+        encode=lambda value: value.encode(),
+        decode=lambda key, payload, version: payload.decode(),
+        state=state.items,
+        flush_interval=60.0,
+        flush_every=1000,
+        compact_every=compact_every,
+        thread_name="snapshot-test",
+    )
+    return log, state
+
+
+def _apply(log, state, changes):
+    for key, value in changes.items():
+        if value is None:
+            state.pop(key, None)
+            log.delete(key)
+        else:
+            state[key] = value
+            log.put(key, value)
+
+
+def _write(changes, **kwargs):
+    async def scenario():
+        log, state = _log(**kwargs)
+        state.update(log.load())
+        _apply(log, state, changes)
+        await log.flush()
+        log.close()
+        return state
+
+    return asyncio.run(scenario())
+
+
+def test_changes_survive_a_restart(workdir):
+    _write({1: "one", 2: "two"})
+    _write({2: None, 3: "three"})
+    log, _ = _log()
+    assert log.load() == {1: "one", 3: "three"}
+    assert log.restored["log_entries"] == 4
+
+
+def test_snapshot_folds_in_the_log(workdir):
+    _write({key: str(key) for key in range(5)}, compact_every=3)
+    log, _ = _log()
+    assert log.load() == {key: str(key) for key in range(5)}
+    assert log.restored["records"] == 5
+    assert log.restored["log_entries"] == 0
+
+
+def test_torn_tail_is_cut_off(workdir):
+    _write({1: "one"})
+    _write({2: "two"})
+    with open("state.snap.log", "ab") as file:
+        file.write(b"\x07\x00\x00")  # A crash in the middle of the next entry
+    size = len(open("state.snap.log", "rb").read())
+
+    log, _ = _log()
+    assert log.load() == {1: "one", 2: "two"}
+    assert len(open("state.snap.log", "rb").read()) == size - 3
+
+    # Appending after the cut-off keeps the log readable
+    _write({3: "three"})
+    log, _ = _log()
+    assert log.load() == {1: "one", 2: "two", 3: "three"}
+
+
+def test_corrupt_log_entry_ends_the_replay(workdir):
+    _write({1: "one"})
+    _write({2: "two"})
+    data = bytearray(open("state.snap.log", "rb").read())
+    data[-6] ^= 0xFF  # Inside the last entry's payload
+    open("state.snap.log", "wb").write(bytes(data))
+    log, _ = _log()
+    assert log.load() == {1: "one"}
+
+
+def test_stale_log_from_before_a_snapshot_is_ignored(workdir):
+    _write({1: "one", 2: "two"})
+    shutil.copy("state.snap.log", "old.log")
+    # A snapshot that deleted key 2, then a crash before the log was reset
+    _write({2: None}, compact_every=1)
+    shutil.copy("old.log", "state.snap.log")
+
+    log, _ = _log()
+    assert log.load() == {1: "one"}
+    assert log.restored["log_entries"] == 0
+
+
+def test_corrupt_snapshot_is_refused(workdir):
+    _write({1: "one"}, compact_every=1)
+    data = bytearray(open("state.snap", "rb").read())
+    data[-5] ^= 0xFF
+    open("state.snap", "wb").write(bytes(data))
+    log, _ = _log()
+    with pytest.raises(ValueError):
+        log.load()
+
+
+@pytest.mark.parametrize("length", [0, 5, 24, 27])
+def test_truncated_snapshot_is_refused(workdir, length):
+    _write({1: "one"}, compact_every=1)
+    data = open("state.snap", "rb").read()
+    open("state.snap", "wb").write(data[:length])
+    log, _ = _log()
+    with pytest.raises(ValueError):
+        log.load()
+
+
+def test_refused_snapshot_can_be_moved_aside(workdir):
+    _write({1: "one"})
+    open("state.snap", "wb").write(b"junk")
+    log, state = _log()
+    with pytest.raises(ValueError):
+        log.load()
+    assert log.move_aside() == ["state.snap.corrupt", "state.snap.log.corrupt"]
+    assert not log.exists()
+    state[2] = "two"
+    log.snapshot_now()
+    log.close()
+    assert _log()[0].load() == {2: "two"}
+
+
+def test_new_record_version_rewrites_the_snapshot(workdir):
+    _write({1: "one"})
+    state = _write({2: "two"}, record_version=2)
+    assert state == {1: "one", 2: "two"}
+    with open("state.snap.log", "rb") as file:
+        header = file.read(8)
+    assert int.from_bytes(header[6:8], "little") == 2  # The log was started over under version 2
+    log, _ = _log(record_version=2)
+    assert log.load() == {1: "one", 2: "two"}
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import discord
+from discord.ext import commands
+
+from utils.startup import COMMAND_CACHE_FILE, sync_commands_if_changed
+
+
+def _bot(calls):
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default(), auto_sync_commands=False)
+
+    @bot.slash_command(name="ping", description="Ping")
+    async def ping(ctx):
+        pass
+
+    async def sync_commands():
+        calls.append("sync")
+        for number, command in enumerate(bot.pending_application_commands):
+            command.id = str(1000 + number)
+
+    async def get_global_commands(application_id):
+        calls.append("fetch")
+        return [{"id": "2000", "name": "ping"}, {"id": "2001", "name": "removed"}]
+
+    bot.sync_commands = sync_commands
+    bot.http.get_global_commands = get_global_commands
+    return bot
+
+
+def test_only_the_primary_syncs():
+    async def scenario():
+        calls = []
+        primary = _bot(calls)
+        assert await sync_commands_if_changed(primary, sync=True)
+        assert calls == ["sync"]
+        assert os.path.exists(COMMAND_CACHE_FILE)
+
+        # Another cluster finds the shared cache and makes no API calls
+        other = _bot(calls)
+        assert not await sync_commands_if_changed(other, sync=False)
+        assert calls == ["sync"]
+        assert other._application_commands["1000"].name == "ping"
+
+    asyncio.run(scenario())
+
+
+def test_secondary_reads_ids_from_discord_when_the_cache_is_stale():
+    async def scenario():
+        calls = []
+        bot = _bot(calls)
+        assert not await sync_commands_if_changed(bot, sync=False)
+        assert calls == ["fetch"]
+        assert bot._application_commands["2000"].name == "ping"
+        assert not os.path.exists(COMMAND_CACHE_FILE)
+
+    asyncio.run(scenario())
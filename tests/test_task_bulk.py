@@ -0,0 +1,85 @@
+import asyncio
+
+from bench.fake_discord import FakeTextChannel, FakeUser
+from utils.task_store import TaskStore
+
+
+def _task(channel, assignee, **extra):
+    task = {
+        "title": channel.name,
+        "description": "",
+        "assignee_id": assignee.id,
+        "created_by": assignee.id,
+        "channel_id": channel.id,
+        "guild_id": channel.guild.id,
+        "due_at": None,
+    }
+    task.update(extra)
+    return task
+
+
+def test_bulk_complete_only_touches_own_guild(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.task_management"])
+        try:
+            cog = world.bot.get_cog("TaskManagement")
+            home, other = world.guild("home"), world.guild("other")
+            mine = home._add_channel(FakeTextChannel(home, "mine"))
+            theirs = other._add_channel(FakeTextChannel(other, "theirs"))
+            member = FakeUser(home, "member")
+            await cog.store.add_many([_task(mine, member), _task(theirs, member)])
+
+            ctx = world.context(home)
+            await cog.bulk_complete.callback(cog, ctx, channels=f"<#{mine.id}> <#{theirs.id}>", assignee=None)
+
+            assert (await cog.store.get_by_channel(mine.id))["status"] == "Completed"
+            assert (await cog.store.get_by_channel(theirs.id))["status"] == "Pending"
+            assert other.get_channel(theirs.id) is theirs
+            assert home.get_channel(mine.id) is None
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_bulk_complete_legacy_rows_need_a_channel_in_the_guild(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.task_management"])
+        try:
+            cog = world.bot.get_cog("TaskManagement")
+            home, other = world.guild("home"), world.guild("other")
+            mine = home._add_channel(FakeTextChannel(home, "mine"))
+            theirs = other._add_channel(FakeTextChannel(other, "theirs"))
+            member = FakeUser(home, "member")
+            # Written before tasks carried a guild_id
+            await cog.store.add_many([_task(mine, member, guild_id=None), _task(theirs, member, guild_id=None)])
+
+            ctx = world.context(home)
+            await cog.bulk_complete.callback(cog, ctx, channels=f"{mine.id} {theirs.id}", assignee=None)
+
+            assert (await cog.store.get_by_channel(mine.id))["status"] == "Completed"
+            assert (await cog.store.get_by_channel(theirs.id))["status"] == "Pending"
+            assert other.get_channel(theirs.id) is theirs
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_complete_many_is_scoped_to_a_guild(workdir):
+    async def scenario():
+        store = TaskStore("tasks.db", legacy_json=None)
+        base = {"description": "", "assignee_id": 1, "created_by": 1}
+        await store.add_many([
+            dict(base, title="home", channel_id=1, guild_id=100),
+            dict(base, title="other", channel_id=2, guild_id=200),
+            dict(base, title="legacy", channel_id=3, guild_id=None),
+        ])
+        completed = await store.complete_many([1, 2, 3], guild_id=100)
+        assert [task["title"] for task in completed] == ["home"]
+        completed = await store.complete_many([2, 3], guild_id=100, legacy_channel_ids=[3])
+        assert [task["title"] for task in completed] == ["legacy"]
+        assert (await store.get_by_channel(2))["status"] == "Pending"
+        store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import asyncio
+
+from bench.fake_discord import FakeInteraction, FakeTextChannel, FakeUser
+from cogs.task_management import BUTTON_IDS, LEGACY_BUTTON_IDS
+from utils.interactions import get_router
+
+
+async def _click(world, guild, user, channel, custom_id):
+    router = get_router(world.bot)
+    await router.dispatch(FakeInteraction(guild, user, channel, custom_id))
+    await router.join()
+
+
+async def _add_task(cog, channel, assignee):
+    await cog.store.add({
+        "title": channel.name,
+        "description": "",
+        "assignee_id": assignee.id,
+        "created_by": assignee.id,
+        "channel_id": channel.id,
+        "guild_id": channel.guild.id,
+        "due_at": None,
+    })
+
+
+def test_every_button_id_has_a_handler(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.task_management"])
+        try:
+            handlers = get_router(world.bot)._handlers
+            for key in BUTTON_IDS:
+                assert key in handlers
+            # Old buttons reach the same handler as their namespaced id
+            for legacy_id in LEGACY_BUTTON_IDS:
+                assert handlers[legacy_id] == handlers["task:" + legacy_id.split("_")[0]]
+            assert handlers["delete_task"] == handlers["task:delete"]
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_delete_button_is_staff_only(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.task_management"])
+        try:
+            cog = world.bot.get_cog("TaskManagement")
+            guild = world.guild()
+            channel = guild._add_channel(FakeTextChannel(guild, "task-1"))
+            member = FakeUser(guild, "member")
+            await _add_task(cog, channel, member)
+
+            await _click(world, guild, member, channel, "task:delete")
+            assert (await cog.store.get_by_channel(channel.id))["status"] == "Pending"
+            assert guild.get_channel(channel.id) is channel
+
+            await _click(world, guild, guild.staff, channel, "task:delete")
+            assert (await cog.store.get_by_channel(channel.id))["status"] == "Deleted"
+            assert guild.get_channel(channel.id) is None
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_buttons_outside_a_task_channel_leave_it_alone(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.task_management"])
+        try:
+            cog = world.bot.get_cog("TaskManagement")
+            guild = world.guild()
+            for custom_id in ("task:complete", "complete_task", "task:delete"):
+                await _click(world, guild, guild.staff, guild.lobby, custom_id)
+            assert guild.get_channel(guild.lobby.id) is guild.lobby
+            assert await cog.store.count() == 0
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+from utils.task_store import _MIGRATIONS, TASK_COLUMNS, TaskStore
+
+V1_SCHEMA = _MIGRATIONS[0][1]
+LATEST = _MIGRATIONS[-1][0]
+
+
+def _schema_version(path):
+    with sqlite3.connect(path) as conn:
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0])
+
+
+def _columns(path):
+    with sqlite3.connect(path) as conn:
+        return {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+
+
+def test_new_database_gets_every_migration(workdir):
+    async def scenario():
+        store = TaskStore("tasks.db", legacy_json=None)
+        assert await store.count() == 0
+        store.close()
+
+    asyncio.run(scenario())
+    assert _schema_version("tasks.db") == LATEST
+    assert set(TASK_COLUMNS) <= _columns("tasks.db")
+
+
+def test_version_1_database_is_migrated_and_backfilled(workdir):
+    created_at = time.mktime((2024, 5, 1, 8, 0, 0, 0, 0, -1))
+    with sqlite3.connect("tasks.db") as conn:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        for statement in V1_SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT INTO meta VALUES ('schema_version', '1'), ('legacy_json_imported', '0')")
+        conn.executemany(
+            "INSERT INTO tasks (title, description, assignee_id, created_by, channel_id, due_time, status, created_at) "
+            "VALUES (?, '', 1, 1, ?, ?, ?, ?)",
+            [
+                ("pending", 10, "17:30:00", "Pending", created_at),
+                ("overdue", 11, "09:00:00", "Overdue", created_at),
+                ("no deadline", 12, None, "Pending", created_at),
+            ]
+        )
+
+    async def scenario():
+        store = TaskStore("tasks.db", legacy_json=None)
+        pending = await store.get_by_channel(10)
+        overdue = await store.get_by_channel(11)
+        undated = await store.get_by_channel(12)
+        assert pending["due_at"] == time.mktime((2024, 5, 1, 17, 30, 0, 0, 0, -1))
+        assert pending["notified"] == 0
+        assert overdue["notified"] == 1
+        assert undated["due_at"] is None
+        # Only pending tasks with a deadline wait for an overdue notice
+        assert [entry[0] for entry in await store.pending_deadlines()] == [10]
+        store.close()
+
+    asyncio.run(scenario())
+    assert _schema_version("tasks.db") == LATEST
+
+
+def test_legacy_json_is_imported_once(workdir):
+    with open("tasks.json", "w", encoding="utf-8") as file:
+        json.dump({"tasks": [
+            {"title": "old", "description": "d", "assignee_id": "5", "channel_id": "20", "due": "12:00:00"},
+        ]}, file)
+
+    async def scenario():
+        store = TaskStore("tasks.db", legacy_json="tasks.json")
+        task = await store.get_by_channel(20)
+        assert task["title"] == "old" and task["assignee_id"] == 5 and task["due_time"] == "12:00:00"
+        assert task["due_at"] is not None
+        store.close()
+
+        store = TaskStore("tasks.db", legacy_json="tasks.json")
+        assert await store.count() == 1
+        store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+from bench.fake_discord import FakeInteraction, FakeUser
+
+
+async def _open(cog, guild, member, reason="billing"):
+    return await cog.create_ticket_channel(FakeInteraction(guild, member, guild.lobby, "ticket:open", [reason]), reason)
+
+
+def test_one_open_ticket_per_member_and_reason(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.ticket_system"])
+        try:
+            cog = world.bot.get_cog("TicketSystem")
+            guild = world.guild()
+            member = FakeUser(guild, "member")
+            assert (await _open(cog, guild, member)).startswith("Your ticket has been created")
+            assert "already have an open ticket" in await _open(cog, guild, member)
+            assert (await _open(cog, guild, member, "account_issues")).startswith("Your ticket has been created")
+            assert cog.duplicates == 1
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_deleting_a_ticket_channel_by_hand_closes_the_ticket(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.ticket_system"])
+        try:
+            cog = world.bot.get_cog("TicketSystem")
+            guild = world.guild()
+            member = FakeUser(guild, "member")
+            await _open(cog, guild, member)
+            ticket = cog.tickets.open_ticket(guild.id, member.id, "billing")
+            guild.remove_channel(world.gateway.get_channel(ticket.channel_id))
+            await asyncio.sleep(0.01)  # Let the dispatched listener run
+            assert ticket.channel_id not in cog.tickets
+            assert (await _open(cog, guild, member)).startswith("Your ticket has been created")
+
+            # Thread mode: archived threads are only reported through the raw event
+            thread_ticket = cog.tickets.open_ticket(guild.id, member.id, "billing")
+            world.bot.dispatch("raw_thread_delete", SimpleNamespace(thread_id=thread_ticket.channel_id, guild_id=guild.id))
+            await asyncio.sleep(0.01)
+            assert cog.tickets.open_ticket(guild.id, member.id, "billing") is None
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_members_are_rate_limited(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.ticket_system"])
+        try:
+            cog = world.bot.get_cog("TicketSystem")
+            guild = world.guild()
+            member = FakeUser(guild, "member")
+            limit = cog.user_limiter.rate
+            for index in range(limit):
+                await _open(cog, guild, member, f"reason-{index}")
+            calls = world.http.total
+            assert "too quickly" in await _open(cog, guild, member, "one more")
+            assert world.http.total == calls  # Refused before any API call
+            assert cog.throttled == 1
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
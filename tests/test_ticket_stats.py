@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from bench.fake_discord import FakeInteraction, FakeUser
+from utils.ticket_analytics import TicketAnalytics
+
+
+def test_ticket_stats_only_show_the_invoking_guild(world_factory):
+    async def scenario():
+        world = world_factory(["cogs.ticket_system"])
+        try:
+            cog = world.bot.get_cog("TicketSystem")
+            home, other = world.guild("home"), world.guild("other")
+            for guild, reason in ((home, "billing"), (other, "payment_issues"), (other, "account_issues")):
+                member = FakeUser(guild, "member")
+                await cog.create_ticket_channel(FakeInteraction(guild, member, guild.lobby, "ticket:open", [reason]), reason)
+            ticket = next(iter(cog.tickets))
+            channel = world.gateway.get_channel(ticket.channel_id)
+            await cog.close_ticket(FakeInteraction(channel.guild, channel.guild.staff, channel, "ticket:close"), str(channel.id))
+
+            ctx = world.context(home)
+            await cog.ticket_stats.callback(cog, ctx)
+            embed = ctx.responses[-1].embeds[0]
+            assert [field.name for field in embed.fields if field.name != "Staff"] == ["billing (1 opened)"]
+            assert all(str(other.staff.id) not in field.value for field in embed.fields)
+            assert embed.footer.text == f"{cog.tickets.count(home.id)} open"
+
+            ctx = world.context(other)
+            await cog.ticket_stats.callback(cog, ctx)
+            names = [field.name for field in ctx.responses[-1].embeds[0].fields]
+            assert names == ["account_issues (1 opened)", "payment_issues (1 opened)"]
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_analytics_are_persisted_per_guild():
+    async def scenario():
+        analytics = TicketAnalytics("ticket_stats.json")
+        analytics.opened(1, "billing")
+        analytics.first_response(1, "billing", 42, 90.0)
+        analytics.closed(2, "billing", 42, 600.0)
+        analytics.close()
+
+        analytics = TicketAnalytics("ticket_stats.json")
+        assert analytics.guild(1).reasons["billing"].opened == 1
+        assert analytics.guild(1).staff[42].responded == 1
+        assert analytics.guild(2).staff[42].closed == 1
+        assert 42 not in analytics.guild(3).staff
+        analytics.close()
+
+    asyncio.run(scenario())
+    with open("ticket_stats.json", "r", encoding="utf-8") as file:
+        assert sorted(json.load(file)["guilds"]) == ["1", "2"]
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+
+from bench.fake_discord import FakeTextChannel
+from utils.ticket_store import Ticket, TicketStore, decode_ticket, encode_ticket
+
+
+def _write_baseline_json(entries):
+    # What the bot wrote before tickets carried their guild or opener
+    with open("tickets.json", "w", encoding="utf-8") as file:
+        json.dump({str(channel_id): {"reason": reason, "channel_name": name} for channel_id, reason, name in entries}, file)
+
+
+def test_baseline_tickets_json_is_imported():
+    _write_baseline_json([(101, "billing", "billing-1"), (102, "account_issues", "account_issues-2")])
+
+    async def scenario():
+        store = TicketStore("tickets.snap", json_path="tickets.json")
+        assert len(store) == 2
+        ticket = store.get(101)
+        assert ticket.guild_id is None and ticket.opener_id is None
+        assert ticket.reason == "billing" and ticket.channel_name == "billing-1"
+        store.close()
+
+        # Restored from the snapshot, still without a guild
+        store = TicketStore("tickets.snap", json_path="tickets.json")
+        assert store.get(102) == Ticket(102, None, "account_issues", "account_issues-2")
+        store.close()
+
+    asyncio.run(scenario())
+
+
+def test_unknown_guild_survives_encoding():
+    ticket = Ticket(7, None, "billing", "billing-7")
+    assert decode_ticket(7, encode_ticket(ticket), 1) == ticket
+    assert Ticket.from_dict(7, ticket.to_dict()) == ticket
+
+
+def test_reconcile_fills_in_the_guild(world_factory):
+    async def scenario():
+        world = world_factory()
+        guild = world.guild()
+        channel = guild._add_channel(FakeTextChannel(guild, "billing-1"))
+        _write_baseline_json([(channel.id, "billing", channel.name), (999, "billing", "gone")])
+        world.extensions.append("cogs.ticket_system")
+        world.bot.load_extension("cogs.ticket_system")
+        try:
+            cog = world.bot.get_cog("TicketSystem")
+            await cog.reconcile({channel.id, guild.lobby.id}, {guild.id})
+            assert cog.tickets.get(channel.id).guild_id == guild.id
+            assert cog.tickets.count(guild.id) == 1
+            # A channel that can't be found keeps its ticket until its guild is known
+            assert cog.tickets.get(999).guild_id is None
+        finally:
+            world.close()
+
+    asyncio.run(scenario())
+
+
+def test_unreadable_snapshot_falls_back_to_tickets_json(capsys):
+    _write_baseline_json([(101, "billing", "billing-1")])
+
+    async def scenario():
+        store = TicketStore("tickets.snap", json_path="tickets.json")
+        store.add(Ticket(102, 1, "billing", "billing-2"))
+        store.close()
+        with open("tickets.snap", "r+b") as file:
+            file.truncate(10)
+
+        store = TicketStore("tickets.snap", json_path="tickets.json")
+        assert [ticket.channel_id for ticket in store] == [101]
+        store.close()
+
+    asyncio.run(scenario())
+    assert "Could not restore tickets: tickets.snap is truncated" in capsys.readouterr().out
+    assert os.path.exists("tickets.snap.corrupt")
+    # A fresh snapshot was written in its place
+    store = TicketStore("tickets.snap")
+    assert store.get(101) is not None
+    store.close()
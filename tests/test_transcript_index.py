@@ -0,0 +1,82 @@
+import asyncio
+import os
+from collections import Counter
+
+from utils import transcript_index
+from utils.transcript_index import MERGE_FACTOR, TranscriptDoc, TranscriptIndex, tokenize
+
+
+def _doc(number, guild_id=1, text="billing refund"):
+    return TranscriptDoc(
+        channel_id=number,
+        guild_id=guild_id,
+        closed_at=1_700_000_000.0 + number,
+        terms=Counter(tokenize(f"{text} ticket{number}")),
+        meta={"channel_name": f"billing-{number}"},
+    )
+
+
+def _segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name != "manifest.json")
+
+
+def test_failed_merge_keeps_the_source_segments(workdir, monkeypatch, capsys):
+    def failing_merge(base, segments):
+        with open(f"{base}.post", "wb") as file:
+            file.write(b"half written")
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(transcript_index, "_merge_segments", failing_merge)
+
+    async def scenario():
+        index = TranscriptIndex("index", flush_every=1)
+        for number in range(MERGE_FACTOR):
+            index.add(_doc(number))
+            await index.flush()
+        assert len(index.segments) == MERGE_FACTOR
+        assert index.merges == 0
+        assert not any(name.startswith(f"seg-{MERGE_FACTOR:06d}") for name in _segment_files("index"))
+        assert len(index.search("refund", guild_id=1)) == MERGE_FACTOR
+        index.close()
+
+    asyncio.run(scenario())
+    assert "Failed to merge transcript index segments" in capsys.readouterr().out
+
+    # The manifest still lists the sources, so a restart sees every document
+    index = TranscriptIndex("index")
+    assert len(index) == MERGE_FACTOR
+    index.close()
+
+
+def test_merge_combines_segments(workdir):
+    async def scenario():
+        index = TranscriptIndex("index", flush_every=1)
+        for number in range(MERGE_FACTOR):
+            index.add(_doc(number, guild_id=number % 2))
+            await index.flush()
+        assert index.merges == 1
+        assert len(index.segments) == 1
+        hits = index.search("ticket3", guild_id=1)
+        assert [hit.channel_id for hit in hits] == [3]
+        index.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_with_a_flush_in_flight(workdir):
+    async def scenario():
+        index = TranscriptIndex("index", flush_every=1)
+        index.add(_doc(1))  # Starts a background flush
+        await asyncio.sleep(0)  # Now waiting on the writer thread
+        index.add(_doc(2))
+        index.close()
+        await asyncio.sleep(0.05)  # Give a stray flush the chance to run
+        flush = index._flushing
+        assert flush.cancelled() or flush.exception() is None
+        assert len(index) == 2
+
+    asyncio.run(scenario())
+    index = TranscriptIndex("index")
+    assert len(index) == 2
+    assert {hit.channel_id for hit in index.search("refund")} == {1, 2}
+    index.close()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from utils import voice_pipeline
+from utils.voice_pipeline import BYTES_PER_SECOND, VoicePipeline
+
+
+class FakeVoiceClient:
+    """Mimics py-cord 2.8's recording API: the sink gets write(VoiceData, source),
+    the after callback is called synchronously from another thread and
+    sink.cleanup() is never called."""
+
+    def __init__(self, speech=(), call_after=True):
+        self.channel = "support"
+        self.speech = speech  # (user_id or None for an unknown source, seconds of audio)
+        self.call_after = call_after
+        self._after = None
+        self._recording = False
+
+    def start_recording(self, sink, callback=None):
+        self._after = callback
+        self._recording = True
+
+        def receive():
+            frame = b"\x01\x00" * (BYTES_PER_SECOND // 100)  # 20 ms
+            for user_id, seconds in self.speech:
+                source = SimpleNamespace(id=user_id) if user_id is not None else None
+                for _ in range(int(seconds * 50)):
+                    data = SimpleNamespace(packet=None, source=source, pcm=frame)
+                    sink.write(data, data.source)
+
+        threading.Thread(target=receive).start()
+
+    def is_recording(self):
+        return self._recording
+
+    def stop_recording(self):
+        self._recording = False
+        if self.call_after:
+            threading.Thread(target=self._after, args=(None,)).start()
+
+
+async def _recognize(pcm):
+    return "hello" if pcm else None
+
+
+def test_listen_returns_after_recording_stops():
+    async def scenario():
+        pipeline = VoicePipeline(chunk_seconds=1.0)
+        pipeline.recognize = _recognize
+        heard = []
+
+        async def on_text(user_id, text):
+            heard.append((user_id, text))
+
+        vc = FakeVoiceClient(speech=[(1, 2.5), (None, 1.5), (2, 0.5)])
+        started = time.monotonic()
+        await asyncio.wait_for(pipeline.listen(vc, 0.2, on_text), 5)
+        assert time.monotonic() - started < 2
+        assert not vc.is_recording()
+        # Two full chunks plus the remainder for user 1, the remainder for
+        # user 2, nothing for the unknown source
+        assert sorted(heard) == [(1, "hello")] * 3 + [(2, "hello")]
+
+    asyncio.run(scenario())
+
+
+def test_listen_gives_up_when_recording_never_ends(monkeypatch):
+    monkeypatch.setattr(voice_pipeline, "STOP_GRACE_SECONDS", 0.2)
+
+    async def scenario():
+        pipeline = VoicePipeline()
+        pipeline.recognize = _recognize
+        vc = FakeVoiceClient(call_after=False)
+        await asyncio.wait_for(pipeline.listen(vc, 0.1, lambda *args: None), 5)
+        assert not vc.is_recording()
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+from utils.voice_sessions import VoiceSessionManager
+
+
+class FakeVoiceClient:
+    def __init__(self, channel):
+        self.channel = channel
+        self.recording = True
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def is_recording(self):
+        return self.recording
+
+    def stop_recording(self):
+        self.recording = False
+
+    def is_playing(self):
+        return False
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self):
+        self.connected = False
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild, channel_id):
+        self.id = channel_id
+        self.guild = guild
+
+    async def connect(self):
+        self.guild.voice_client = FakeVoiceClient(self)
+        return self.guild.voice_client
+
+
+def test_hung_session_does_not_stall_the_queue():
+    async def scenario():
+        guild = SimpleNamespace(id=1, voice_client=None)
+        channel = FakeVoiceChannel(guild, 10)
+        first = SimpleNamespace(id=100, guild=guild, bot=False)
+        second = SimpleNamespace(id=200, guild=guild, bot=False)
+        served = []
+
+        async def serve(vc, member):
+            served.append(member.id)
+            if member is first:
+                await asyncio.Event().wait()  # Never finishes, like a recording that never stops
+
+        sessions = VoiceSessionManager(serve, debounce=0.01, idle_timeout=10, serve_timeout=0.1)
+        sessions.update(first, None, channel, {10})
+        sessions.update(second, None, channel, {10})
+        for _ in range(100):
+            if sessions.served:
+                break
+            await asyncio.sleep(0.02)
+
+        assert served == [100, 200]
+        assert sessions.stats()["timed_out"] == 1
+        assert sessions.served == 1
+        # Recording is stopped when a session is cut off
+        assert not guild.voice_client.is_recording()
+        sessions.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import subprocess
+from collections import OrderedDict
+
+import discord
+
+# 20ms of 48kHz 16-bit stereo PCM, the frame size discord.AudioSource.read() must return
+FRAME_SIZE = 3840
+
+
+def decode_to_pcm(path: str, ffmpeg: str = "ffmpeg") -> bytes:
+    """Run FFmpeg once and return the whole file as raw s16le 48kHz stereo PCM."""
+    result = subprocess.run(
+        [ffmpeg, "-loglevel", "error", "-i", path, "-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed to decode {path}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+class PCMBufferSource(discord.AudioSource):
+    """Plays a pre-decoded PCM buffer straight from memory."""
+
+    def __init__(self, pcm: bytes):
+        self.buffer = memoryview(pcm)
+        self.position = 0
+
+    def read(self) -> bytes:
+        frame = self.buffer[self.position:self.position + FRAME_SIZE]
+        self.position += FRAME_SIZE
+        if not frame:
+            return b""
+        if len(frame) < FRAME_SIZE:
+            return bytes(frame) + b"\x00" * (FRAME_SIZE - len(frame))
+        return bytes(frame)
+
+    def is_opus(self) -> bool:
+        return False
+
+
+class AudioCache:
+    """LRU cache of decoded prompt files, bounded by total PCM size.
+
+    Entries are keyed by path and invalidated when the file's mtime or size
+    changes, so replacing a prompt on disk is picked up on the next play.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ffmpeg: str = "ffmpeg"):
+        self.max_bytes = max_bytes
+        self.ffmpeg = ffmpeg
+        self._entries = OrderedDict()  # path -> (stat signature, pcm)
+        self._decoding = {}  # path -> Future, so concurrent callers share one decode
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    async def get(self, path: str) -> bytes:
+        signature = self._signature(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+        if path in self._decoding:
+            return await asyncio.shield(self._decoding[path])
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = self._decoding[path] = loop.run_in_executor(None, decode_to_pcm, path, self.ffmpeg)
+        try:
+            pcm = await future
+        finally:
+            del self._decoding[path]
+        self._store(path, signature, pcm)
+        return pcm
+
+    def _store(self, path, signature, pcm):
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self.size -= len(old[1])
+        if len(pcm) > self.max_bytes:
+            return  # Too large to cache, play it once and forget it
+        self._entries[path] = (signature, pcm)
+        self.size += len(pcm)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    async def preload(self, paths):
+        for path in paths:
+            try:
+                await self.get(path)
+            except (OSError, RuntimeError) as e:
+                print(f"Failed to pre-decode {path}: {e}")
+
+    async def source(self, path: str) -> PCMBufferSource:
+        return PCMBufferSource(await self.get(path))
@@ -0,0 +1,52 @@
+"""Parsing for /task bulk: task lists from CSV or JSON attachments and lists of mentions."""
+import csv
+import io
+import json
+import re
+
+MAX_BULK_TASKS = 500
+COLUMNS = ("title", "description", "assignee", "due", "timezone")
+
+_SNOWFLAKE = re.compile(r"<[@#]!?&?(\d+)>|(\d{15,25})")
+
+
+def parse_ids(text: str):
+    """User or channel ids from mentions (<@1>, <#2>) and bare ids, in order, without duplicates."""
+    ids = []
+    for mention, bare in _SNOWFLAKE.findall(text or ""):
+        value = int(mention or bare)
+        if value not in ids:
+            ids.append(value)
+    return ids
+
+
+def parse_task_rows(data: bytes, filename: str = ""):
+    """Rows of {title, description, assignee, due, timezone} from a CSV or JSON file.
+
+    JSON may be a list of objects or {"tasks": [...]}. Anything that does not
+    start with [ or { is read as CSV with a header row. Raises ValueError when
+    the file can't be read at all; per-row problems are left to the caller.
+    """
+    text = data.decode("utf-8-sig").strip()
+    if filename.lower().endswith(".json") or text[:1] in ("[", "{"):
+        try:
+            parsed = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(parsed, dict):
+            parsed = parsed.get("tasks", [])
+        if not isinstance(parsed, list) or not all(isinstance(row, dict) for row in parsed):
+            raise ValueError("JSON must be a list of task objects")
+        rows = parsed
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "title" not in [name.strip().lower() for name in reader.fieldnames]:
+            raise ValueError(f"CSV needs a header row with {', '.join(COLUMNS)}")
+        rows = [{(key or "").strip().lower(): value for key, value in row.items()} for row in reader]
+
+    if len(rows) > MAX_BULK_TASKS:
+        raise ValueError(f"At most {MAX_BULK_TASKS} tasks per upload, got {len(rows)}")
+    return [
+        {column: str(row[column]).strip() if row.get(column) not in (None, "") else None for column in COLUMNS}
+        for row in rows
+    ]
@@ -0,0 +1,136 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import discord
+
+MAX_CHANNELS_PER_CATEGORY = 50  # Discord's hard limit
+
+
+class _GuildIndex:
+    __slots__ = ("categories", "counts", "pending", "parents")
+
+    def __init__(self):
+        self.categories = {}  # category name -> category id
+        self.counts = {}  # category id -> number of child channels
+        self.pending = {}  # category id -> channels being created right now
+        self.parents = {}  # channel id -> category id
+
+
+class ChannelIndex:
+    """Per-guild index of categories and their sizes.
+
+    Each guild is indexed in one pass the first time it is used and then kept
+    current from channel create/delete/update events, so "which category
+    still has room" is a dict operation instead of a scan over guild.channels.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._guilds = {}
+        self._locks = {}
+        bot.add_listener(self._on_channel_create, "on_guild_channel_create")
+        bot.add_listener(self._on_channel_delete, "on_guild_channel_delete")
+        bot.add_listener(self._on_channel_update, "on_guild_channel_update")
+        bot.add_listener(self._on_guild_remove, "on_guild_remove")
+
+    def _index(self, guild: discord.Guild) -> _GuildIndex:
+        index = self._guilds.get(guild.id)
+        if index is None:
+            index = self._guilds[guild.id] = _GuildIndex()
+            for channel in guild.channels:
+                self._add(index, channel)
+        return index
+
+    @staticmethod
+    def _add(index, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            index.categories.setdefault(channel.name, channel.id)
+            index.counts.setdefault(channel.id, 0)
+            return
+        if channel.category_id is None or channel.id in index.parents:
+            return  # Outside any category, or already recorded by the code that created it
+        index.parents[channel.id] = channel.category_id
+        index.counts[channel.category_id] = index.counts.get(channel.category_id, 0) + 1
+
+    @staticmethod
+    def _remove(index, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            if index.categories.get(channel.name) == channel.id:
+                del index.categories[channel.name]
+            index.counts.pop(channel.id, None)
+            return
+        parent_id = index.parents.pop(channel.id, None)
+        if parent_id is not None and parent_id in index.counts:
+            index.counts[parent_id] -= 1
+
+    # --- gateway events ------------------------------------------------------
+
+    async def _on_channel_create(self, channel):
+        if channel.guild.id in self._guilds:
+            self._add(self._guilds[channel.guild.id], channel)
+
+    async def _on_channel_delete(self, channel):
+        if channel.guild.id in self._guilds:
+            self._remove(self._guilds[channel.guild.id], channel)
+
+    async def _on_channel_update(self, before, after):
+        if after.guild.id in self._guilds:
+            index = self._guilds[after.guild.id]
+            self._remove(index, before)
+            self._add(index, after)
+
+    async def _on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
+
+    # --- lookups -------------------------------------------------------------
+
+    def add(self, channel):
+        """Record a channel we just created without waiting for the gateway event."""
+        self._add(self._index(channel.guild), channel)
+
+    @staticmethod
+    def _family_name(base_name: str, number: int) -> str:
+        return base_name if number == 1 else f"{base_name} {number}"
+
+    @asynccontextmanager
+    async def slot(self, guild: discord.Guild, base_name: str):
+        """Yield a category in the ``base_name`` family ("Tickets", "Tickets 2", ...)
+        with room for one more channel, creating the next one when all are full.
+
+        The slot is held until the block exits so concurrent creations never
+        overfill a category. Call ``add(channel)`` inside the block once the
+        channel exists.
+        """
+        index = self._index(guild)
+        lock = self._locks.setdefault((guild.id, base_name), asyncio.Lock())
+        async with lock:
+            number = 1
+            while True:
+                name = self._family_name(base_name, number)
+                category_id = index.categories.get(name)
+                if category_id is None:
+                    category = await guild.create_category(name)
+                    self._add(index, category)
+                    break
+                used = index.counts.get(category_id, 0) + index.pending.get(category_id, 0)
+                if used < MAX_CHANNELS_PER_CATEGORY:
+                    category = guild.get_channel(category_id)
+                    if category is not None:
+                        break
+                    # Stale entry, the category is gone
+                    del index.categories[name]
+                    continue
+                number += 1
+            index.pending[category.id] = index.pending.get(category.id, 0) + 1
+        try:
+            yield category
+        finally:
+            index.pending[category.id] -= 1
+
+
+def get_channel_index(bot) -> ChannelIndex:
+    """Return the bot-wide channel index, creating it on first use."""
+    index = getattr(bot, "channel_index", None)
+    if index is None:
+        index = bot.channel_index = ChannelIndex(bot)
+    return index
@@ -0,0 +1,144 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet, Optional
+
+CONFIG_PATH = "config.json"
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between mtime checks
+MODES = ("channel", "thread")  # How tickets and tasks are opened
+
+
+def _optional_int(value):
+    return int(value) if value not in (None, "") else None
+
+
+def _mode(data, key):
+    # Checked here, so an unknown value is reported once per load rather than on every use
+    mode = data.get(key, "channel")
+    if mode not in MODES:
+        print(f"Unknown {key} '{mode}' in config.json, expected one of {', '.join(MODES)}; using channels")
+        return "channel"
+    return mode
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    token: str
+    test_token: Optional[str] = None
+    user_role: Optional[int] = None
+    staff_role: Optional[int] = None
+    transcript_channel: Optional[int] = None
+    completion_channel: Optional[int] = None
+    voice_channels: FrozenSet[int] = frozenset()
+    transcript_format: str = "text"
+    metrics_enabled: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: Optional[int] = None
+    voice_enabled: bool = False
+    timezone: Optional[str] = None  # Default zone for task deadlines, server local time if unset
+    ticket_mode: str = "channel"  # "channel" or "thread"
+    ticket_thread_parent: Optional[int] = None
+    task_mode: str = "channel"
+    task_thread_parent: Optional[int] = None
+    ticket_user_limit: int = 3  # Tickets one member may open per ticket_user_period seconds
+    ticket_user_period: float = 600.0
+    ticket_guild_limit: int = 20  # Tickets a whole guild may open per ticket_guild_period seconds
+    ticket_guild_period: float = 60.0
+    raw: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BotConfig":
+        return cls(
+            token=data["token"],
+            test_token=data.get("test_token"),
+            user_role=_optional_int(data.get("user_role")),
+            staff_role=_optional_int(data.get("staff_role")),
+            transcript_channel=_optional_int(data.get("transcript_channel")),
+            completion_channel=_optional_int(data.get("completion_channel")),
+            voice_channels=frozenset(int(channel_id) for channel_id in data.get("voice_channels", [])),
+            transcript_format=data.get("transcript_format", "text"),
+            metrics_enabled=bool(data.get("metrics_enabled", False)),
+            metrics_host=data.get("metrics_host", "127.0.0.1"),
+            metrics_port=_optional_int(data.get("metrics_port")),
+            voice_enabled=bool(data.get("voice_enabled", False)),
+            timezone=data.get("timezone") or None,
+            ticket_mode=_mode(data, "ticket_mode"),
+            ticket_thread_parent=_optional_int(data.get("ticket_thread_parent")),
+            task_mode=_mode(data, "task_mode"),
+            task_thread_parent=_optional_int(data.get("task_thread_parent")),
+            ticket_user_limit=int(data.get("ticket_user_limit", 3)),
+            ticket_user_period=float(data.get("ticket_user_period", 600.0)),
+            ticket_guild_limit=int(data.get("ticket_guild_limit", 20)),
+            ticket_guild_period=float(data.get("ticket_guild_period", 60.0)),
+            raw=data,
+        )
+
+    def get(self, key, default=None):
+        """Access to keys that have no typed field yet."""
+        return self.raw.get(key, default)
+
+
+class ConfigLoader:
+    """Parses config.json once and re-parses it only when the file changes."""
+
+    def __init__(self, path=CONFIG_PATH, check_interval=RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._config = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._callbacks = []
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        self._config = BotConfig.from_dict(data)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self) -> BotConfig:
+        if self._config is None:
+            self._load()
+            self._checked_at = time.monotonic()
+            return self._config
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                changed = os.stat(self.path).st_mtime_ns != self._mtime
+                if changed:
+                    self._load()
+            except (OSError, ValueError, KeyError) as e:
+                # Keep serving the last good config if the file is mid-edit
+                print(f"Failed to reload {self.path}: {e}")
+                changed = False
+            if changed:
+                print(f"Reloaded {self.path}")
+                for callback in self._callbacks:
+                    callback(self._config)
+        return self._config
+
+    def on_reload(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_reload(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+
+_loader = ConfigLoader()
+
+
+def get_config() -> BotConfig:
+    return _loader.get()
+
+
+def on_config_reload(callback):
+    """Register ``callback(config)`` to run whenever config.json changes on disk."""
+    _loader.on_reload(callback)
+
+
+def remove_config_reload(callback):
+    """Unregister a callback added with on_config_reload, e.g. when its cog unloads."""
+    _loader.remove_reload(callback)
@@ -0,0 +1,102 @@
+import asyncio
+import heapq
+import time
+
+
+class DeadlineScheduler:
+    """Min-heap of deadlines that sleeps until the earliest one is due.
+
+    Keys are arbitrary hashables (task channel ids for TaskManagement). Each
+    scheduled key fires ``callback(key)`` exactly once unless it is cancelled
+    or rescheduled first. Cancelled entries are dropped lazily when they reach
+    the top of the heap.
+    """
+
+    def __init__(self, callback, clock=time.time):
+        self.callback = callback
+        self.clock = clock
+        self._heap = []
+        self._entries = {}  # key -> due timestamp currently in effect
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, due_at: float):
+        """Add or move a deadline. O(log n)."""
+        self._entries[key] = due_at
+        heapq.heappush(self._heap, (due_at, key))
+        if self._heap[0][1] == key:
+            self._wakeup.set()
+        self._maybe_compact()
+
+    def schedule_many(self, items):
+        """Bulk load (key, due_at) pairs in O(n) with a single heapify."""
+        for key, due_at in items:
+            self._entries[key] = due_at
+            self._heap.append((due_at, key))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def cancel(self, key):
+        self._entries.pop(key, None)
+
+    def next_due(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._entries.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def _maybe_compact(self):
+        # Rescheduling and cancelling leave dead entries behind
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(due_at, key) for key, due_at in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due_at, key = heapq.heappop(heap)
+            if self._entries.get(key) == due_at:
+                del self._entries[key]
+                due.append(key)
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            next_due = self.next_due()
+            if next_due is None:
+                await self._wakeup.wait()
+                continue
+
+            delay = next_due - self.clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue  # Something earlier was scheduled, recompute
+                except asyncio.TimeoutError:
+                    pass
+
+            for key in self._pop_due(self.clock()):
+                try:
+                    await self.callback(key)
+                except Exception as e:
+                    print(f"Deadline callback failed for {key}: {e}")
@@ -0,0 +1,193 @@
+import asyncio
+import time
+import traceback
+
+import discord
+
+JOB_TIMEOUT = 600.0  # Interaction tokens stay valid for 15 minutes
+RETRY_BACKOFF = 0.5  # Seconds before the first retry, doubled for each further one
+# Failures worth running a deferred handler again for
+TRANSIENT_ERRORS = (discord.DiscordServerError, asyncio.TimeoutError, ConnectionError)
+FAILURE_MESSAGE = "Something went wrong while handling that, please try again."
+
+
+class InteractionRouter:
+    """Single on_interaction listener that dispatches component clicks by custom_id.
+
+    Custom ids are structured as ``<namespace>:<action>[:<argument>]``, for
+    example ``ticket:close:1280120621036212285``. The handler registered for
+    ``ticket:close`` is looked up in a dict and called as
+    ``handler(interaction, argument)``. Older flat ids such as ``review_task``
+    can be registered verbatim and are called with ``argument=None``.
+
+    Because nothing here depends on the View object that sent the component,
+    buttons keep working across restarts without re-posting anything.
+
+    Handlers registered with ``defer=True`` are acknowledged before they run,
+    so slow work never hits Discord's 3 second limit. They then run as a
+    tracked background job with a deadline and optional retries. Whatever
+    they return (a string, or a dict of send() arguments) is sent as an
+    ephemeral followup.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._deferred = {}  # key -> (retries, timeout)
+        self._jobs = {}  # asyncio.Task -> key
+        self.metrics = None  # Set by enable_metrics
+        self.acked = 0
+        self.ack_failed = 0
+        self.jobs_ok = 0
+        self.jobs_failed = 0
+        self.retries = 0
+        self.cancelled = 0
+
+    @staticmethod
+    def parse(custom_id: str):
+        parts = custom_id.split(":", 2)
+        if len(parts) < 2:
+            return custom_id, None
+        return f"{parts[0]}:{parts[1]}", parts[2] if len(parts) == 3 else None
+
+    def register(self, key: str, handler, *, defer=False, retries=0, timeout=JOB_TIMEOUT):
+        """Route ``key`` to ``handler``. Handlers that open a modal must not
+        use defer, because a modal has to be the first response."""
+        if key in self._handlers:
+            raise ValueError(f"Interaction handler for '{key}' is already registered")
+        self._handlers[key] = handler
+        if defer:
+            self._deferred[key] = (retries, timeout)
+
+    def unregister(self, *keys: str):
+        """Remove handlers and cancel their jobs that are still running."""
+        for key in keys:
+            self._handlers.pop(key, None)
+            self._deferred.pop(key, None)
+        self.cancel(*keys)
+
+    def cancel(self, *keys: str) -> int:
+        cancelled = 0
+        for task, key in list(self._jobs.items()):
+            if key in keys and not task.done():
+                task.cancel()
+                cancelled += 1
+        return cancelled
+
+    async def join(self):
+        """Wait for every running job, e.g. before shutting down."""
+        while self._jobs:
+            await asyncio.gather(*list(self._jobs), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "jobs_in_flight": len(self._jobs),
+            "acked": self.acked,
+            "ack_failed": self.ack_failed,
+            "jobs_ok": self.jobs_ok,
+            "jobs_failed": self.jobs_failed,
+            "retries": self.retries,
+            "cancelled": self.cancelled,
+        }
+
+    def _observe(self, name: str, value: float, **labels):
+        if self.metrics is not None:
+            self.metrics.observe(name, value, **labels)
+
+    async def dispatch(self, interaction: discord.Interaction):
+        if interaction.type is not discord.InteractionType.component:
+            return
+        custom_id = interaction.custom_id
+        if not custom_id:
+            return
+        key, argument = self.parse(custom_id)
+        handler = self._handlers.get(key)
+        if handler is None:
+            return
+        options = self._deferred.get(key)
+        if options is None:
+            await handler(interaction, argument)
+            return
+
+        try:
+            await interaction.response.defer()
+        except discord.HTTPException as e:
+            # Usually NotFound: the interaction was already too old to acknowledge
+            self.ack_failed += 1
+            print(f"Could not acknowledge interaction {custom_id}: {e}")
+            return
+        self.acked += 1
+        # Measured from Discord's creation time, so gateway delay is included
+        created_at = discord.utils.snowflake_time(interaction.id).timestamp()
+        self._observe("bot_interaction_ack_seconds", max(time.time() - created_at, 0.0), handler=key)
+
+        task = asyncio.get_running_loop().create_task(
+            self._run_job(key, handler, interaction, argument, *options),
+            name=f"interaction:{key}"
+        )
+        self._jobs[task] = key
+        task.add_done_callback(self._jobs.pop)
+
+    async def _run_job(self, key, handler, interaction, argument, retries, timeout):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + timeout
+        attempt = 0
+        outcome = "failed"
+        try:
+            while True:
+                try:
+                    result = await asyncio.wait_for(handler(interaction, argument), deadline - loop.time())
+                except TRANSIENT_ERRORS as e:
+                    if attempt >= retries or loop.time() >= deadline:
+                        print(f"Interaction job {key} gave up after {attempt + 1} attempt(s): {e!r}")
+                        break
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+                    continue
+                except Exception:
+                    print(f"Ignoring exception in interaction job {key}:")
+                    traceback.print_exc()
+                    break
+                outcome = "ok"
+                if result:
+                    kwargs = {"content": result} if isinstance(result, str) else dict(result)
+                    kwargs.setdefault("ephemeral", True)
+                    try:
+                        await interaction.followup.send(**kwargs)
+                    except discord.HTTPException as e:
+                        print(f"Could not send the result of interaction job {key}: {e}")
+                break
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            self.cancelled += 1
+            raise
+        finally:
+            self._observe("bot_interaction_job_seconds", loop.time() - started, handler=key, outcome=outcome)
+            if outcome == "ok":
+                self.jobs_ok += 1
+            elif outcome == "failed":
+                self.jobs_failed += 1
+                try:
+                    await interaction.followup.send(FAILURE_MESSAGE, ephemeral=True)
+                except discord.HTTPException:
+                    pass
+
+
+def get_router(bot) -> InteractionRouter:
+    """Return the bot-wide interaction router, creating and hooking it up on first use."""
+    router = getattr(bot, "interaction_router", None)
+    if router is None:
+        router = bot.interaction_router = InteractionRouter()
+        router.metrics = getattr(bot, "metrics", None)
+        bot.add_listener(router.dispatch, "on_interaction")
+    return router
+
+
+def persistent_view(*items) -> discord.ui.View:
+    """A View that never times out. Its items carry routed custom_ids, so the
+    callbacks live in the InteractionRouter rather than on the view."""
+    view = discord.ui.View(timeout=None)
+    for item in items:
+        view.add_item(item)
+    return view
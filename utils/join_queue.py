@@ -0,0 +1,160 @@
+import asyncio
+import time
+import traceback
+from collections import deque
+
+import discord
+
+from utils.ratelimit import TokenBucket
+
+MAX_RETRIES = 5
+BASE_BACKOFF = 1.0  # Seconds, doubled on every retry
+THROUGHPUT_WINDOW = 60.0
+
+
+class JoinQueue:
+    """Applies the onboarding role to new members through a small worker pool.
+
+    Joins are de-duplicated by (guild id, member id) while they are pending,
+    the role is looked up once per guild, and role edits are throttled by a
+    shared token bucket with exponential backoff on 429s and 5xx errors.
+    """
+
+    def __init__(self, role_id_for_guild, workers=4, rate=(10, 1.0)):
+        self.role_id_for_guild = role_id_for_guild
+        self.workers = workers
+        self.bucket = TokenBucket(*rate)
+        self._queue = None
+        self._tasks = []
+        self._pending = set()
+        self._roles = {}  # guild_id -> discord.Role
+        self._completed_at = deque()
+        self.enqueued = 0
+        self.duplicates = 0
+        self.assigned = 0
+        self.skipped = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.ensure_future(self._worker()))
+
+    def submit(self, member: discord.Member) -> bool:
+        """Queue a member for onboarding. Returns False if they are already queued."""
+        key = (member.guild.id, member.id)
+        if key in self._pending:
+            self.duplicates += 1
+            return False
+        self._ensure_started()
+        self._pending.add(key)
+        self.enqueued += 1
+        self._queue.put_nowait(member)
+        return True
+
+    def role_for(self, guild: discord.Guild):
+        role = self._roles.get(guild.id)
+        if role is None:
+            role_id = self.role_id_for_guild(guild)
+            role = guild.get_role(role_id) if role_id else None
+            if role is not None:
+                self._roles[guild.id] = role
+        return role
+
+    def invalidate(self, guild_id: int = None):
+        if guild_id is None:
+            self._roles.clear()
+        else:
+            self._roles.pop(guild_id, None)
+
+    async def _throttle(self):
+        while True:
+            delay = self.bucket.try_acquire()
+            if delay == 0.0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            member = await self._queue.get()
+            try:
+                await self._onboard(member)
+            except Exception:
+                # One bad member must not take the worker down with it
+                self.failed += 1
+                print(f"Ignoring exception while onboarding {member}:")
+                traceback.print_exc()
+            finally:
+                self._pending.discard((member.guild.id, member.id))
+                self._queue.task_done()
+
+    async def _onboard(self, member: discord.Member):
+        role = self.role_for(member.guild)
+        if role is None:
+            print(f"Onboarding role not found in {member.guild}")
+            self.failed += 1
+            return
+        if member.get_role(role.id) is not None:
+            self.skipped += 1
+            return
+
+        for attempt in range(MAX_RETRIES + 1):
+            await self._throttle()
+            try:
+                await member.add_roles(role, reason="New member onboarding")
+            except discord.NotFound:
+                self.skipped += 1  # Member left before we got to them
+                return
+            except discord.HTTPException as e:
+                retryable = e.status == 429 or e.status >= 500
+                if retryable and attempt < MAX_RETRIES:
+                    self.retries += 1
+                    retry_after = getattr(e, "retry_after", None) or BASE_BACKOFF * 2 ** attempt
+                    self.bucket.block(retry_after)
+                    continue
+                print(f"Failed to assign role to {member}: {e}")
+                self.failed += 1
+                return
+            self.assigned += 1
+            now = time.monotonic()
+            self._completed_at.append(now)
+            self._trim(now)
+            return
+
+    def backlog(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _trim(self, now):
+        cutoff = now - THROUGHPUT_WINDOW
+        while self._completed_at and self._completed_at[0] < cutoff:
+            self._completed_at.popleft()
+
+    def throughput(self) -> float:
+        """Roles assigned per second over the last minute."""
+        self._trim(time.monotonic())
+        return len(self._completed_at) / THROUGHPUT_WINDOW
+
+    def stats(self) -> dict:
+        return {
+            "backlog": self.backlog(),
+            "enqueued": self.enqueued,
+            "duplicates": self.duplicates,
+            "assigned": self.assigned,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throughput_per_sec": self.throughput(),
+        }
+
+    async def join(self):
+        """Wait until everything queued so far has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from collections import deque
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag: how late a periodic sleep wakes up compared to
+    when it asked to. Anything blocking the loop shows up here directly."""
+
+    def __init__(self, interval: float = 0.1, samples: int = 1024):
+        self.interval = interval
+        self.samples = deque(maxlen=samples)
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    @property
+    def last(self) -> float:
+        return self.samples[-1] if self.samples else 0.0
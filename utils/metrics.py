@@ -0,0 +1,304 @@
+import asyncio
+import bisect
+import sys
+import time
+import traceback
+
+from utils.loop_monitor import LoopLagMonitor
+
+# Upper bounds in seconds, Prometheus style
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.buckets[-1]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """Tiny in-process metrics registry with Prometheus text exposition."""
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> float
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.collectors = []  # callables returning [(name, labels, value)] gauges
+        self.help = {}
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def gauges(self):
+        values = []
+        for collector in self.collectors:
+            try:
+                values.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return values
+
+    def render(self) -> str:
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            header(name, "histogram")
+            running = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                running += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', le),))} {running}")
+            lines.append(f"{name}_sum{_label_text(labels)} {histogram.total}")
+            lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+        for name, labels, value in self.gauges():
+            header(name, "gauge")
+            lines.append(f"{name}{_label_text(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _InstrumentedHandler:
+    """Wraps an async callable to record invocations, duration and exceptions.
+
+    Compares equal to the wrapped function so Bot.remove_listener (called on
+    cog unload) still finds and removes it.
+    """
+
+    def __init__(self, metrics: Metrics, kind: str, name: str, func):
+        self.metrics = metrics
+        self.kind = kind
+        self.name = name
+        self.func = func
+        self.__name__ = getattr(func, "__name__", name)
+        self.__qualname__ = getattr(func, "__qualname__", name)
+
+    async def __call__(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self.func(*args, **kwargs)
+        except Exception as e:
+            self.metrics.inc("bot_handler_exceptions_total", kind=self.kind, handler=self.name, exception=type(e).__name__)
+            raise
+        finally:
+            self.metrics.inc("bot_handler_invocations_total", kind=self.kind, handler=self.name)
+            self.metrics.observe("bot_handler_duration_seconds", time.perf_counter() - started, kind=self.kind, handler=self.name)
+
+    def __eq__(self, other):
+        if isinstance(other, _InstrumentedHandler):
+            return self.func == other.func
+        return self.func == other
+
+    def __hash__(self):
+        return hash(self.func)
+
+
+def event_handlers(bot) -> dict:
+    """The bot's {"on_event": [listener, ...]} registry. py-cord renamed
+    extra_events to _event_handlers in 2.5."""
+    handlers = getattr(bot, "_event_handlers", None)
+    return handlers if handlers is not None else bot.extra_events
+
+
+def instrument_listeners(bot, metrics: Metrics):
+    """Wrap every listener currently registered on the bot. Safe to call again
+    after loading more extensions; already wrapped listeners are skipped."""
+    for event, listeners in event_handlers(bot).items():
+        for index, listener in enumerate(listeners):
+            if not isinstance(listener, _InstrumentedHandler):
+                name = f"{event}:{getattr(listener, '__qualname__', repr(listener))}"
+                listeners[index] = _InstrumentedHandler(metrics, "listener", name, listener)
+
+    router = getattr(bot, "interaction_router", None)
+    if router is not None:
+        for key, handler in router._handlers.items():
+            if not isinstance(handler, _InstrumentedHandler):
+                router._handlers[key] = _InstrumentedHandler(metrics, "component", key, handler)
+
+
+def instrument_commands(bot, metrics: Metrics):
+    """Time prefix and application commands through the bot's command events."""
+
+    def command_name(ctx):
+        command = getattr(ctx, "command", None)
+        return getattr(command, "qualified_name", None) or "unknown"
+
+    async def on_start(ctx):
+        ctx.metrics_started = time.perf_counter()
+
+    async def on_completion(ctx):
+        started = getattr(ctx, "metrics_started", None)
+        name = command_name(ctx)
+        metrics.inc("bot_handler_invocations_total", kind="command", handler=name)
+        if started is not None:
+            metrics.observe("bot_handler_duration_seconds", time.perf_counter() - started, kind="command", handler=name)
+
+    async def on_error(ctx, error):
+        metrics.inc("bot_handler_exceptions_total", kind="command", handler=command_name(ctx), exception=type(error).__name__)
+        await on_completion(ctx)
+        # Registering an error listener silences the library's default
+        # traceback printing, so keep doing that here
+        print(f"Ignoring exception in command {command_name(ctx)}:", file=sys.stderr)
+        traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+    bot.add_listener(on_start, "on_command")
+    bot.add_listener(on_completion, "on_command_completion")
+    bot.add_listener(on_error, "on_command_error")
+    bot.add_listener(on_start, "on_application_command")
+    bot.add_listener(on_completion, "on_application_command_completion")
+    bot.add_listener(on_error, "on_application_command_error")
+
+
+def instrument_http(bot, metrics: Metrics):
+    """Count every REST call the bot makes, by route template and outcome."""
+    http = bot.http
+    original = http.request
+
+    async def request(route, *args, **kwargs):
+        name = f"{route.method} {route.path}"
+        try:
+            response = await original(route, *args, **kwargs)
+        except Exception as e:
+            metrics.inc("bot_api_calls_total", route=name, status=str(getattr(e, "status", "error")))
+            raise
+        metrics.inc("bot_api_calls_total", route=name, status="ok")
+        return response
+
+    http.request = request
+
+
+async def _serve(metrics: Metrics, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain headers, we only route on the request line
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", metrics.render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def enable_metrics(bot, host: str = "127.0.0.1", port: int = None) -> Metrics:
+    """Instrument the bot and, if a port is given, serve /metrics over HTTP.
+
+    Nothing is wrapped unless this is called, so a disabled bot pays nothing.
+    """
+    metrics = bot.metrics = Metrics()
+    metrics.describe("bot_handler_invocations_total", "Listener, component and command invocations")
+    metrics.describe("bot_handler_duration_seconds", "Handler wall time")
+    metrics.describe("bot_handler_exceptions_total", "Handler exceptions by type")
+    metrics.describe("bot_api_calls_total", "Discord REST calls by route and outcome")
+    metrics.describe("bot_event_loop_lag_seconds", "How late a 100ms timer fired")
+    metrics.describe("bot_interaction_ack_seconds", "Time from an interaction's creation until it was deferred")
+    metrics.describe("bot_interaction_job_seconds", "Deferred interaction handlers by outcome")
+
+    instrument_listeners(bot, metrics)
+    instrument_commands(bot, metrics)
+    instrument_http(bot, metrics)
+    router = getattr(bot, "interaction_router", None)
+    if router is not None:
+        router.metrics = metrics
+
+    lag = bot.loop_lag = LoopLagMonitor(interval=0.1)
+    lag.start()
+    metrics.add_collector(lambda: [
+        ("bot_event_loop_lag_seconds", {"quantile": "0.5"}, lag.percentile(0.5)),
+        ("bot_event_loop_lag_seconds", {"quantile": "0.99"}, lag.percentile(0.99)),
+        ("bot_event_loop_lag_max_seconds", {}, lag.max_lag),
+    ])
+
+    def outbox_gauges():
+        outbox = getattr(bot, "outbox", None)
+        if outbox is None:
+            return []
+        return [(f"bot_outbox_{key}", {}, value) for key, value in outbox.stats().items()]
+
+    metrics.add_collector(outbox_gauges)
+
+    def interaction_gauges():
+        router = getattr(bot, "interaction_router", None)
+        if router is None:
+            return []
+        return [(f"bot_interactions_{key}", {}, value) for key, value in router.stats().items()]
+
+    metrics.add_collector(interaction_gauges)
+
+    def cog_gauges():
+        # Cogs can expose numbers by defining collect_metrics() -> dict
+        values = []
+        for cog_name, cog in bot.cogs.items():
+            collect = getattr(cog, "collect_metrics", None)
+            if collect is not None:
+                values.extend((f"bot_{key}", {"cog": cog_name}, value) for key, value in collect().items())
+        return values
+
+    metrics.add_collector(cog_gauges)
+
+    if port:
+        bot.metrics_server = await asyncio.start_server(lambda r, w: _serve(metrics, r, w), host, port)
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+    return metrics
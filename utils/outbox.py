@@ -0,0 +1,214 @@
+import asyncio
+import time
+from collections import deque
+
+from utils.ratelimit import TokenBucket
+
+# Discord allows roughly 5 messages per 5 seconds per channel and 50 requests
+# per second globally. Staying under these keeps us out of 429 territory.
+CHANNEL_RATE = (5, 5.0)
+GLOBAL_RATE = (50, 1.0)
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_RETRIES = 3
+
+
+class _Outgoing:
+    __slots__ = ("channel", "kwargs", "future", "queued_at")
+
+    def __init__(self, channel, kwargs, future, queued_at):
+        self.channel = channel
+        self.kwargs = kwargs
+        self.future = future
+        self.queued_at = queued_at
+
+    @property
+    def embeds(self):
+        if "embed" in self.kwargs:
+            return [self.kwargs["embed"]]
+        return list(self.kwargs.get("embeds") or [])
+
+    @property
+    def embeds_only(self):
+        """Plain embed messages can be merged with their neighbours."""
+        return bool(self.embeds) and set(self.kwargs) <= {"embed", "embeds"}
+
+
+def _consume_exception(future):
+    # Most callers never await what enqueue() returns; failures are logged and counted in _deliver
+    if not future.cancelled():
+        future.exception()
+
+
+class _ChannelQueue:
+    __slots__ = ("items", "bucket", "worker")
+
+    def __init__(self, bucket):
+        self.items = deque()
+        self.bucket = bucket
+        self.worker = None
+
+
+class Outbox:
+    """Shared outbound message queue.
+
+    Messages are queued per channel and sent by one worker per channel that
+    respects the per-channel and global rate limits. Consecutive embed-only
+    messages for the same channel are coalesced into a single message with up
+    to 10 embeds. Anything with an ``async send(**kwargs)`` method works as a
+    channel, which keeps this testable against a fake client.
+
+    A channel's bucket outlives its queue, so the limit holds across bursts.
+    It is only dropped once it has refilled and any 429 block has expired.
+    """
+
+    def __init__(self, channel_rate=CHANNEL_RATE, global_rate=GLOBAL_RATE, clock=time.monotonic):
+        self.channel_rate = channel_rate
+        self.clock = clock
+        self.global_bucket = TokenBucket(*global_rate, clock=clock)
+        self._queues = {}
+        self._buckets = {}  # channel_id -> TokenBucket, kept while it still limits anything
+        self._evictions = {}  # channel_id -> TimerHandle for buckets that may be dropped soon
+        self._latencies = deque(maxlen=1024)
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def enqueue(self, channel, **kwargs) -> asyncio.Future:
+        """Queue a message and return a future resolving to the sent message."""
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            bucket = self._buckets.get(channel.id)
+            if bucket is None:
+                bucket = self._buckets[channel.id] = TokenBucket(*self.channel_rate, clock=self.clock)
+            queue = self._queues[channel.id] = _ChannelQueue(bucket)
+        queue.items.append(_Outgoing(channel, kwargs, future, self.clock()))
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.ensure_future(self._drain(channel.id, queue))
+        return future
+
+    async def send(self, channel, **kwargs):
+        """Queue a message and wait until it has been delivered."""
+        return await self.enqueue(channel, **kwargs)
+
+    async def _wait_for(self, bucket):
+        while True:
+            delay = max(bucket.try_acquire(), 0.0)
+            if delay == 0.0:
+                delay = self.global_bucket.try_acquire()
+                if delay == 0.0:
+                    return
+                bucket.tokens += 1  # Give the channel token back while we wait on the global one
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _take_batch(items):
+        first = items.popleft()
+        batch = [first]
+        if not first.embeds_only:
+            return batch
+        embeds = len(first.embeds)
+        chars = sum(len(embed) for embed in first.embeds)
+        while items and items[0].embeds_only:
+            extra = items[0].embeds
+            extra_chars = sum(len(embed) for embed in extra)
+            if embeds + len(extra) > MAX_EMBEDS_PER_MESSAGE or chars + extra_chars > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(items.popleft())
+            embeds += len(extra)
+            chars += extra_chars
+        return batch
+
+    async def _drain(self, channel_id, queue):
+        try:
+            while queue.items:
+                await self._wait_for(queue.bucket)
+                batch = self._take_batch(queue.items)
+                if len(batch) == 1:
+                    kwargs = batch[0].kwargs
+                else:
+                    kwargs = {"embeds": [embed for item in batch for embed in item.embeds]}
+                    self.coalesced += len(batch) - 1
+                await self._deliver(batch, kwargs, queue.bucket)
+        finally:
+            if not queue.items:
+                self._queues.pop(channel_id, None)
+                self._schedule_eviction(channel_id)
+
+    def _schedule_eviction(self, channel_id):
+        if channel_id not in self._evictions:
+            delay = self._buckets[channel_id].until_idle()
+            self._evictions[channel_id] = asyncio.get_running_loop().call_later(delay, self._evict, channel_id)
+
+    def _evict(self, channel_id):
+        del self._evictions[channel_id]
+        if channel_id in self._queues:
+            return  # Busy again; the next drain schedules another check
+        if self._buckets[channel_id].until_idle() > 0:
+            self._schedule_eviction(channel_id)  # Blocked by a 429 meanwhile
+        else:
+            del self._buckets[channel_id]
+
+    async def _deliver(self, batch, kwargs, bucket):
+        channel = batch[0].channel
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                message = await channel.send(**kwargs)
+            except Exception as e:
+                if getattr(e, "status", None) == 429 and attempt < MAX_RETRIES:
+                    self.rate_limited += 1
+                    retry_after = getattr(e, "retry_after", None) or 2 ** attempt
+                    bucket.block(retry_after)
+                    await self._wait_for(bucket)
+                    continue
+                self.failed += len(batch)
+                print(f"Failed to send a message to {channel}: {e}")
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                return
+
+            now = self.clock()
+            self.sent_messages += 1
+            self.sent_embeds += len(kwargs.get("embeds") or ([kwargs["embed"]] if "embed" in kwargs else []))
+            for item in batch:
+                self._latencies.append(now - item.queued_at)
+                if not item.future.done():
+                    item.future.set_result(message)
+            return
+
+    def queue_depth(self) -> int:
+        return sum(len(queue.items) for queue in self._queues.values())
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "queue_depth": self.queue_depth(),
+            "busy_channels": len(self._queues),
+            "tracked_channels": len(self._buckets),
+            "sent_messages": self.sent_messages,
+            "sent_embeds": self.sent_embeds,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "latency_p50": percentile(0.50),
+            "latency_p99": percentile(0.99),
+        }
+
+
+def get_outbox(bot) -> Outbox:
+    """Return the bot-wide outbox, creating it on first use."""
+    outbox = getattr(bot, "outbox", None)
+    if outbox is None:
+        outbox = bot.outbox = Outbox()
+    return outbox
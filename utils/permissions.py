@@ -0,0 +1,68 @@
+import discord
+
+from utils.config import get_config, on_config_reload
+
+STAFF_ROLE_NAMES = frozenset({"Staff"})
+
+
+class PermissionResolver:
+    """Caches, per guild, the set of role ids that grant staff access.
+
+    A member is staff if they own the guild or hold any role in that set: the
+    configured staff_role, roles named "Staff", and roles with administrator.
+    The set is rebuilt lazily after role or config changes, so each check is
+    a handful of lookups instead of a walk over the member's roles.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._staff_roles = {}  # guild_id -> frozenset of role ids
+        bot.add_listener(self._on_role_change, "on_guild_role_create")
+        bot.add_listener(self._on_role_change, "on_guild_role_delete")
+        bot.add_listener(self._on_role_update, "on_guild_role_update")
+        on_config_reload(lambda config: self.invalidate())
+
+    def invalidate(self, guild_id: int = None):
+        if guild_id is None:
+            self._staff_roles.clear()
+        else:
+            self._staff_roles.pop(guild_id, None)
+
+    async def _on_role_change(self, role: discord.Role):
+        self.invalidate(role.guild.id)
+
+    async def _on_role_update(self, before: discord.Role, after: discord.Role):
+        self.invalidate(after.guild.id)
+
+    def _build(self, guild: discord.Guild):
+        staff_role_id = get_config().staff_role
+        staff = {role.id for role in guild.roles if role.permissions.administrator}
+        staff.update(role.id for role in guild.roles if role.name in STAFF_ROLE_NAMES)
+        if staff_role_id is not None:
+            staff.add(staff_role_id)
+        self._staff_roles[guild.id] = frozenset(staff)
+
+    def staff_roles(self, guild: discord.Guild) -> frozenset:
+        get_config()  # Gives a pending config reload the chance to invalidate us
+        if guild.id not in self._staff_roles:
+            self._build(guild)
+        return self._staff_roles[guild.id]
+
+    @staticmethod
+    def _has_any(member: discord.Member, role_ids) -> bool:
+        # Member.get_role is a binary search over the member's role ids
+        return any(member.get_role(role_id) is not None for role_id in role_ids)
+
+    def is_staff(self, member: discord.Member) -> bool:
+        guild = getattr(member, "guild", None)
+        if guild is None:
+            return False  # A discord.User, e.g. a command used in DMs
+        return guild.owner_id == member.id or self._has_any(member, self.staff_roles(guild))
+
+
+def get_permissions(bot) -> PermissionResolver:
+    """Return the bot-wide permission resolver, creating it on first use."""
+    resolver = getattr(bot, "permission_resolver", None)
+    if resolver is None:
+        resolver = bot.permission_resolver = PermissionResolver(bot)
+    return resolver
@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens refill evenly over ``per`` seconds."""
+
+    def __init__(self, rate: int, per: float, clock=time.monotonic):
+        self.rate = rate
+        self.per = per
+        self.clock = clock
+        self.tokens = float(rate)
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.rate, self.tokens + elapsed * self.rate / self.per)
+            self.updated = now
+
+    def try_acquire(self, tokens: int = 1) -> float:
+        """Take tokens if available. Returns 0 on success, otherwise how many
+        seconds to wait before trying again."""
+        now = self.clock()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) * self.per / self.rate
+
+    def until_idle(self) -> float:
+        """Seconds until the bucket is full and unblocked again, at which
+        point it behaves exactly like a new one and can be dropped."""
+        now = self.clock()
+        self._refill(now)
+        return max(self.blocked_until - now, (self.rate - self.tokens) * self.per / self.rate, 0.0)
+
+    def block(self, seconds: float):
+        """Empty the bucket and refuse everything for ``seconds`` (e.g. after a 429)."""
+        now = self.clock()
+        self.tokens = 0.0
+        self.updated = now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class KeyedRateLimiter:
+    """One token bucket per key (user, guild, ...) without an object per key.
+
+    Each key only stores [tokens, last update]. A bucket left alone for
+    ``per`` seconds has refilled completely and behaves exactly like a new
+    one, so it is evicted. Keys are kept in least-recently-used order, so
+    eviction only ever looks at the front of the OrderedDict.
+    """
+
+    def __init__(self, rate: int, per: float, clock=time.monotonic):
+        self.rate = rate
+        self.per = per
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, updated], least recently used first
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets and now - buckets[next(iter(buckets))][1] >= self.per:
+            buckets.popitem(last=False)
+
+    def _tokens(self, key, now) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return float(self.rate)
+        return min(self.rate, bucket[0] + (now - bucket[1]) * self.rate / self.per)
+
+    def retry_after(self, key, tokens: int = 1) -> float:
+        """Seconds until ``key`` has ``tokens`` available, without taking any."""
+        now = self.clock()
+        available = self._tokens(key, now)
+        return 0.0 if available >= tokens else (tokens - available) * self.per / self.rate
+
+    def take(self, key, tokens: int = 1):
+        """Take tokens unconditionally; check retry_after first."""
+        now = self.clock()
+        self._evict(now)
+        self._buckets[key] = [self._tokens(key, now) - tokens, now]
+        self._buckets.move_to_end(key)
+
+    def try_acquire(self, key, tokens: int = 1) -> float:
+        """Take tokens if available. Returns 0 on success, otherwise how many
+        seconds to wait before trying again."""
+        wait = self.retry_after(key, tokens)
+        if wait == 0.0:
+            self.take(key, tokens)
+        return wait
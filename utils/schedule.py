@@ -0,0 +1,198 @@
+"""Deadline parsing for tasks: one-off dates and times, and cron-like recurring rules.
+
+Everything here runs when a task is created or when a recurring task fires,
+never in the deadline scheduler's loop, which only sees precomputed
+timestamps.
+"""
+import bisect
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9: only UTC and fixed offsets are available
+    ZoneInfo = None
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+}
+# (name, lowest, highest) for minute hour day-of-month month day-of-week
+FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 6))
+SEARCH_DAYS = 366 * 4 + 1  # Long enough for "0 0 29 2 *"
+DUE_FORMATS = "HH:MM[:SS], YYYY-MM-DD HH:MM[:SS][+HH:MM], a cron rule such as '0 9 * * 1-5', or @hourly/@daily/@weekly/@monthly"
+
+_OFFSET = re.compile(r"(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?")
+
+
+def get_timezone(name: Optional[str]):
+    """tzinfo for a zone name ("Europe/Berlin"), "UTC" or an offset ("+02:00").
+    None means the server's local time."""
+    if not name:
+        return None
+    if name.upper() in ("UTC", "GMT", "Z"):
+        return timezone.utc
+    match = _OFFSET.fullmatch(name.upper())
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        return timezone(-offset if sign == "-" else offset)
+    if ZoneInfo is None:
+        raise ValueError(f"Unknown time zone: {name} (named zones need Python 3.9+)")
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+
+def _wall_clock(timestamp: float, tz) -> datetime:
+    """Naive wall clock time in tz (local time when tz is None)."""
+    if tz is None:
+        return datetime.fromtimestamp(timestamp)
+    return datetime.fromtimestamp(timestamp, tz).replace(tzinfo=None)
+
+
+def _timestamp(wall: datetime, tz) -> float:
+    if tz is None:
+        return wall.timestamp()
+    return wall.replace(tzinfo=tz).timestamp()
+
+
+def _parse_field(text: str, low: int, high: int) -> Tuple[int, ...]:
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step in '{text}'")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"'{text}' is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return tuple(sorted(values))
+
+
+@dataclass(frozen=True)
+class CronRule:
+    """A standard five field cron rule: minute hour day-of-month month day-of-week."""
+    expression: str
+    minutes: Tuple[int, ...]
+    hours: Tuple[int, ...]
+    days: Tuple[int, ...]
+    months: Tuple[int, ...]
+    weekdays: Tuple[int, ...]  # 0 = Sunday, like cron
+    any_day: bool
+    any_weekday: bool
+
+    def _day_matches(self, day: date) -> bool:
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays
+        # Cron fires on either field when both are restricted
+        if not self.any_day and not self.any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, timestamp: float, tz=None) -> float:
+        """First firing strictly after ``timestamp``, evaluated on tz's wall clock."""
+        start = _wall_clock(timestamp, tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(SEARCH_DAYS):
+            if self._day_matches(day):
+                first_hour, first_minute = (start.hour, start.minute) if day == start.date() else (0, 0)
+                for hour in self.hours[bisect.bisect_left(self.hours, first_hour):]:
+                    minutes = self.minutes
+                    if hour == first_hour:
+                        minutes = minutes[bisect.bisect_left(minutes, first_minute):]
+                    for minute in minutes:
+                        fire_at = _timestamp(datetime(day.year, day.month, day.day, hour, minute), tz)
+                        if fire_at > timestamp:  # Wall times skipped by a DST change can map backwards
+                            return fire_at
+            day += timedelta(days=1)
+        raise ValueError(f"'{self.expression}' never fires")
+
+
+@lru_cache(maxsize=4096)
+def parse_rule(expression: str) -> CronRule:
+    """Parse (and cache) a cron rule. Recurring tasks share a handful of rules,
+    so rescheduling thousands of them only parses each rule once."""
+    expression = " ".join(expression.split())
+    fields = ALIASES.get(expression.lower(), expression).split()
+    if len(fields) != len(FIELDS):
+        raise ValueError(f"A cron rule needs {len(FIELDS)} fields, got '{expression}'")
+    parsed = []
+    for text, (name, low, high) in zip(fields, FIELDS):
+        try:
+            if name == "weekday":
+                # Both 0 and 7 mean Sunday
+                values = tuple(sorted({value % 7 for value in _parse_field(text, low, 7)}))
+            else:
+                values = _parse_field(text, low, high)
+        except ValueError as e:
+            raise ValueError(f"Invalid {name} field: {e}")
+        parsed.append(values)
+    minutes, hours, days, months, weekdays = parsed
+    return CronRule(
+        expression=expression,
+        minutes=minutes,
+        hours=hours,
+        days=days,
+        months=months,
+        weekdays=weekdays,
+        any_day=fields[2] == "*",
+        any_weekday=fields[4] == "*",
+    )
+
+
+def is_rule(text: str) -> bool:
+    return text.strip().lower() in ALIASES or len(text.split()) == len(FIELDS)
+
+
+def parse_due(text: str, tz=None, now: float = None):
+    """Turn a deadline typed by a user into (due_at, recurrence).
+
+    recurrence is the normalized cron rule for recurring tasks and None for
+    one-off deadlines. Raises ValueError for anything unrecognised.
+    """
+    now = time.time() if now is None else now
+    text = text.strip()
+    if is_rule(text):
+        rule = parse_rule(text)
+        return rule.next_after(now, tz), rule.expression
+
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            due_time = datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+        # Next occurrence of that wall clock time: today if still ahead, otherwise tomorrow
+        today = _wall_clock(now, tz).date()
+        due_at = _timestamp(datetime.combine(today, due_time), tz)
+        if due_at <= now:
+            due_at = _timestamp(datetime.combine(today + timedelta(days=1), due_time), tz)
+        return due_at, None
+
+    try:
+        due = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid deadline '{text}'")
+    if due.tzinfo is not None:
+        return due.timestamp(), None
+    return _timestamp(due, tz), None
@@ -0,0 +1,80 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Set by launcher.py for each worker process
+CLUSTER_ENV = "BOT_CLUSTER_ID"
+SHARD_IDS_ENV = "BOT_SHARD_IDS"
+SHARD_COUNT_ENV = "BOT_SHARD_COUNT"
+DATA_ROOT = "data"
+
+
+@dataclass(frozen=True)
+class ClusterInfo:
+    cluster_id: int
+    shard_ids: Tuple[int, ...]
+    shard_count: int
+
+    def owns_guild(self, guild_id: int) -> bool:
+        return shard_for_guild(guild_id, self.shard_count) in self.shard_ids
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """Discord's documented guild -> shard mapping."""
+    return (guild_id >> 22) % shard_count
+
+
+def plan_clusters(shard_count: int, processes: int):
+    """Split shards 0..shard_count-1 into ``processes`` contiguous ranges."""
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    plan = []
+    start = 0
+    for cluster_id in range(processes):
+        size = base + (1 if cluster_id < extra else 0)
+        plan.append(tuple(range(start, start + size)))
+        start += size
+    return plan
+
+
+def cluster_env(cluster_id: int, shard_ids, shard_count: int) -> dict:
+    return {
+        CLUSTER_ENV: str(cluster_id),
+        SHARD_IDS_ENV: ",".join(str(shard_id) for shard_id in shard_ids),
+        SHARD_COUNT_ENV: str(shard_count),
+    }
+
+
+def current_cluster() -> Optional[ClusterInfo]:
+    """The cluster this process was launched as, or None when running unsharded."""
+    cluster_id = os.environ.get(CLUSTER_ENV)
+    if cluster_id is None:
+        return None
+    return ClusterInfo(
+        cluster_id=int(cluster_id),
+        shard_ids=tuple(int(shard_id) for shard_id in os.environ[SHARD_IDS_ENV].split(",") if shard_id),
+        shard_count=int(os.environ[SHARD_COUNT_ENV]),
+    )
+
+
+def is_primary() -> bool:
+    """True for an unsharded bot or cluster 0. Only the primary imports legacy
+    single-process data files, so their rows are never duplicated."""
+    cluster = current_cluster()
+    return cluster is None or cluster.cluster_id == 0
+
+
+def data_path(name: str) -> str:
+    """Where a process-owned data file lives.
+
+    Unsharded, files stay in the working directory as before. Each cluster
+    gets its own directory, so no two processes ever write the same file; a
+    cluster only ever sees events for guilds on its shards, which partitions
+    the stores by guild id.
+    """
+    cluster = current_cluster()
+    if cluster is None:
+        return name
+    directory = os.path.join(DATA_ROOT, f"cluster-{cluster.cluster_id}")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
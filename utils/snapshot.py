@@ -0,0 +1,282 @@
+"""Keyed state persisted as a versioned binary snapshot plus a change log.
+
+Every batch of changes is appended to ``<path>.log``; once enough entries
+have piled up, the whole state is written as a new snapshot at ``<path>``
+and the log starts over. Startup is one sequential read of each file.
+
+Both files carry a generation number. A log whose generation doesn't match
+the snapshot's was already folded into it (the process died between writing
+the snapshot and resetting the log) and is ignored. A torn entry at the end
+of the log is cut off.
+"""
+import asyncio
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+FORMAT_VERSION = 1
+SNAPSHOT_MAGIC = b"BSNP"
+LOG_MAGIC = b"BLOG"
+DELETED = 0xFFFFFFFF  # Payload length marking a deleted key in the log
+
+_SNAPSHOT_HEADER = struct.Struct("<4sHHQI")  # magic, format version, record version, generation, record count
+_LOG_HEADER = struct.Struct("<4sHHQ")  # magic, format version, record version, generation
+_RECORD = struct.Struct("<QI")  # key, payload length
+_CRC = struct.Struct("<I")
+
+
+def _fsync_directory(path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _replace(path, chunks):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        for chunk in chunks:
+            file.write(chunk)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotLog:
+    """Write-behind persistence for a dict of int keys to immutable values.
+
+    ``encode(value) -> bytes`` and ``decode(key, payload, record_version)``
+    run on the writer thread and during load. Bump ``record_version`` when
+    the encoding changes; decode sees the version a record was written with.
+    ``state()`` returns every (key, value) and is called on the event loop
+    when a new snapshot is due.
+    """
+
+    def __init__(self, path, record_version, encode, decode, state,
+                 flush_interval, flush_every, compact_every, thread_name):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.record_version = record_version
+        self.encode = encode
+        self.decode = decode
+        self.state = state
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.compact_every = compact_every
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+        self._lock = asyncio.Lock()
+        self._changes = {}  # key -> value, or None once deleted
+        self._timer = None
+        self._flushing = None
+        self._generation = 0
+        self._logged = 0  # Log entries since the last snapshot
+        self._log_valid = False  # False when the log has to be started over
+        self.flushes = 0
+        self.snapshots = 0
+        self.restored = {}
+
+    # --- loading ----------------------------------------------------------------
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> dict:
+        """Read the snapshot and replay the log. Synchronous, for use in __init__."""
+        started = time.perf_counter()
+        records = self._read_snapshot()
+        from_snapshot = len(records)
+        replayed = self._replay_log(records)
+        self.restored = {
+            "records": from_snapshot,
+            "log_entries": replayed,
+            "seconds": time.perf_counter() - started,
+        }
+        return records
+
+    def _read_snapshot(self) -> dict:
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return {}
+        if len(data) < _SNAPSHOT_HEADER.size + _CRC.size:
+            raise ValueError(f"{self.path} is truncated ({len(data)} bytes)")
+        magic, version, record_version, generation, count = _SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC or version > FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a snapshot this version can read")
+        body, (crc,) = data[:-_CRC.size], _CRC.unpack_from(data, len(data) - _CRC.size)
+        if zlib.crc32(body) != crc:
+            raise ValueError(f"{self.path} is corrupt (checksum mismatch)")
+
+        records = {}
+        offset = _SNAPSHOT_HEADER.size
+        try:
+            for _ in range(count):
+                key, length = _RECORD.unpack_from(body, offset)
+                offset += _RECORD.size
+                records[key] = self.decode(key, body[offset:offset + length], record_version)
+                offset += length
+        except struct.error as e:
+            raise ValueError(f"{self.path} has an unreadable record at byte {offset}: {e}") from e
+        self._generation = generation
+        return records
+
+    def _replay_log(self, records: dict) -> int:
+        try:
+            with open(self.log_path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0
+        if len(data) < _LOG_HEADER.size:
+            return 0
+        magic, version, record_version, generation = _LOG_HEADER.unpack_from(data, 0)
+        if magic != LOG_MAGIC or version > FORMAT_VERSION or generation != self._generation:
+            return 0  # Already part of the snapshot
+
+        offset, replayed = _LOG_HEADER.size, 0
+        while offset + _RECORD.size <= len(data):
+            key, length = _RECORD.unpack_from(data, offset)
+            end = offset + _RECORD.size + (0 if length == DELETED else length)
+            if end + _CRC.size > len(data) or zlib.crc32(data[offset:end]) != _CRC.unpack_from(data, end)[0]:
+                break  # Torn write from a crash; everything before it is intact
+            if length == DELETED:
+                records.pop(key, None)
+            else:
+                records[key] = self.decode(key, data[offset + _RECORD.size:end], record_version)
+            offset = end + _CRC.size
+            replayed += 1
+        if offset < len(data):
+            with open(self.log_path, "r+b") as file:
+                file.truncate(offset)
+        self._logged = replayed
+        self._log_valid = True
+        if record_version != self.record_version:
+            # Never append newer records under an older header; the next flush writes a snapshot
+            self._logged = self.compact_every
+        return replayed
+
+    def move_aside(self, suffix=".corrupt") -> list:
+        """Rename the snapshot and its log out of the way, e.g. after load()
+        refused them, so they can be inspected and a fresh snapshot written."""
+        moved = []
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.replace(path, path + suffix)
+                moved.append(path + suffix)
+        self._generation = 0
+        self._logged = 0
+        self._log_valid = False
+        return moved
+
+    # --- changes ----------------------------------------------------------------
+
+    def put(self, key: int, value):
+        self._changes[key] = value
+        self._changed()
+
+    def delete(self, key: int):
+        self._changes[key] = None
+        self._changed()
+
+    @property
+    def pending(self) -> int:
+        return len(self._changes)
+
+    def _changed(self):
+        if len(self._changes) >= self.flush_every:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    # --- writing (writer thread) --------------------------------------------------
+
+    def _entry(self, key, value) -> bytes:
+        if value is None:
+            entry = _RECORD.pack(key, DELETED)
+        else:
+            payload = self.encode(value)
+            entry = _RECORD.pack(key, len(payload)) + payload
+        return entry + _CRC.pack(zlib.crc32(entry))
+
+    def _append(self, changes):
+        mode = "ab" if self._log_valid else "wb"
+        with open(self.log_path, mode) as file:
+            if not self._log_valid:
+                file.write(_LOG_HEADER.pack(LOG_MAGIC, FORMAT_VERSION, self.record_version, self._generation))
+            file.write(b"".join(self._entry(key, value) for key, value in changes))
+            file.flush()
+            os.fsync(file.fileno())
+        self._log_valid = True
+
+    def _write_snapshot(self, items):
+        generation = self._generation + 1
+        records = []
+        for key, value in items:
+            payload = self.encode(value)
+            records.append(_RECORD.pack(key, len(payload)))
+            records.append(payload)
+        body = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, FORMAT_VERSION, self.record_version, generation, len(items)) + b"".join(records)
+        _replace(self.path, (body, _CRC.pack(zlib.crc32(body))))
+        # A crash from here on leaves a stale log, which the generation check ignores
+        _replace(self.log_path, (_LOG_HEADER.pack(LOG_MAGIC, FORMAT_VERSION, self.record_version, generation),))
+        _fsync_directory(self.path)
+        self._generation = generation
+        self._log_valid = True
+
+    # --- flushing -----------------------------------------------------------------
+
+    async def flush(self):
+        """Append pending changes to the log, or write a new snapshot when the log has grown enough."""
+        async with self._lock:
+            if not self._changes:
+                return
+            changes, self._changes = list(self._changes.items()), {}
+            loop = asyncio.get_running_loop()
+            try:
+                if self._logged + len(changes) >= self.compact_every:
+                    # The state already includes these changes
+                    await loop.run_in_executor(self._executor, self._write_snapshot, list(self.state()))
+                    self._logged = 0
+                    self.snapshots += 1
+                else:
+                    await loop.run_in_executor(self._executor, self._append, changes)
+                    self._logged += len(changes)
+                self.flushes += 1
+            except OSError as e:
+                print(f"Failed to write {self.path}: {e}")
+                for key, value in changes:
+                    self._changes.setdefault(key, value)
+            if self._changes and self._timer is None:
+                self._timer = loop.call_later(self.flush_interval, self._start_flush)
+
+    def snapshot_now(self):
+        """Write a snapshot synchronously, e.g. right after importing older data."""
+        self._write_snapshot(list(self.state()))
+        self._changes.clear()
+        self._logged = 0
+        self.snapshots += 1
+
+    def close(self):
+        """Write whatever is pending and stop. Safe to call from sync code such as cog_unload."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._executor.shutdown(wait=True)
+        if self._changes:
+            if self._logged + len(self._changes) >= self.compact_every:
+                self.snapshot_now()
+            else:
+                changes, self._changes = list(self._changes.items()), {}
+                self._append(changes)
+                self._logged += len(changes)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from contextlib import contextmanager
+
+COMMAND_CACHE_FILE = ".command_sync.json"
+
+
+class StartupTimer:
+    """Collects how long each startup phase took, for a one-off report."""
+
+    def __init__(self, started: float = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = []  # (name, seconds)
+        self._last_mark = self.started
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phases.append((name, now - started))
+            self._last_mark = now
+
+    def mark(self, name: str):
+        """Record the time since the previous phase ended, e.g. waiting on the gateway."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last_mark))
+        self._last_mark = now
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.started
+        width = max([len(name) for name, _ in self.phases] + [5])
+        lines = [f"[STARTUP] {name:<{width}} {seconds * 1000:9.1f} ms" for name, seconds in self.phases]
+        lines.append(f"[STARTUP] {'total':<{width}} {total * 1000:9.1f} ms")
+        self.reported = True
+        return "\n".join(lines)
+
+
+def _command_key(command) -> str:
+    guild_ids = getattr(command, "guild_ids", None)
+    return command.name if not guild_ids else f"{command.name}@{','.join(map(str, sorted(guild_ids)))}"
+
+
+def command_hash(bot) -> str:
+    """Stable hash of every application command payload the bot would register."""
+    payload = sorted(
+        (
+            {"key": _command_key(command), "payload": command.to_dict()}
+            for command in bot.pending_application_commands
+        ),
+        key=lambda entry: entry["key"]
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_channel_ids(bot):
+    """(channel ids, guild ids) for everything in the gateway cache, including
+    active threads. Guilds in an outage are left out, so their channels are
+    never mistaken for deleted ones."""
+    channel_ids, guild_ids = set(), set()
+    for guild in bot.guilds:
+        if guild.unavailable:
+            continue
+        guild_ids.add(guild.id)
+        channel_ids.update(channel.id for channel in guild.channels)
+        channel_ids.update(thread.id for thread in guild.threads)
+    return channel_ids, guild_ids
+
+
+async def reconcile_cogs(bot):
+    """Let every cog with a ``reconcile(channel_ids, guild_ids)`` method check
+    its restored state against the gateway cache, in one pass per cog."""
+    channel_ids, guild_ids = cached_channel_ids(bot)
+    for name, cog in list(bot.cogs.items()):
+        reconcile = getattr(cog, "reconcile", None)
+        if reconcile is None:
+            continue
+        try:
+            await reconcile(channel_ids, guild_ids)
+        except Exception as e:
+            print(f"Failed to reconcile {name}: {e}")
+            traceback.print_exc()
+
+
+def _restore_ids(bot, commands_by_key, ids):
+    for key, command_id in ids.items():
+        command = commands_by_key.get(key)
+        if command is None:
+            continue
+        command.id = command_id
+        # py-cord resolves incoming interactions through this id map,
+        # which sync_commands would otherwise have filled in
+        bot._application_commands[command.id] = command
+
+
+async def sync_commands_if_changed(bot, sync=True) -> bool:
+    """Sync application commands only when their definitions changed since the
+    last sync. Otherwise restore the command ids from the on-disk cache so
+    interactions still resolve, without any API calls. Returns True if a sync ran.
+
+    With ``sync=False`` (every shard cluster but the primary) commands are
+    never synced. When the cache is stale, the ids are read back from
+    Discord instead; a bulk sync keeps the id of every command it doesn't
+    remove, so they stay valid once the primary has synced.
+    """
+    # Shared by every cluster, since the commands are the same for all of them
+    path = COMMAND_CACHE_FILE
+    cache = _load_cache(path)
+    current = command_hash(bot)
+    commands_by_key = {_command_key(command): command for command in bot.pending_application_commands}
+
+    if cache.get("hash") == current and set(cache.get("ids", {})) == set(commands_by_key):
+        _restore_ids(bot, commands_by_key, cache["ids"])
+        return False
+
+    if not sync:
+        registered = await bot.http.get_global_commands(bot.application_id)
+        # Ids stay strings, the way they arrive in interaction payloads
+        _restore_ids(bot, commands_by_key, {entry["name"]: str(entry["id"]) for entry in registered})
+        return False
+
+    await bot.sync_commands()
+    ids = {_command_key(command): command.id for command in bot.pending_application_commands if command.id}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"hash": current, "ids": ids}, file)
+    os.replace(tmp_path, path)
+    return True
@@ -0,0 +1,327 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+def _backfill_due_at(conn):
+    """Derive due_at/notified for rows that only carry an HH:MM:SS due_time."""
+    rows = conn.execute("SELECT id, due_time, status, created_at FROM tasks WHERE due_at IS NULL").fetchall()
+    for row in rows:
+        try:
+            due_time = datetime.strptime(row["due_time"], "%H:%M:%S").time()
+        except (TypeError, ValueError):
+            continue
+        created = datetime.fromtimestamp(row["created_at"])
+        due_at = datetime.combine(created.date(), due_time).timestamp()
+        notified = 1 if row["status"] in ("Overdue", "Completed") else 0
+        conn.execute("UPDATE tasks SET due_at = ?, notified = ? WHERE id = ?", (due_at, notified, row["id"]))
+
+
+# Each entry is (version, [statements]). A statement is either SQL or a
+# callable taking the connection. Append new entries, never edit old ones.
+_MIGRATIONS = [
+    (1, [
+        """CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            assignee_id INTEGER NOT NULL,
+            created_by INTEGER NOT NULL,
+            channel_id INTEGER,
+            due_time TEXT,
+            status TEXT NOT NULL DEFAULT 'Pending',
+            created_at REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_channel ON tasks(channel_id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks(assignee_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)",
+    ]),
+    (2, [
+        "ALTER TABLE tasks ADD COLUMN due_at REAL",
+        "ALTER TABLE tasks ADD COLUMN notified INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_pending_due ON tasks(notified, due_at)",
+        _backfill_due_at,
+    ]),
+    (3, [
+        # Lets a sharded deployment tell which guild (and so which shard) a row belongs to
+        "ALTER TABLE tasks ADD COLUMN guild_id INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_guild ON tasks(guild_id)",
+    ]),
+    (4, [
+        # Recurring tasks keep their cron rule; due_at always holds the next firing
+        "ALTER TABLE tasks ADD COLUMN recurrence TEXT",
+        "ALTER TABLE tasks ADD COLUMN timezone TEXT",
+    ]),
+]
+
+TASK_COLUMNS = (
+    "title", "description", "assignee_id", "created_by",
+    "channel_id", "due_time", "status", "created_at",
+    "due_at", "notified", "guild_id", "recurrence", "timezone",
+)
+
+
+class TaskStore:
+    """SQLite backed task storage. All queries run on a single worker thread
+    so the event loop never blocks on disk I/O."""
+
+    def __init__(self, path="tasks.db", legacy_json="tasks.json"):
+        self.path = path
+        self.legacy_json = legacy_json
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+        self._conn = None
+
+    # --- worker thread side -------------------------------------------------
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._migrate(conn)
+            self._import_legacy_json(conn)
+            self._conn = conn
+        return self._conn
+
+    def _migrate(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        current = int(row[0]) if row else 0
+        for version, statements in _MIGRATIONS:
+            if version <= current:
+                continue
+            with conn:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                    (str(version),)
+                )
+
+    def _import_legacy_json(self, conn):
+        """One-off import of the old tasks.json file into the database."""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+            return
+        rows = []
+        if self.legacy_json and os.path.exists(self.legacy_json):
+            with open(self.legacy_json, "r", encoding="utf-8") as file:
+                try:
+                    data = json.load(file)
+                except ValueError:
+                    data = {}
+            now = time.time()
+            for task in data.get("tasks", []):
+                rows.append(self._legacy_row(task, now))
+        with conn:
+            for row in rows:
+                self._insert(conn, row)
+            _backfill_due_at(conn)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_imported', ?)", (str(len(rows)),))
+        if rows:
+            print(f"Imported {len(rows)} tasks from {self.legacy_json}")
+
+    @staticmethod
+    def _legacy_row(task, now):
+        return {
+            "title": task.get("title", ""),
+            "description": task.get("description", ""),
+            "assignee_id": int(task["assignee_id"]),
+            "created_by": int(task.get("created_by", task["assignee_id"])),
+            "channel_id": int(task["channel_id"]) if task.get("channel_id") else None,
+            # Older code wrote both "due" and "due_time"
+            "due_time": task.get("due_time", task.get("due")),
+            "status": task.get("status", "Pending"),
+            "created_at": now,
+            "due_at": None,
+            "notified": 0,
+        }
+
+    @staticmethod
+    def _insert(conn, task):
+        values = [task.get(column) for column in TASK_COLUMNS]
+        cursor = conn.execute(
+            f"INSERT INTO tasks ({', '.join(TASK_COLUMNS)}) VALUES ({', '.join('?' for _ in TASK_COLUMNS)})",
+            values
+        )
+        return cursor.lastrowid
+
+    def _call(self, fn, *args):
+        return fn(self._connect(), *args)
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, *args)
+
+    # --- public API ---------------------------------------------------------
+
+    async def add(self, task: dict) -> dict:
+        """Insert a task and return it with its id filled in."""
+        task = dict(task)
+        task.setdefault("status", "Pending")
+        task.setdefault("created_at", time.time())
+        task.setdefault("notified", 0)
+
+        def op(conn):
+            with conn:
+                return self._insert(conn, task)
+
+        task["id"] = await self._run(op)
+        return task
+
+    async def add_many(self, tasks) -> list:
+        """Insert many tasks in one transaction and return them with ids filled in."""
+        now = time.time()
+        tasks = [dict(task) for task in tasks]
+        for task in tasks:
+            task.setdefault("status", "Pending")
+            task.setdefault("created_at", now)
+            task.setdefault("notified", 0)
+
+        def op(conn):
+            with conn:
+                return [self._insert(conn, task) for task in tasks]
+
+        for task, task_id in zip(tasks, await self._run(op)):
+            task["id"] = task_id
+        return tasks
+
+    async def get_by_channel(self, channel_id: int):
+        def op(conn):
+            row = conn.execute("SELECT * FROM tasks WHERE channel_id = ? ORDER BY id DESC LIMIT 1", (channel_id,)).fetchone()
+            return dict(row) if row else None
+
+        return await self._run(op)
+
+    async def set_status(self, channel_id: int, status: str):
+        """Update the status of the task bound to a channel and return the updated task."""
+        def op(conn):
+            with conn:
+                conn.execute("UPDATE tasks SET status = ? WHERE channel_id = ?", (status, channel_id))
+            row = conn.execute("SELECT * FROM tasks WHERE channel_id = ? ORDER BY id DESC LIMIT 1", (channel_id,)).fetchone()
+            return dict(row) if row else None
+
+        return await self._run(op)
+
+    async def complete_many(self, channel_ids, guild_id: int = None, legacy_channel_ids=()) -> list:
+        """Mark the open tasks bound to these channels Completed in one
+        transaction. Returns the tasks that were actually open.
+
+        With ``guild_id``, only that guild's tasks are touched. Rows written
+        before guild_id existed only match if their channel is also in
+        ``legacy_channel_ids``, which the caller has checked belong to the guild."""
+        channel_ids = list(channel_ids)
+        legacy_channel_ids = [channel_id for channel_id in legacy_channel_ids if channel_id in channel_ids]
+
+        def op(conn):
+            where = f"channel_id IN ({', '.join('?' for _ in channel_ids)}) AND status IN ('Pending', 'Overdue')"
+            params = list(channel_ids)
+            if guild_id is not None:
+                legacy = ", ".join("?" for _ in legacy_channel_ids) or "NULL"
+                where += f" AND (guild_id = ? OR (guild_id IS NULL AND channel_id IN ({legacy})))"
+                params += [guild_id] + legacy_channel_ids
+            with conn:
+                rows = conn.execute(f"SELECT * FROM tasks WHERE {where}", params).fetchall()
+                conn.execute(f"UPDATE tasks SET status = 'Completed' WHERE {where}", params)
+            return [dict(row, status="Completed") for row in rows]
+
+        return await self._run(op) if channel_ids else []
+
+    async def reassign_all(self, from_id: int, to_id: int, guild_id: int = None) -> list:
+        """Hand every open task of one assignee to another in one transaction.
+        Returns the reassigned tasks."""
+        def op(conn):
+            where = "assignee_id = ? AND status IN ('Pending', 'Overdue')"
+            params = [from_id]
+            if guild_id is not None:
+                where += " AND guild_id = ?"
+                params.append(guild_id)
+            with conn:
+                rows = conn.execute(f"SELECT * FROM tasks WHERE {where}", params).fetchall()
+                conn.execute(f"UPDATE tasks SET assignee_id = ? WHERE {where}", [to_id] + params)
+            return [dict(row, assignee_id=to_id) for row in rows]
+
+        return await self._run(op)
+
+    async def by_assignee(self, assignee_id: int, status: str = None):
+        def op(conn):
+            if status is None:
+                rows = conn.execute("SELECT * FROM tasks WHERE assignee_id = ?", (assignee_id,))
+            else:
+                rows = conn.execute("SELECT * FROM tasks WHERE assignee_id = ? AND status = ?", (assignee_id, status))
+            return [dict(row) for row in rows]
+
+        return await self._run(op)
+
+    async def by_status(self, *statuses: str):
+        def op(conn):
+            rows = conn.execute(
+                f"SELECT * FROM tasks WHERE status IN ({', '.join('?' for _ in statuses)})",
+                statuses
+            )
+            return [dict(row) for row in rows]
+
+        return await self._run(op)
+
+    async def pending_deadlines(self):
+        """(channel_id, due_at, guild_id) for every task still waiting on its overdue notice."""
+        def op(conn):
+            rows = conn.execute(
+                "SELECT channel_id, due_at, guild_id FROM tasks "
+                "WHERE notified = 0 AND due_at IS NOT NULL AND status = 'Pending'"
+            )
+            return [(row["channel_id"], row["due_at"], row["guild_id"]) for row in rows]
+
+        return await self._run(op)
+
+    async def mark_overdue(self, channel_id: int):
+        """Flag a pending task as overdue and notified. Returns the task, or None
+        if it was completed in the meantime."""
+        def op(conn):
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE tasks SET status = 'Overdue', notified = 1 WHERE channel_id = ? AND status = 'Pending'",
+                    (channel_id,)
+                )
+            if cursor.rowcount == 0:
+                return None
+            row = conn.execute("SELECT * FROM tasks WHERE channel_id = ? ORDER BY id DESC LIMIT 1", (channel_id,)).fetchone()
+            return dict(row) if row else None
+
+        return await self._run(op)
+
+    async def reschedule(self, channel_id: int, due_at: float) -> bool:
+        """Move a pending task's deadline, e.g. to a recurring task's next firing.
+        Returns False if the task is no longer pending."""
+        def op(conn):
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE tasks SET due_at = ?, notified = 0 WHERE channel_id = ? AND status = 'Pending'",
+                    (due_at, channel_id)
+                )
+            return cursor.rowcount > 0
+
+        return await self._run(op)
+
+    async def count(self) -> int:
+        def op(conn):
+            return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+        return await self._run(op)
+
+    def close(self):
+        """Close the connection. Safe to call from sync code such as cog_unload."""
+        def op():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        self._executor.submit(op)
+        self._executor.shutdown(wait=False)
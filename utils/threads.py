@@ -0,0 +1,59 @@
+"""Private threads as a lighter alternative to one text channel per ticket or task.
+
+A thread costs a single API call to create (the first message that mentions
+a member adds them, so no permission overwrites are needed), does not count
+towards the 500 channel guild limit, and is archived and locked on close
+instead of deleted. Staff with Manage Threads can see every private thread.
+"""
+import discord
+
+ARCHIVE_AFTER_MINUTES = 10080  # Longest auto-archive Discord allows, 7 days
+
+
+def uses_threads(mode: str) -> bool:
+    """``mode`` is ticket_mode or task_mode, already validated by the config loader."""
+    return mode == "thread"
+
+
+def thread_parent(bot, parent_id, fallback):
+    """The configured parent channel, or ``fallback`` (usually where the command was used)."""
+    parent = bot.get_channel(parent_id) if parent_id else None
+    if isinstance(parent, discord.TextChannel):
+        return parent
+    # Threads can't hold threads; used from inside one, go to its channel
+    return fallback.parent if isinstance(fallback, discord.Thread) else fallback
+
+
+def invite_mentions(channel, *members):
+    """Message content that adds ``members`` to a private thread, None for channels."""
+    if not isinstance(channel, discord.Thread):
+        return None
+    return " ".join(dict.fromkeys(member.mention for member in members))
+
+
+async def create_private_thread(parent: discord.TextChannel, name: str) -> discord.Thread:
+    return await parent.create_thread(
+        name=name[:100],
+        type=discord.ChannelType.private_thread,
+        auto_archive_duration=ARCHIVE_AFTER_MINUTES,
+        invitable=False
+    )
+
+
+async def resolve_channel(bot, channel_id: int):
+    """get_channel, falling back to the API for threads that auto-archived and left the cache."""
+    channel = bot.get_channel(channel_id)
+    if channel is not None:
+        return channel
+    try:
+        return await bot.fetch_channel(channel_id)
+    except (discord.NotFound, discord.Forbidden):
+        return None
+
+
+async def close_channel(channel):
+    """Archive and lock a thread, delete a text channel."""
+    if isinstance(channel, discord.Thread):
+        await channel.edit(archived=True, locked=True)
+    else:
+        await channel.delete()
@@ -0,0 +1,160 @@
+import json
+from typing import Dict, Optional
+
+from utils.metrics import Histogram
+from utils.write_behind import WriteBehindJSON
+
+# Upper bounds in seconds: 1m, 5m, 15m, 30m, 1h, 2h, 4h, 8h, 1d, 3d
+SLA_BUCKETS = (60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 259200, float("inf"))
+FLUSH_INTERVAL = 5.0
+FLUSH_EVERY = 50
+
+
+def _histogram_from(data) -> Histogram:
+    histogram = Histogram(SLA_BUCKETS)
+    if data and len(data.get("counts", ())) == len(SLA_BUCKETS):
+        histogram.counts = list(data["counts"])
+        histogram.total = data["total"]
+        histogram.count = sum(histogram.counts)
+    return histogram
+
+
+def _histogram_to(histogram: Histogram) -> dict:
+    return {"counts": list(histogram.counts), "total": histogram.total}
+
+
+def format_duration(seconds: float) -> str:
+    if seconds == float("inf"):
+        return f"> {format_duration(SLA_BUCKETS[-2])}"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h".replace(".0h", "h")
+    return f"{seconds / 86400:.1f}d".replace(".0d", "d")
+
+
+class TicketAggregate:
+    """Running totals for one reason or one staff member."""
+    __slots__ = ("opened", "closed", "responded", "response", "resolution")
+
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+        self.responded = 0
+        self.response = Histogram(SLA_BUCKETS)  # opened -> first staff message
+        self.resolution = Histogram(SLA_BUCKETS)  # opened -> closed
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TicketAggregate":
+        aggregate = cls()
+        aggregate.opened = data.get("opened", 0)
+        aggregate.closed = data.get("closed", 0)
+        aggregate.responded = data.get("responded", 0)
+        aggregate.response = _histogram_from(data.get("response"))
+        aggregate.resolution = _histogram_from(data.get("resolution"))
+        return aggregate
+
+    def to_dict(self) -> dict:
+        return {
+            "opened": self.opened,
+            "closed": self.closed,
+            "responded": self.responded,
+            "response": _histogram_to(self.response),
+            "resolution": _histogram_to(self.resolution),
+        }
+
+
+class GuildTicketStats:
+    """The aggregates of one guild, per reason and per staff member."""
+    __slots__ = ("reasons", "staff")
+
+    def __init__(self):
+        self.reasons: Dict[str, TicketAggregate] = {}
+        self.staff: Dict[int, TicketAggregate] = {}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GuildTicketStats":
+        stats = cls()
+        for reason, entry in data.get("reasons", {}).items():
+            stats.reasons[reason] = TicketAggregate.from_dict(entry)
+        for staff_id, entry in data.get("staff", {}).items():
+            stats.staff[int(staff_id)] = TicketAggregate.from_dict(entry)
+        return stats
+
+    def to_dict(self) -> dict:
+        return {
+            "reasons": {reason: aggregate.to_dict() for reason, aggregate in self.reasons.items()},
+            "staff": {str(staff_id): aggregate.to_dict() for staff_id, aggregate in self.staff.items()},
+        }
+
+    def reason(self, reason: str) -> TicketAggregate:
+        aggregate = self.reasons.get(reason)
+        if aggregate is None:
+            aggregate = self.reasons[reason] = TicketAggregate()
+        return aggregate
+
+    def member(self, staff_id: int) -> TicketAggregate:
+        aggregate = self.staff.get(staff_id)
+        if aggregate is None:
+            aggregate = self.staff[staff_id] = TicketAggregate()
+        return aggregate
+
+
+class TicketAnalytics(WriteBehindJSON):
+    """Ticket SLA aggregates per guild, and within it per reason and per staff member.
+
+    Every event updates a few counters and histogram buckets, so the stats
+    never have to be recomputed from channel histories and reading them
+    costs the same however many tickets there have been. The aggregates are
+    persisted in the background like the ticket store.
+    """
+
+    def __init__(self, path="ticket_stats.json", flush_interval=FLUSH_INTERVAL, flush_every=FLUSH_EVERY):
+        super().__init__(path, flush_interval, flush_every, thread_name="ticket-analytics")
+        self.guilds: Dict[int, GuildTicketStats] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = {}
+        for guild_id, entry in data.get("guilds", {}).items():
+            self.guilds[int(guild_id)] = GuildTicketStats.from_dict(entry)
+
+    def _snapshot(self):
+        # The aggregates are small and mutable, so copy them on the loop
+        return {"guilds": {str(guild_id): stats.to_dict() for guild_id, stats in self.guilds.items()}}
+
+    def _serialize(self, snapshot):
+        return snapshot
+
+    def guild(self, guild_id: int) -> GuildTicketStats:
+        """The guild's aggregates; empty for a guild without tickets."""
+        return self.guilds.get(guild_id) or GuildTicketStats()
+
+    def _guild(self, guild_id: int) -> GuildTicketStats:
+        stats = self.guilds.get(guild_id)
+        if stats is None:
+            stats = self.guilds[guild_id] = GuildTicketStats()
+        return stats
+
+    # --- events ---------------------------------------------------------------
+
+    def opened(self, guild_id: int, reason: str):
+        self._guild(guild_id).reason(reason).opened += 1
+        self._changed()
+
+    def first_response(self, guild_id: int, reason: str, staff_id: int, latency: float):
+        stats = self._guild(guild_id)
+        for aggregate in (stats.reason(reason), stats.member(staff_id)):
+            aggregate.responded += 1
+            aggregate.response.observe(max(latency, 0.0))
+        self._changed()
+
+    def closed(self, guild_id: int, reason: str, staff_id: int, duration: Optional[float]):
+        """duration is None for tickets opened before they carried timestamps."""
+        stats = self._guild(guild_id)
+        for aggregate in (stats.reason(reason), stats.member(staff_id)):
+            aggregate.closed += 1
+            if duration is not None:
+                aggregate.resolution.observe(max(duration, 0.0))
+        self._changed()
@@ -0,0 +1,221 @@
+import json
+import math
+import os
+import struct
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, Optional
+
+from utils.snapshot import SnapshotLog
+
+FLUSH_INTERVAL = 0.5  # Seconds a change may wait before it is written
+FLUSH_EVERY = 100  # Changes that force a write without waiting
+SNAPSHOT_EVERY = 5000  # Logged changes before the log is folded into a new snapshot
+RECORD_VERSION = 1
+
+# guild_id (0 = unknown), opener_id (0 = unknown), opened_at, first_response_at (NaN = unknown), reason and name lengths
+_TICKET = struct.Struct("<QQddHH")
+
+
+@dataclass(frozen=True)
+class Ticket:
+    channel_id: int
+    guild_id: Optional[int]  # None for tickets imported from a tickets.json that predates it
+    reason: str
+    channel_name: str
+    opener_id: Optional[int] = None
+    opened_at: Optional[float] = None
+    first_response_at: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, channel_id, data: dict) -> "Ticket":
+        guild_id = data.get("guild_id")
+        opener_id = data.get("opener_id")
+        return cls(
+            channel_id=int(channel_id),
+            guild_id=int(guild_id) if guild_id is not None else None,
+            reason=data["reason"],
+            channel_name=data["channel_name"],
+            opener_id=int(opener_id) if opener_id is not None else None,
+            opened_at=data.get("opened_at"),
+            first_response_at=data.get("first_response_at"),
+        )
+
+    def to_dict(self) -> dict:
+        # channel_id is stored as the key
+        data = {"reason": self.reason, "channel_name": self.channel_name}
+        for key in ("guild_id", "opener_id", "opened_at", "first_response_at"):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        return data
+
+
+def encode_ticket(ticket: Ticket) -> bytes:
+    reason = ticket.reason.encode()
+    name = ticket.channel_name.encode()
+    return _TICKET.pack(
+        ticket.guild_id or 0,
+        ticket.opener_id or 0,
+        math.nan if ticket.opened_at is None else ticket.opened_at,
+        math.nan if ticket.first_response_at is None else ticket.first_response_at,
+        len(reason),
+        len(name),
+    ) + reason + name
+
+
+def decode_ticket(channel_id: int, payload: bytes, version: int) -> Ticket:
+    guild_id, opener_id, opened_at, first_response_at, reason_length, name_length = _TICKET.unpack_from(payload)
+    offset = _TICKET.size
+    return Ticket(
+        channel_id=channel_id,
+        guild_id=guild_id or None,
+        reason=payload[offset:offset + reason_length].decode(),
+        channel_name=payload[offset + reason_length:offset + reason_length + name_length].decode(),
+        opener_id=opener_id or None,
+        opened_at=None if math.isnan(opened_at) else opened_at,
+        first_response_at=None if math.isnan(first_response_at) else first_response_at,
+    )
+
+
+class TicketStore:
+    """Open tickets kept in memory, keyed by channel id.
+
+    Changes only mark the store dirty. They are appended to a binary change
+    log in the background once FLUSH_INTERVAL has passed or FLUSH_EVERY
+    changes have piled up, so opening or closing a ticket never waits on
+    disk. Every SNAPSHOT_EVERY changes the log is folded into a new snapshot,
+    so startup reads one snapshot and a short log no matter how long the
+    bot has been running. close() writes whatever is still pending.
+
+    ``json_path`` is the tickets.json written by earlier versions; it is
+    imported once when there is no snapshot yet, or when the snapshot can't
+    be read; tickets closed since then are dropped by reconcile, because
+    their channels are gone.
+    """
+
+    def __init__(self, path="tickets.snap", json_path=None, legacy_path=None,
+                 flush_interval=FLUSH_INTERVAL, flush_every=FLUSH_EVERY, snapshot_every=SNAPSHOT_EVERY):
+        self._tickets: Dict[int, Ticket] = {}
+        self._by_guild: Dict[int, set] = {}
+        self._by_opener: Dict[tuple, int] = {}  # (guild_id, opener_id, reason) -> channel_id
+        self._log = SnapshotLog(
+            path,
+            RECORD_VERSION,
+            encode_ticket,
+            decode_ticket,
+            self._tickets.items,
+            flush_interval,
+            flush_every,
+            snapshot_every,
+            thread_name="ticket-store"
+        )
+        restored = None
+        if self._log.exists():
+            try:
+                restored = self._log.load()
+            except ValueError as e:
+                # Don't take the cog down; keep the files for inspection and start over
+                moved = self._log.move_aside()
+                print(f"[TICKETS] Could not restore tickets: {e}. Moved to {', '.join(moved)}")
+        if restored is not None:
+            for ticket in restored.values():
+                self._index(ticket)
+        else:
+            json_path = json_path if json_path and os.path.exists(json_path) else legacy_path
+            if json_path:
+                self._load_json(json_path)
+            self._log.snapshot_now()
+
+    def _load_json(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        # JSON object keys are always strings; the store only uses int ids
+        for channel_id, entry in data.items():
+            self._index(Ticket.from_dict(channel_id, entry))
+
+    def _index(self, ticket: Ticket):
+        self._tickets[ticket.channel_id] = ticket
+        self._by_guild.setdefault(ticket.guild_id, set()).add(ticket.channel_id)
+        if ticket.opener_id is not None:
+            self._by_opener[(ticket.guild_id, ticket.opener_id, ticket.reason)] = ticket.channel_id
+
+    def _unindex(self, ticket: Ticket):
+        channels = self._by_guild.get(ticket.guild_id)
+        channels.discard(ticket.channel_id)
+        if not channels:
+            del self._by_guild[ticket.guild_id]
+        key = (ticket.guild_id, ticket.opener_id, ticket.reason)
+        if self._by_opener.get(key) == ticket.channel_id:
+            del self._by_opener[key]
+
+    @property
+    def restored(self) -> dict:
+        """How many tickets and log entries the last start read, and how long it took."""
+        return self._log.restored
+
+    # --- reads ----------------------------------------------------------------
+
+    def get(self, channel_id: int) -> Optional[Ticket]:
+        return self._tickets.get(int(channel_id))
+
+    def count(self, guild_id: int) -> int:
+        """Open tickets in one guild."""
+        return len(self._by_guild.get(guild_id, ()))
+
+    def open_ticket(self, guild_id: int, opener_id: int, reason: str) -> Optional[Ticket]:
+        """The member's open ticket for ``reason``, if any. O(1)."""
+        channel_id = self._by_opener.get((guild_id, opener_id, reason))
+        return self._tickets.get(channel_id) if channel_id is not None else None
+
+    def __contains__(self, channel_id) -> bool:
+        return int(channel_id) in self._tickets
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def __iter__(self) -> Iterator[Ticket]:
+        return iter(list(self._tickets.values()))
+
+    # --- writes ---------------------------------------------------------------
+
+    def add(self, ticket: Ticket) -> Ticket:
+        self._index(ticket)
+        self._log.put(ticket.channel_id, ticket)
+        return ticket
+
+    def update(self, channel_id: int, **changes) -> Optional[Ticket]:
+        ticket = self._tickets.get(int(channel_id))
+        if ticket is None:
+            return None
+        self._unindex(ticket)
+        ticket = replace(ticket, **changes)
+        self._index(ticket)
+        self._log.put(ticket.channel_id, ticket)
+        return ticket
+
+    def remove(self, channel_id: int) -> Optional[Ticket]:
+        ticket = self._tickets.pop(int(channel_id), None)
+        if ticket is not None:
+            self._unindex(ticket)
+            self._log.delete(ticket.channel_id)
+        return ticket
+
+    def remove_many(self, channel_ids) -> list:
+        return [ticket for ticket in map(self.remove, channel_ids) if ticket is not None]
+
+    async def flush(self):
+        await self._log.flush()
+
+    def close(self):
+        self._log.close()
+
+    def stats(self) -> dict:
+        return {
+            "open": len(self._tickets),
+            "pending_changes": self._log.pending,
+            "flushes": self._log.flushes,
+            "snapshots": self._log.snapshots,
+        }
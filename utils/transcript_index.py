@@ -0,0 +1,495 @@
+"""Full-text search over closed ticket transcripts.
+
+The index is a directory of immutable segments plus a manifest.json that
+lists the live ones. Each segment is four files:
+
+- ``.terms``: the sorted term dictionary, binary searched in place through mmap
+- ``.post``: per term, the document ids (uint32) followed by term counts (uint16), mmapped
+- ``.docs``: per document columns (guild id, close time, length, channel id, meta offsets)
+- ``.meta``: one JSON object per document, read only for the hits that are shown
+
+Closed tickets collect in memory (where they are already searchable) and are
+written as a new segment in batches on a writer thread. Runs of similarly
+sized segments are merged in the background, so there are only ever a
+logarithmic number of them. Results are ranked with BM25.
+"""
+import array
+import asyncio
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from utils.write_behind import atomic_write_json
+
+INDEX_DIR = "transcript_index"
+FLUSH_EVERY = 200  # Closed tickets held in memory before a segment is written
+FLUSH_INTERVAL = 30.0  # Seconds before a smaller batch is written anyway
+MERGE_FACTOR = 4  # Merge once this many segments of the same size class pile up
+MIN_TOKEN, MAX_TOKEN = 2, 40
+MAX_TERM_COUNT = 0xFFFF
+PREVIEW_CHARS = 200
+BM25_K1, BM25_B = 1.2, 0.75
+
+_TOKEN = re.compile(r"[^\W_]+")
+_MAGIC = b"TIX1"
+_HEADER = struct.Struct("<4sI")  # magic, number of terms or documents
+_TERM = struct.Struct("<QI")  # postings offset, document frequency
+_OFFSET = struct.Struct("<Q")
+_EXTENSIONS = ("terms", "post", "docs", "meta")
+
+
+def tokenize(text: str):
+    for token in _TOKEN.findall(text.lower()):
+        if MIN_TOKEN <= len(token) <= MAX_TOKEN:
+            yield token
+
+
+def _to_bytes(values: array.array) -> bytes:
+    # Files are little-endian whatever machine wrote them
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data) -> array.array:
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+@dataclass
+class TranscriptDoc:
+    """One closed ticket, ready to be indexed."""
+    channel_id: int
+    guild_id: int
+    closed_at: float
+    terms: Counter
+    meta: dict = field(default_factory=dict)  # channel_name, reason, opener_id, closer_id, path, preview
+    length: int = field(init=False)
+
+    def __post_init__(self):
+        self.length = sum(self.terms.values())
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    score: float
+    channel_id: int
+    guild_id: int
+    closed_at: float
+    meta: dict
+
+
+class Segment:
+    """Read side of one segment file set."""
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        self.base = os.path.join(directory, name)
+        self._files = []
+        self._terms = self._map("terms")
+        self._postings = self._map("post")
+        self._meta = self._map("meta")
+        self.term_count = _HEADER.unpack_from(self._terms, 0)[1]
+        self._term_offsets = _HEADER.size
+        self._term_entries = self._term_offsets + (self.term_count + 1) * _OFFSET.size
+        self._term_blob = self._term_entries + self.term_count * _TERM.size
+
+        with open(f"{self.base}.docs", "rb") as file:
+            data = file.read()
+        count = self.doc_count = _HEADER.unpack_from(data, 0)[1]
+        position = _HEADER.size
+        columns = []
+        for typecode, width in (("Q", 8), ("d", 8), ("I", 4), ("Q", 8), ("Q", 8)):
+            size = (count + 1 if len(columns) == 4 else count) * width
+            columns.append(_from_bytes(typecode, data[position:position + size]))
+            position += size
+        self.guild_ids, self.closed_at, self.lengths, self.channel_ids, self._meta_offsets = columns
+        self.total_length = sum(self.lengths)
+
+    def _map(self, extension):
+        file = open(f"{self.base}.{extension}", "rb")
+        self._files.append(file)
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(mapped)
+        return mapped
+
+    def _term_at(self, index: int) -> bytes:
+        start, = _OFFSET.unpack_from(self._terms, self._term_offsets + index * _OFFSET.size)
+        end, = _OFFSET.unpack_from(self._terms, self._term_offsets + (index + 1) * _OFFSET.size)
+        return self._terms[self._term_blob + start:self._term_blob + end]
+
+    def _find(self, term: bytes) -> int:
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_at(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.term_count and self._term_at(low) == term else -1
+
+    def _postings_at(self, index: int):
+        offset, df = _TERM.unpack_from(self._terms, self._term_entries + index * _TERM.size)
+        docs = _from_bytes("I", self._postings[offset:offset + 4 * df])
+        counts = _from_bytes("H", self._postings[offset + 4 * df:offset + 6 * df])
+        return docs, counts
+
+    def postings(self, term: bytes):
+        """(document ids, term counts) for ``term``, or None."""
+        index = self._find(term)
+        return self._postings_at(index) if index >= 0 else None
+
+    def terms(self):
+        """Every (term, index) in sorted order, for merging."""
+        for index in range(self.term_count):
+            yield self._term_at(index), index
+
+    def meta(self, doc: int) -> dict:
+        return json.loads(self._meta[self._meta_offsets[doc]:self._meta_offsets[doc + 1]])
+
+    def close(self):
+        for handle in reversed(self._files):
+            handle.close()
+        self._files = []
+
+    def remove(self):
+        _remove_segment_files(self.base)
+
+
+class _MemorySegment:
+    """The same read interface over documents that haven't been written yet."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.guild_ids = [doc.guild_id for doc in docs]
+        self.closed_at = [doc.closed_at for doc in docs]
+        self.lengths = [doc.length for doc in docs]
+        self.channel_ids = [doc.channel_id for doc in docs]
+        self.total_length = sum(self.lengths)
+
+    def postings(self, term: bytes):
+        term = term.decode()
+        hits = [(index, doc.terms[term]) for index, doc in enumerate(self.docs) if term in doc.terms]
+        if not hits:
+            return None
+        return [index for index, _ in hits], [count for _, count in hits]
+
+    def meta(self, doc: int) -> dict:
+        return self.docs[doc].meta
+
+
+def _remove_segment_files(base: str):
+    for extension in _EXTENSIONS:
+        try:
+            os.remove(f"{base}.{extension}")
+        except OSError:
+            pass  # Missing, or left for the orphan sweep on the next start
+
+
+def _write_segment(base: str, docs, postings):
+    """Write a segment. ``docs`` is a list of (guild_id, closed_at, length,
+    channel_id, meta) and ``postings`` yields (term bytes, doc ids, counts)
+    in sorted term order."""
+    terms, entries, offset = [], [], 0
+    with open(f"{base}.post", "wb") as file:
+        for term, doc_ids, counts in postings:
+            terms.append(term)
+            entries.append(_TERM.pack(offset, len(doc_ids)))
+            file.write(_to_bytes(array.array("I", doc_ids)))
+            file.write(_to_bytes(array.array("H", [min(count, MAX_TERM_COUNT) for count in counts])))
+            offset += 6 * len(doc_ids)
+        file.flush()
+        os.fsync(file.fileno())
+
+    with open(f"{base}.terms", "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, len(terms)))
+        blob_offsets = array.array("Q", [0])
+        for term in terms:
+            blob_offsets.append(blob_offsets[-1] + len(term))
+        file.write(_to_bytes(blob_offsets))
+        file.write(b"".join(entries))
+        file.write(b"".join(terms))
+        file.flush()
+        os.fsync(file.fileno())
+
+    meta_offsets = array.array("Q", [0])
+    with open(f"{base}.meta", "wb") as file:
+        for *_, meta in docs:
+            encoded = json.dumps(meta, separators=(",", ":")).encode()
+            file.write(encoded)
+            meta_offsets.append(meta_offsets[-1] + len(encoded))
+        file.flush()
+        os.fsync(file.fileno())
+
+    with open(f"{base}.docs", "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, len(docs)))
+        for column, typecode in enumerate(("Q", "d", "I", "Q")):
+            file.write(_to_bytes(array.array(typecode, [doc[column] for doc in docs])))
+        file.write(_to_bytes(meta_offsets))
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _build_segment(base: str, batch):
+    vocabulary = {}
+    for index, doc in enumerate(batch):
+        for term, count in doc.terms.items():
+            vocabulary.setdefault(term.encode(), []).append((index, count))
+    postings = (
+        (term, [index for index, _ in vocabulary[term]], [count for _, count in vocabulary[term]])
+        for term in sorted(vocabulary)
+    )
+    docs = [(doc.guild_id, doc.closed_at, doc.length, doc.channel_id, doc.meta) for doc in batch]
+    _write_segment(base, docs, postings)
+
+
+def _merge_segments(base: str, segments):
+    """Stream several segments into one. Document ids are shifted by each
+    segment's position, so only one term's postings are in memory at a time."""
+    starts, start = [], 0
+    for segment in segments:
+        starts.append(start)
+        start += segment.doc_count
+
+    def postings():
+        merged = heapq.merge(*(
+            ((term, position, index) for term, index in segment.terms())
+            for position, segment in enumerate(segments)
+        ))
+        current, doc_ids, counts = None, [], []
+        for term, position, index in merged:
+            if term != current:
+                if current is not None:
+                    yield current, doc_ids, counts
+                current, doc_ids, counts = term, [], []
+            docs, term_counts = segments[position]._postings_at(index)
+            doc_ids.extend(doc + starts[position] for doc in docs)
+            counts.extend(term_counts)
+        if current is not None:
+            yield current, doc_ids, counts
+
+    docs = [
+        (segment.guild_ids[doc], segment.closed_at[doc], segment.lengths[doc], segment.channel_ids[doc], segment.meta(doc))
+        for segment in segments
+        for doc in range(segment.doc_count)
+    ]
+    _write_segment(base, docs, postings())
+
+
+def _size_class(doc_count: int) -> int:
+    return int(math.log(max(doc_count, 1), MERGE_FACTOR))
+
+
+class TranscriptIndex:
+    """Incrementally updated inverted index of closed ticket transcripts."""
+
+    def __init__(self, directory: str = INDEX_DIR, flush_every: int = FLUSH_EVERY, flush_interval: float = FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript-index")
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._flushing = None
+        self._pending = []  # Closed tickets not yet handed to the writer
+        self._writing = []  # Tickets the writer is turning into a segment
+        self.flushes = 0
+        self.merges = 0
+
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = {"segments": [], "next": 0}
+        self._next = manifest["next"]
+        self.segments = [Segment(directory, name) for name in manifest["segments"]]
+        self._remove_orphans(set(manifest["segments"]))
+
+    def _remove_orphans(self, live):
+        # Segments written by a flush or merge that crashed before the manifest was updated
+        for filename in os.listdir(self.directory):
+            name, _, extension = filename.rpartition(".")
+            if extension in _EXTENSIONS and name not in live:
+                os.remove(os.path.join(self.directory, filename))
+
+    def __len__(self):
+        return sum(segment.doc_count for segment in self.segments) + len(self._writing) + len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self),
+            "segments": len(self.segments),
+            "pending": len(self._pending) + len(self._writing),
+            "flushes": self.flushes,
+            "merges": self.merges,
+        }
+
+    def add(self, doc: TranscriptDoc):
+        """Make a closed ticket searchable now and schedule it to be written."""
+        self._pending.append(doc)
+        if len(self._pending) >= self.flush_every:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    def _new_name(self) -> str:
+        name = f"seg-{self._next:06d}"
+        self._next += 1
+        return name
+
+    def _manifest(self) -> dict:
+        return {"segments": [segment.name for segment in self.segments], "next": self._next}
+
+    async def flush(self):
+        """Write pending tickets as a new segment, then merge if segments piled up."""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while self._pending:
+                self._writing, self._pending = self._pending, []
+                name = self._new_name()
+                try:
+                    await loop.run_in_executor(self._executor, _build_segment, os.path.join(self.directory, name), self._writing)
+                except OSError as e:
+                    print(f"Failed to write transcript index segment {name}: {e}")
+                    await loop.run_in_executor(self._executor, _remove_segment_files, os.path.join(self.directory, name))
+                    self._pending = self._writing + self._pending
+                    self._writing = []
+                    if self._timer is None:
+                        self._timer = loop.call_later(self.flush_interval, self._start_flush)
+                    return
+                self.segments = self.segments + [Segment(self.directory, name)]
+                self._writing = []
+                self.flushes += 1
+                # On failure the segment is still searchable and the next manifest write lists it
+                await self._write_manifest(loop)
+                await self._merge(loop)
+
+    async def _write_manifest(self, loop) -> bool:
+        try:
+            await loop.run_in_executor(self._executor, atomic_write_json, self._manifest_path, self._manifest())
+        except OSError as e:
+            print(f"Failed to write {self._manifest_path}: {e}")
+            return False
+        return True
+
+    async def _merge(self, loop):
+        while len(self.segments) >= MERGE_FACTOR:
+            tail = self.segments[-MERGE_FACTOR:]
+            if len({_size_class(segment.doc_count) for segment in tail}) != 1:
+                return
+            name = self._new_name()
+            base = os.path.join(self.directory, name)
+            try:
+                await loop.run_in_executor(self._executor, _merge_segments, base, tail)
+                merged = Segment(self.directory, name)
+            except OSError as e:
+                # The source segments are untouched; the next flush tries again
+                print(f"Failed to merge transcript index segments into {name}: {e}")
+                await loop.run_in_executor(self._executor, _remove_segment_files, base)
+                return
+            previous = self.segments
+            self.segments = self.segments[:-MERGE_FACTOR] + [merged]
+            if not await self._write_manifest(loop):
+                # The manifest on disk still lists the sources, so keep using them
+                self.segments = previous
+                merged.close()
+                await loop.run_in_executor(self._executor, _remove_segment_files, base)
+                return
+            self.merges += 1
+            # Searches run on the event loop, so nothing is reading these any more
+            for segment in tail:
+                segment.close()
+            await loop.run_in_executor(self._executor, lambda: [segment.remove() for segment in tail])
+
+    def search(self, query: str, guild_id: Optional[int] = None, since: Optional[float] = None, limit: int = 10):
+        """Best ``limit`` transcripts for ``query`` by BM25, optionally only one
+        guild's and only tickets closed after ``since``."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        sources = list(self.segments)
+        if self._writing or self._pending:
+            sources.append(_MemorySegment(self._writing + self._pending))
+        doc_count = sum(len(source.lengths) for source in sources)
+        if not doc_count:
+            return []
+        average_length = sum(source.total_length for source in sources) / doc_count or 1.0
+
+        scores = {}
+        for term in terms:
+            encoded = term.encode()
+            matches = [(position, source.postings(encoded)) for position, source in enumerate(sources)]
+            matches = [(position, postings) for position, postings in matches if postings is not None]
+            df = sum(len(postings[0]) for _, postings in matches)
+            if not df:
+                continue
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for position, (docs, counts) in matches:
+                source = sources[position]
+                guild_ids, closed_at, lengths = source.guild_ids, source.closed_at, source.lengths
+                for doc, count in zip(docs, counts):
+                    if guild_id is not None and guild_ids[doc] != guild_id:
+                        continue
+                    if since is not None and closed_at[doc] < since:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / average_length)
+                    key = (position, doc)
+                    scores[key] = scores.get(key, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            SearchHit(
+                score=score,
+                channel_id=sources[position].channel_ids[doc],
+                guild_id=sources[position].guild_ids[doc],
+                closed_at=sources[position].closed_at[doc],
+                meta=sources[position].meta(doc),
+            )
+            for (position, doc), score in best
+        ]
+
+    def close(self):
+        """Write pending tickets and release the segment files. Safe from sync code such as cog_unload."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is not None and not self._flushing.done():
+            # It would otherwise resume after the executor is gone. Whatever it
+            # was writing is still in _writing, and any files it leaves behind
+            # are orphans the next start removes
+            self._flushing.cancel()
+        self._executor.shutdown(wait=True)
+        pending = self._writing + self._pending
+        if pending:
+            name = self._new_name()
+            _build_segment(os.path.join(self.directory, name), pending)
+            self.segments = self.segments + [Segment(self.directory, name)]
+            self._writing, self._pending = [], []
+        # Also covers a manifest write that the cancelled flush never got to
+        atomic_write_json(self._manifest_path, self._manifest())
+        for segment in self.segments:
+            segment.close()
@@ -0,0 +1,138 @@
+import asyncio
+import gzip
+import html
+import json
+import os
+import re
+from collections import Counter
+
+from utils.transcript_index import PREVIEW_CHARS, tokenize
+
+TRANSCRIPT_DIR = "transcripts"
+FORMATS = {"text": "txt", "jsonl": "jsonl", "html": "html"}
+FLUSH_EVERY = 100  # Messages buffered before a write is handed to the executor
+
+_HTML_HEADER = (
+    "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title>"
+    "<style>body{{font-family:sans-serif}}.msg{{margin:4px 0}}.meta{{color:#888}}</style>"
+    "</head><body><h1>{title}</h1>\n"
+)
+_HTML_FOOTER = "</body></html>\n"
+_MENTION = re.compile(r"<[@#][!&]?\d+>")
+
+
+class TranscriptSummary:
+    """Running totals gathered while a transcript is streamed to disk."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.messages = 0
+        self.attachments = 0
+        self.embeds = 0
+        self.participants = {}  # display name -> message count
+        self.first_at = None
+        self.last_at = None
+        self.terms = Counter()  # For the search index
+        self.preview = None  # First message with more than mentions in it
+
+    def add(self, record):
+        self.messages += 1
+        self.attachments += len(record["attachments"])
+        self.embeds += len(record["embeds"])
+        self.participants[record["author"]] = self.participants.get(record["author"], 0) + 1
+        if self.first_at is None:
+            self.first_at = record["created_at"]
+        self.last_at = record["created_at"]
+        self.terms.update(tokenize(record["content"]))
+        for a in record["attachments"]:
+            self.terms.update(tokenize(a["filename"]))
+        for e in record["embeds"]:
+            self.terms.update(tokenize(f"{e['title'] or ''} {e['description'] or ''}"))
+        if self.preview is None:
+            text = _MENTION.sub("", record["content"]).strip()
+            if text:
+                self.preview = text[:PREVIEW_CHARS]
+
+
+def message_record(message) -> dict:
+    """Flatten a discord.Message into the fields we keep in transcripts."""
+    return {
+        "id": message.id,
+        "author": str(message.author),
+        "author_id": message.author.id,
+        "created_at": message.created_at.isoformat(),
+        "content": message.content,
+        "attachments": [
+            {"filename": a.filename, "url": a.url, "size": a.size, "content_type": a.content_type}
+            for a in message.attachments
+        ],
+        "embeds": [
+            {"title": e.title or None, "description": e.description or None, "url": e.url or None}
+            for e in message.embeds
+        ],
+    }
+
+
+def format_record(record, fmt) -> str:
+    if fmt == "jsonl":
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    if fmt == "html":
+        parts = [
+            f"<div class=\"msg\"><span class=\"meta\">[{html.escape(record['created_at'])}]</span> "
+            f"<b>{html.escape(record['author'])}</b>: {html.escape(record['content'])}"
+        ]
+        for a in record["attachments"]:
+            parts.append(f"<div>Attachment: <a href=\"{html.escape(a['url'])}\">{html.escape(a['filename'])}</a></div>")
+        for e in record["embeds"]:
+            parts.append(f"<div>Embed: {html.escape(e['title'] or '')} {html.escape(e['description'] or '')}</div>")
+        return "".join(parts) + "</div>\n"
+
+    lines = [f"[{record['created_at']}] {record['author']}: {record['content']}"]
+    for a in record["attachments"]:
+        lines.append(f"    [attachment] {a['filename']} {a['url']}")
+    for e in record["embeds"]:
+        lines.append(f"    [embed] {e['title'] or ''} {e['description'] or ''}".rstrip())
+    return "\n".join(lines) + "\n"
+
+
+async def write_transcript(history, path: str, fmt: str = "text", title: str = "Ticket Transcript") -> TranscriptSummary:
+    """Stream an async iterator of messages into a gzip file at ``path``.
+
+    Only ``FLUSH_EVERY`` formatted messages are held in memory at a time, and
+    the compression/disk writes happen in the default executor.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown transcript format: {fmt}")
+
+    loop = asyncio.get_running_loop()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = await loop.run_in_executor(None, lambda: gzip.open(path, "wt", encoding="utf-8"))
+    summary = TranscriptSummary(path)
+    buffer = []
+
+    async def flush():
+        if buffer:
+            chunk = "".join(buffer)
+            buffer.clear()
+            await loop.run_in_executor(None, handle.write, chunk)
+
+    try:
+        if fmt == "html":
+            buffer.append(_HTML_HEADER.format(title=html.escape(title)))
+        async for message in history:
+            record = message_record(message)
+            summary.add(record)
+            buffer.append(format_record(record, fmt))
+            if len(buffer) >= FLUSH_EVERY:
+                await flush()
+        if fmt == "html":
+            buffer.append(_HTML_FOOTER)
+        await flush()
+    finally:
+        await loop.run_in_executor(None, handle.close)
+    return summary
+
+
+def transcript_path(channel_name: str, channel_id: int, fmt: str = "text") -> str:
+    return os.path.join(TRANSCRIPT_DIR, f"{channel_name}-{channel_id}.{FORMATS[fmt]}.gz")
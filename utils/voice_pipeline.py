@@ -0,0 +1,199 @@
+import asyncio
+import importlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import discord
+
+# Discord voice receive hands us 48kHz, 16-bit, stereo PCM
+SAMPLE_RATE = 48000
+SAMPLE_WIDTH = 2
+CHANNELS = 2
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH * CHANNELS
+STOP_GRACE_SECONDS = 5.0  # How long listen() waits past its duration for the recording to end
+
+
+# --- recognizer backends (run inside worker processes) ------------------------
+
+def _to_audio_data(pcm: bytes):
+    import speech_recognition as sr
+
+    # Keep the left channel only; recognizers expect mono audio
+    samples = array("h")
+    samples.frombytes(pcm[: len(pcm) - len(pcm) % (SAMPLE_WIDTH * CHANNELS)])
+    mono = samples[::CHANNELS].tobytes()
+    return sr.Recognizer(), sr.AudioData(mono, SAMPLE_RATE, SAMPLE_WIDTH)
+
+
+def recognize_google(pcm: bytes, options: dict):
+    import speech_recognition as sr
+
+    recognizer, audio = _to_audio_data(pcm)
+    try:
+        return recognizer.recognize_google(audio, language=options.get("language", "en-US"))
+    except sr.UnknownValueError:
+        return None
+
+
+def recognize_sphinx(pcm: bytes, options: dict):
+    """Fully offline recognition through pocketsphinx."""
+    import speech_recognition as sr
+
+    recognizer, audio = _to_audio_data(pcm)
+    try:
+        return recognizer.recognize_sphinx(audio, language=options.get("language", "en-US"))
+    except sr.UnknownValueError:
+        return None
+
+
+def recognize_stub(pcm: bytes, options: dict):
+    """Local stand-in for tests: returns the configured text for any non-empty chunk."""
+    return options.get("text", "hello") if pcm else None
+
+
+BACKENDS = {
+    "google": recognize_google,
+    "sphinx": recognize_sphinx,
+    "stub": recognize_stub,
+}
+
+
+def run_backend(backend: str, pcm: bytes, options: dict):
+    """Entry point for the process pool. ``backend`` is either a name from
+    BACKENDS or a ``"package.module:function"`` path to a custom recognizer."""
+    if ":" in backend:
+        module_name, function_name = backend.split(":", 1)
+        recognize = getattr(importlib.import_module(module_name), function_name)
+    else:
+        recognize = BACKENDS[backend]
+    return recognize(pcm, options)
+
+
+# --- audio capture -------------------------------------------------------------
+
+class ChunkedSink(discord.sinks.Sink):
+    """Voice sink that cuts each speaker's audio into fixed-size chunks and
+    hands them to the event loop as soon as they are full, instead of
+    buffering a whole recording."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, chunk_seconds: float = 4.0):
+        super().__init__()
+        self.loop = loop
+        self.queue = queue
+        self.chunk_bytes = int(chunk_seconds * BYTES_PER_SECOND)
+        self.buffers = {}
+
+    def write(self, data, user):
+        """Called from the voice receive thread as ``write(VoiceData, source)``.
+        Chunks are keyed by user id; audio from an unknown source is dropped."""
+        if self.finished or user is None:
+            return
+        buffer = self.buffers.setdefault(user.id, bytearray())
+        buffer += data.pcm
+        if len(buffer) >= self.chunk_bytes:
+            self.buffers[user.id] = bytearray()
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (user.id, bytes(buffer)))
+
+    def cleanup(self):
+        """Flush what is left and end the stream. Safe to call more than once."""
+        if self.finished:
+            return
+        self.finished = True
+        for user_id, buffer in self.buffers.items():
+            if buffer:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, (user_id, bytes(buffer)))
+        self.buffers = {}
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+class VoicePipeline:
+    """Captures speech from a voice client and recognizes it in a process pool."""
+
+    def __init__(self, backend="google", workers=2, chunk_seconds=4.0, options=None):
+        self.backend = backend
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.options = options or {}
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def recognize(self, pcm: bytes):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, run_backend, self.backend, pcm, self.options)
+
+    async def listen(self, vc, seconds: float, on_text):
+        """Record ``vc`` for ``seconds`` and await ``on_text(user_id, text)`` for
+        every chunk that was recognized, while recording is still running."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        sink = ChunkedSink(loop, queue, self.chunk_seconds)
+
+        def after(error):
+            # py-cord calls this synchronously from its receive thread, and
+            # never calls sink.cleanup() itself
+            if error is not None:
+                print(f"Recording stopped with an error: {error}")
+            sink.cleanup()
+
+        def stop():
+            if vc.is_recording():
+                vc.stop_recording()
+
+        vc.start_recording(sink, after)
+        stop_timer = loop.call_later(seconds, stop)
+        deadline = loop.time() + seconds + STOP_GRACE_SECONDS
+
+        pending = set()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0.0))
+                except asyncio.TimeoutError:
+                    print(f"Recording in {vc.channel} did not end {STOP_GRACE_SECONDS:.0f}s after it was stopped")
+                    break
+                if item is None:
+                    break
+                user_id, pcm = item
+                pending.add(asyncio.ensure_future(self._handle_chunk(user_id, pcm, on_text)))
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        finally:
+            stop_timer.cancel()
+            stop()
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _handle_chunk(self, user_id, pcm, on_text):
+        try:
+            text = await self.recognize(pcm)
+        except Exception as e:
+            print(f"Speech recognition failed: {e}")
+            return
+        if text:
+            await on_text(user_id, text)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+async def play_and_wait(vc, source):
+    """Play ``source`` and wait for the player's after-callback instead of polling."""
+    loop = asyncio.get_running_loop()
+    done = asyncio.Event()
+
+    def after(error):
+        if error:
+            print(f'Player error: {error}')
+        loop.call_soon_threadsafe(done.set)
+
+    vc.play(source, after=after)
+    await done.wait()
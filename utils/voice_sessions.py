@@ -0,0 +1,259 @@
+import asyncio
+import itertools
+import traceback
+from collections import deque
+
+import discord
+
+DEBOUNCE_SECONDS = 1.5  # Joins and leaves that are undone within this window are ignored
+IDLE_DISCONNECT_SECONDS = 60.0  # Leave voice after this long without callers
+SERVE_TIMEOUT_SECONDS = 120.0  # A caller's session is cut off after this long so the queue keeps moving
+
+
+class GuildSession:
+    """Voice state for one guild: its single voice client and the callers waiting for it.
+
+    Each support channel has its own FIFO queue (an insertion-ordered dict, so
+    a caller who hangs up is removed in O(1)). ``order`` interleaves all
+    channels by arrival; entries for callers who left are skipped lazily.
+    """
+
+    __slots__ = ("guild_id", "client", "queues", "channels", "order", "waiting",
+                 "pending", "current", "serving", "worker", "idle_timer")
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.client = None
+        self.queues = {}  # channel_id -> {member_id: (seq, member)}
+        self.channels = {}  # channel_id -> voice channel
+        self.order = deque()  # (seq, member_id, channel_id) in arrival order
+        self.waiting = {}  # member_id -> channel_id they are queued in
+        self.pending = {}  # member_id -> (kind, channel_id, TimerHandle)
+        self.current = None  # (member_id, channel_id) being served
+        self.serving = None
+        self.worker = None
+        self.idle_timer = None
+
+    def next_caller(self):
+        while self.order:
+            seq, member_id, channel_id = self.order.popleft()
+            entry = self.queues.get(channel_id, {}).get(member_id)
+            if entry is not None and entry[0] == seq:
+                del self.queues[channel_id][member_id]
+                del self.waiting[member_id]
+                return entry[1], self.channels[channel_id]
+        return None
+
+    def in_channel(self, member_id: int, channel_id: int) -> bool:
+        return self.waiting.get(member_id) == channel_id or self.current == (member_id, channel_id)
+
+
+class VoiceSessionManager:
+    """Serves voice support callers one at a time per guild, in arrival order.
+
+    Discord allows one voice connection per guild, so each guild gets a
+    GuildSession and a worker that moves the client to the next caller's
+    channel and awaits ``serve(vc, member)``. Every voice state update is a
+    couple of dict operations; nothing scans the bot's voice clients.
+    """
+
+    def __init__(self, serve, debounce=DEBOUNCE_SECONDS, idle_timeout=IDLE_DISCONNECT_SECONDS,
+                 serve_timeout=SERVE_TIMEOUT_SECONDS):
+        self.serve = serve
+        self.debounce = debounce
+        self.idle_timeout = idle_timeout
+        self.serve_timeout = serve_timeout
+        self._sessions = {}  # guild_id -> GuildSession
+        self._seq = itertools.count()
+        self.served = 0
+        self.abandoned = 0
+        self.debounced = 0
+        self.timed_out = 0
+
+    def session(self, guild_id: int) -> GuildSession:
+        session = self._sessions.get(guild_id)
+        if session is None:
+            session = self._sessions[guild_id] = GuildSession(guild_id)
+        return session
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self._sessions),
+            "connected": sum(1 for session in self._sessions.values() if session.client is not None),
+            "serving": sum(1 for session in self._sessions.values() if session.current is not None),
+            "waiting": sum(len(session.waiting) for session in self._sessions.values()),
+            "served": self.served,
+            "abandoned": self.abandoned,
+            "debounced": self.debounced,
+            "timed_out": self.timed_out,
+        }
+
+    # --- voice state events ----------------------------------------------------
+
+    def update(self, member: discord.Member, before_channel, after_channel, support_channels):
+        """Feed one voice state update. Mute and deafen changes keep the channel and are ignored."""
+        before_id = before_channel.id if before_channel is not None else None
+        after_id = after_channel.id if after_channel is not None else None
+        if member.bot or before_id == after_id:
+            return
+        if before_id in support_channels:
+            self.left(member, before_channel)
+        if after_id in support_channels:
+            self.joined(member, after_channel)
+
+    def joined(self, member: discord.Member, channel):
+        session = self.session(member.guild.id)
+        pending = session.pending.pop(member.id, None)
+        if pending is not None:
+            kind, channel_id, handle = pending
+            handle.cancel()
+            if kind == "leave":
+                if channel_id == channel.id:
+                    self.debounced += 1  # Dropped and rejoined: keep their place
+                    return
+                self._drop(session, member.id)
+        if session.in_channel(member.id, channel.id):
+            return
+        loop = asyncio.get_running_loop()
+        handle = loop.call_later(self.debounce, self._enqueue, session, member, channel)
+        session.pending[member.id] = ("join", channel.id, handle)
+
+    def left(self, member: discord.Member, channel):
+        session = self._sessions.get(member.guild.id)
+        if session is None:
+            return
+        pending = session.pending.pop(member.id, None)
+        if pending is not None:
+            pending[2].cancel()
+            if pending[0] == "join":
+                self.debounced += 1  # Never queued
+                return
+        if not session.in_channel(member.id, channel.id):
+            return
+        loop = asyncio.get_running_loop()
+        handle = loop.call_later(self.debounce, self._drop, session, member.id)
+        session.pending[member.id] = ("leave", channel.id, handle)
+
+    def _enqueue(self, session: GuildSession, member: discord.Member, channel):
+        session.pending.pop(member.id, None)
+        self._dequeue(session, member.id)  # Moved between support channels
+        seq = next(self._seq)
+        session.queues.setdefault(channel.id, {})[member.id] = (seq, member)
+        session.channels[channel.id] = channel
+        session.order.append((seq, member.id, channel.id))
+        session.waiting[member.id] = channel.id
+        if session.idle_timer is not None:
+            session.idle_timer.cancel()
+            session.idle_timer = None
+        if session.worker is None or session.worker.done():
+            session.worker = asyncio.ensure_future(self._run(session))
+
+    @staticmethod
+    def _dequeue(session: GuildSession, member_id: int) -> bool:
+        channel_id = session.waiting.pop(member_id, None)
+        if channel_id is None:
+            return False
+        session.queues[channel_id].pop(member_id, None)
+        return True
+
+    def _drop(self, session: GuildSession, member_id: int):
+        session.pending.pop(member_id, None)
+        if self._dequeue(session, member_id):
+            self.abandoned += 1
+        elif session.current is not None and session.current[0] == member_id:
+            if session.serving is not None:
+                session.serving.cancel()
+
+    # --- serving ---------------------------------------------------------------
+
+    async def _connect(self, session: GuildSession, channel):
+        vc = session.client
+        if vc is None or not vc.is_connected():
+            # Also picks up a connection made by the !join command
+            vc = channel.guild.voice_client
+        if vc is None or not vc.is_connected():
+            vc = await channel.connect()
+        elif vc.channel.id != channel.id:
+            await vc.move_to(channel)
+        session.client = vc
+        return vc
+
+    async def _run(self, session: GuildSession):
+        while True:
+            caller = session.next_caller()
+            if caller is None:
+                break
+            member, channel = caller
+            session.current = (member.id, channel.id)
+            try:
+                vc = await self._connect(session, channel)
+                session.serving = asyncio.ensure_future(self.serve(vc, member))
+                # Not wait_for: _drop cancels session.serving when the caller
+                # hangs up, and that must not look like this worker being cancelled
+                done, _ = await asyncio.wait([session.serving], timeout=self.serve_timeout)
+                if not done:
+                    self.timed_out += 1
+                    print(f"Voice session for {member} took longer than {self.serve_timeout:.0f}s, moving on")
+                    session.serving.cancel()
+                    self._halt(vc)
+                elif session.serving.cancelled():
+                    self._halt(vc)  # The caller hung up mid-session
+                elif session.serving.exception() is not None:
+                    error = session.serving.exception()
+                    print(f"Voice session for {member} failed:")
+                    traceback.print_exception(type(error), error, error.__traceback__)
+                else:
+                    self.served += 1
+            except asyncio.CancelledError:
+                if session.serving is not None:
+                    session.serving.cancel()
+                raise
+            except Exception as e:
+                print(f"Could not join {channel} for {member}: {e}")
+            finally:
+                session.current = None
+                session.serving = None
+
+        loop = asyncio.get_running_loop()
+        session.idle_timer = loop.call_later(self.idle_timeout, self._idle, session)
+
+    @staticmethod
+    def _halt(vc):
+        if vc.is_recording():
+            vc.stop_recording()
+        if vc.is_playing():
+            vc.stop()
+
+    def _idle(self, session: GuildSession):
+        session.idle_timer = None
+        if session.waiting or session.current is not None:
+            return  # The worker re-arms the timer when it runs dry
+        if session.pending:
+            session.idle_timer = asyncio.get_running_loop().call_later(self.idle_timeout, self._idle, session)
+            return
+        self._sessions.pop(session.guild_id, None)
+        if session.client is not None and session.client.is_connected():
+            asyncio.ensure_future(session.client.disconnect())
+
+    async def disconnect(self, guild_id: int):
+        """Stop serving a guild: drop its queue and leave voice."""
+        session = self._sessions.pop(guild_id, None)
+        if session is None:
+            return
+        self._cancel(session)
+        if session.client is not None and session.client.is_connected():
+            await session.client.disconnect()
+
+    @staticmethod
+    def _cancel(session: GuildSession):
+        for _, _, handle in session.pending.values():
+            handle.cancel()
+        if session.idle_timer is not None:
+            session.idle_timer.cancel()
+        if session.worker is not None:
+            session.worker.cancel()
+
+    def close(self):
+        for session in self._sessions.values():
+            self._cancel(session)
+        self._sessions.clear()
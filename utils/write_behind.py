@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def atomic_write_json(path: str, data):
+    """Write JSON so a crash leaves either the old file or the new one, never half of each."""
+    directory = os.path.dirname(path) or "."
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, separators=(",", ":"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class WriteBehindJSON:
+    """Base for in-memory state that is written to a JSON file in batches.
+
+    Subclasses call _changed() after every mutation and implement
+    _snapshot() (cheap, runs on the event loop) and _serialize(snapshot)
+    (runs on the writer thread). A write happens once flush_interval has
+    passed or flush_every changes have piled up, and close() writes
+    whatever is still pending.
+    """
+
+    def __init__(self, path, flush_interval, flush_every, thread_name):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+        self._lock = asyncio.Lock()
+        self._changes = 0
+        self._dirty = False
+        self._timer = None
+        self._flushing = None
+        self.flushes = 0
+
+    def _snapshot(self):
+        raise NotImplementedError
+
+    def _serialize(self, snapshot):
+        raise NotImplementedError
+
+    def _changed(self):
+        self._dirty = True
+        self._changes += 1
+        loop = asyncio.get_running_loop()
+        if self._changes >= self.flush_every:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    def _write(self, snapshot):
+        atomic_write_json(self.path, self._serialize(snapshot))
+
+    async def flush(self):
+        """Write pending changes now, off the event loop."""
+        async with self._lock:
+            if not self._dirty:
+                return
+            snapshot = self._snapshot()
+            self._dirty = False
+            self._changes = 0
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._write, snapshot)
+                self.flushes += 1
+            except OSError as e:
+                print(f"Failed to write {self.path}: {e}")
+                self._dirty = True
+            # Changes made during the write (or a failed write) go out with the next batch
+            if self._dirty and self._timer is None:
+                self._timer = loop.call_later(self.flush_interval, self._start_flush)
+
+    def close(self):
+        """Write anything still pending and stop. Safe to call from sync code such as cog_unload."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._executor.shutdown(wait=True)  # Let an in-flight write finish first
+        if self._dirty:
+            self._write(self._snapshot())
+            self._dirty = False
+            self._changes = 0